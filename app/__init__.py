@@ -15,19 +15,35 @@ login_manager.login_message_category = 'info'
 
 
 
-def create_app():
+def create_app(config_overrides=None):
     app = Flask(__name__)
     app.config.from_object('config.Config')
+    # scripts (benchmarks, one-off jobs) can point the app at another database
+    if config_overrides:
+        app.config.update(config_overrides)
 
+    # pool settings / SQLite pragmas from the DB_PROFILE (see app/engine.py)
+    from app.engine import configure_engine, install_pragmas
+    configure_engine(app)
     db.init_app(app)
+    install_pragmas(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
 
-    from .models import User
+    from app.cache import init_cache
+    init_cache(app)
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    from app.passwords import init_passwords
+    init_passwords(app)
+
+    # registers the session events that bump user.data_version on writes
+    from app import versioning  # noqa: F401
+    # attaches the full-text search table/index to the transaction table's DDL
+    from app import search  # noqa: F401
+
+    # user_loader resolves current_user from a short-TTL cache (see app/users.py)
+    from app.users import load_user
+    login_manager.user_loader(load_user)
 
 
     from app.auth.routes import bp as auth_bp
@@ -36,6 +52,13 @@ def create_app():
     from app.routes import bp as main_bp
     app.register_blueprint(main_bp)
 
+    from app.commands import register_commands
+    register_commands(app)
+
+    # Server-Timing, /metrics and slow-request log; a no-op unless INSTRUMENTATION_ENABLED
+    from app.instrumentation import init_instrumentation
+    init_instrumentation(app)
+
     # with app.app_context():
     #     db.create_all()
 
@@ -0,0 +1,173 @@
+import hashlib
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+
+from app import db, versioning
+from app.models import Category, DailyRollup
+from app.money import cents_to_float, from_cents
+
+
+# Aggregation helpers for the analytics page.
+# Everything here reads the daily_rollup table (see app/rollups.py) with
+# GROUP BY / SUM, so the cost depends on the number of active days, not on
+# the number of transactions. Sums are exact integer cents; they are turned
+# into Decimals (totals) or floats (chart series) only on the way out.
+
+def totals(user_id, session=None):
+    """Return (income, expenses, balance) for a user, as Decimals."""
+    income, expenses = (session or db.session).query(
+        func.coalesce(func.sum(DailyRollup.income_cents), 0),
+        func.coalesce(func.sum(DailyRollup.expense_cents), 0),
+    ).filter(DailyRollup.user_id == user_id).one()
+
+    return from_cents(income), from_cents(expenses), from_cents(income - expenses)
+
+
+def category_spending(user_id, session=None):
+    """Return [(category_name, spent)] for every category the user owns.
+
+    Categories without expenses are included with 0 so the chart keeps the
+    same labels as the categories page.
+    """
+    spent = func.coalesce(func.sum(DailyRollup.expense_cents), 0)
+
+    rows = (session or db.session).query(Category.name, spent)\
+        .outerjoin(DailyRollup, (DailyRollup.user_id == user_id) & (DailyRollup.category_id == Category.id))\
+        .filter(Category.user_id == user_id)\
+        .group_by(Category.id, Category.name)\
+        .order_by(Category.id)\
+        .all()
+
+    return [(name, cents_to_float(cents)) for name, cents in rows]
+
+
+def daily_totals(user_id):
+    """Return [(YYYY-MM-DD, net_amount)] sorted by date."""
+    rows = db.session.query(
+        DailyRollup.day,
+        func.sum(DailyRollup.income_cents - DailyRollup.expense_cents),
+    ).filter(DailyRollup.user_id == user_id)\
+        .group_by(DailyRollup.day)\
+        .order_by(DailyRollup.day)\
+        .all()
+
+    return [(str(day), cents_to_float(cents)) for day, cents in rows]
+
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# window shown when the client doesn't pass `from`
+DEFAULT_WINDOW_DAYS = {'day': 90, 'week': 365, 'month': 730}
+
+
+def series_window(args):
+    """Read (start, end, granularity) from /api/analytics query args.
+
+    Raises ValueError with a message meant for the client.
+    """
+    granularity = args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+    try:
+        end = date.fromisoformat(args['to']) if args.get('to') else date.today()
+        start = date.fromisoformat(args['from']) if args.get('from') \
+            else end - timedelta(days=DEFAULT_WINDOW_DAYS[granularity])
+    except ValueError:
+        raise ValueError('from/to must be YYYY-MM-DD dates') from None
+    if start > end:
+        raise ValueError('from must not be after to')
+    return start, end, granularity
+
+
+def etag(user_id, version, *parts):
+    """ETag for a response that only changes with the user's data version."""
+    return hashlib.sha1(':'.join(str(p) for p in (user_id, version, *parts)).encode()).hexdigest()
+
+
+def _bucket(granularity, dialect):
+    """SQL expression truncating DailyRollup.day to the start of its day/week/month."""
+    day = DailyRollup.day
+    if granularity == 'day':
+        return day
+
+    if dialect == 'postgresql':
+        return func.date_trunc(granularity, day).cast(db.Date)
+    # SQLite: weeks start on Monday, like date_trunc('week') on Postgres
+    if granularity == 'week':
+        return func.date(day, 'weekday 0', '-6 days')
+    return func.date(day, 'start of month')
+
+
+def series(user_id, start, end, granularity='day', session=None):
+    """Income, expense and net totals per period between start and end (inclusive), sorted."""
+    session = session or db.session
+    bucket = _bucket(granularity, session.get_bind().dialect.name).label('period')
+    rows = session.query(
+        bucket,
+        func.sum(DailyRollup.income_cents),
+        func.sum(DailyRollup.expense_cents),
+    ).filter(DailyRollup.user_id == user_id, DailyRollup.day.between(start, end))\
+        .group_by(bucket)\
+        .order_by(bucket)\
+        .all()
+
+    return {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'granularity': granularity,
+        'labels': [str(period) for period, _, _ in rows],
+        'income': [cents_to_float(income) for _, income, _ in rows],
+        'expenses': [cents_to_float(expenses) for _, _, expenses in rows],
+        'net': [cents_to_float(income - expenses) for _, income, expenses in rows],
+    }
+
+
+def payload(user_id):
+    """The summary cards and category chart of the analytics page, as plain data.
+
+    The time series is fetched separately from /api/analytics (see series()).
+    """
+    return payload_from(totals(user_id), category_spending(user_id))
+
+
+def payload_from(sums, category_rows):
+    """payload() given the totals() and category_spending() results."""
+    income, expenses, balance = sums
+    return {
+        'income': income,
+        'expenses': expenses,
+        'balance': balance,
+        'categories': [name for name, _ in category_rows],
+        'category_amounts': [amount for _, amount in category_rows],
+    }
+
+
+def _cached(key, compute):
+    cache = current_app.extensions['analytics_cache']
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data)
+    return data
+
+
+def cached_payload(user_id, version=None):
+    """payload(), cached per (user, data version).
+
+    A repeat view with no writes in between costs one version lookup. Writes
+    bump the version, so stale entries are never read and age out of the LRU.
+    """
+    if version is None:
+        version = versioning.data_version(user_id)
+    return _cached(('payload', user_id, version), lambda: payload(user_id))
+
+
+def cached_series(user_id, start, end, granularity, version=None):
+    """series(), cached per (user, data version, window, granularity)."""
+    if version is None:
+        version = versioning.data_version(user_id)
+    return _cached(('series', user_id, version, start, end, granularity),
+                   lambda: series(user_id, start, end, granularity))
@@ -0,0 +1,235 @@
+from datetime import date
+
+import numpy as np
+
+from app import db, versioning
+from app.analytics import _cached
+from app.models import Category, Transaction
+from app.money import from_cents
+
+
+# Columnar, in-memory analytics for exploratory reports over a user's whole
+# history (rolling spend, month-over-month trends, percentiles).
+# A TransactionFrame loads the user's transactions once into three NumPy
+# arrays - day ordinals, amounts in integer cents and category ids - and
+# every metric is a handful of vectorized operations over them (bincount,
+# cumsum, diff) instead of a Python loop per metric. Amounts stay int64
+# cents until they are turned into Decimals or floats on the way out, like
+# app/analytics.py. (bincount sums weights as float64, which is still exact
+# for totals below 2**53 cents.)
+
+ROLLING_WINDOWS = (7, 30)
+PERCENTILES = (50, 90, 99)
+
+# date.toordinal() of 1970-01-01, to move between ordinals and datetime64[D]
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+def _to_float(cents):
+    return (np.asarray(cents, dtype=np.int64) / 100).tolist()
+
+
+def _iso(ordinals):
+    return np.datetime_as_string((np.asarray(ordinals, dtype=np.int64) - _EPOCH).astype('datetime64[D]')).tolist()
+
+
+def _month_start(ordinals):
+    """Ordinal of the first day of each ordinal's month."""
+    days = (ordinals - _EPOCH).astype('datetime64[D]')
+    return days.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) + _EPOCH
+
+
+class TransactionFrame:
+    """One user's transactions as parallel columns, sorted by day.
+
+    `days` are date ordinals, `amounts` signed int64 cents, `categories`
+    category ids. `category_ids`/`category_names` list every category the
+    user owns (ordered by id), so reports keep the categories page labels.
+    """
+
+    def __init__(self, days, amounts, categories, category_ids=(), category_names=()):
+        order = np.argsort(days, kind='stable')
+        self.days = np.asarray(days, dtype=np.int64)[order]
+        self.amounts = np.asarray(amounts, dtype=np.int64)[order]
+        self.categories = np.asarray(categories, dtype=np.int64)[order]
+        self.category_ids = np.asarray(category_ids, dtype=np.int64)
+        self.category_names = list(category_names)
+
+    @classmethod
+    def load(cls, user_id):
+        """Read the user's transactions with one query, straight into arrays."""
+        rows = db.session.execute(
+            db.select(Transaction.date, Transaction.amount_cents, Transaction.category_id)
+            .where(Transaction.user_id == user_id)
+        ).all()
+        count = len(rows)
+        days = np.fromiter((row[0].toordinal() for row in rows), dtype=np.int64, count=count)
+        amounts = np.fromiter((row[1] for row in rows), dtype=np.int64, count=count)
+        categories = np.fromiter((row[2] for row in rows), dtype=np.int64, count=count)
+
+        owned = db.session.execute(
+            db.select(Category.id, Category.name).where(Category.user_id == user_id).order_by(Category.id)
+        ).all()
+        return cls(days, amounts, categories, [c[0] for c in owned], [c[1] for c in owned])
+
+    def __len__(self):
+        return len(self.amounts)
+
+    @property
+    def expenses(self):
+        """Expense amounts as positive cents, 0 for income rows."""
+        return np.where(self.amounts < 0, -self.amounts, 0)
+
+    @property
+    def income(self):
+        return np.where(self.amounts > 0, self.amounts, 0)
+
+    # --- the /analytics metrics -------------------------------------------
+
+    def totals(self):
+        """(income, expenses, balance) as Decimals, like analytics.totals()."""
+        income = int(self.income.sum())
+        expenses = int(self.expenses.sum())
+        return from_cents(income), from_cents(expenses), from_cents(income - expenses)
+
+    def category_spending(self):
+        """[(category_name, spent)] for every owned category, like analytics.category_spending()."""
+        if not len(self.category_ids):
+            return []
+        # category ids -> positions in category_ids; ids the user doesn't own are dropped
+        position = np.searchsorted(self.category_ids, self.categories)
+        position = np.minimum(position, len(self.category_ids) - 1)
+        owned = self.category_ids[position] == self.categories
+        spent = np.bincount(position[owned], weights=self.expenses[owned], minlength=len(self.category_ids))
+        return list(zip(self.category_names, _to_float(spent)))
+
+    def _daily(self):
+        """(day ordinals with activity, income per day, expenses per day) in cents."""
+        days, index = np.unique(self.days, return_inverse=True)
+        income = np.bincount(index, weights=self.income, minlength=len(days)).astype(np.int64)
+        expenses = np.bincount(index, weights=self.expenses, minlength=len(days)).astype(np.int64)
+        return days, income, expenses
+
+    def daily_totals(self):
+        """[(YYYY-MM-DD, net_amount)] for every active day, like analytics.daily_totals()."""
+        days, income, expenses = self._daily()
+        return list(zip(_iso(days), _to_float(income - expenses)))
+
+    def _buckets(self, granularity):
+        if granularity == 'day':
+            return self.days
+        if granularity == 'week':
+            # ordinal 1 (0001-01-01) is a Monday; weeks start on Monday like analytics._bucket()
+            return self.days - (self.days - 1) % 7
+        return _month_start(self.days)
+
+    def series(self, start, end, granularity='day'):
+        """Income, expense and net per period between start and end, like analytics.series()."""
+        window = (self.days >= start.toordinal()) & (self.days <= end.toordinal())
+        buckets, index = np.unique(self._buckets(granularity)[window], return_inverse=True)
+        income = np.bincount(index, weights=self.income[window], minlength=len(buckets)).astype(np.int64)
+        expenses = np.bincount(index, weights=self.expenses[window], minlength=len(buckets)).astype(np.int64)
+        return {
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'granularity': granularity,
+            'labels': _iso(buckets),
+            'income': _to_float(income),
+            'expenses': _to_float(expenses),
+            'net': _to_float(income - expenses),
+        }
+
+    def payload(self):
+        """Same shape as analytics.payload()."""
+        income, expenses, balance = self.totals()
+        category_rows = self.category_spending()
+        return {
+            'income': income,
+            'expenses': expenses,
+            'balance': balance,
+            'categories': [name for name, _ in category_rows],
+            'category_amounts': [amount for _, amount in category_rows],
+        }
+
+    # --- exploratory reports ----------------------------------------------
+
+    def rolling_spend(self, windows=ROLLING_WINDOWS):
+        """Spend over the trailing N days (inclusive) for every calendar day of the history.
+
+        Days without transactions are filled in, so each window really spans
+        N calendar days. Returns {'labels': [...], 'spend_7d': [...], ...}.
+        """
+        if not len(self):
+            return {'labels': [], **{f"spend_{n}d": [] for n in windows}}
+
+        first = int(self.days[0])
+        span = int(self.days[-1]) - first + 1
+        daily = np.bincount(self.days - first, weights=self.expenses, minlength=span).astype(np.int64)
+        running = np.concatenate(([0], np.cumsum(daily)))
+
+        report = {'labels': _iso(np.arange(first, first + span))}
+        for n in windows:
+            ends = np.arange(1, span + 1)
+            report[f"spend_{n}d"] = _to_float(running[ends] - running[np.maximum(ends - n, 0)])
+        return report
+
+    def monthly_deltas(self):
+        """Income, expenses and net per calendar month, with the change from the previous month.
+
+        Empty months between the first and last transaction are included with
+        zeros. `expense_change_pct` is None where the previous month had no spend.
+        """
+        if not len(self):
+            return {'labels': [], 'income': [], 'expenses': [], 'net': [],
+                    'expense_delta': [], 'net_delta': [], 'expense_change_pct': []}
+
+        months = (self.days - _EPOCH).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        first = int(months[0])
+        span = int(months[-1]) - first + 1
+        income = np.bincount(months - first, weights=self.income, minlength=span).astype(np.int64)
+        expenses = np.bincount(months - first, weights=self.expenses, minlength=span).astype(np.int64)
+        net = income - expenses
+
+        expense_delta = np.diff(expenses, prepend=0)
+        net_delta = np.diff(net, prepend=0)
+        previous = np.concatenate(([0], expenses[:-1]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.where(previous > 0, expense_delta / np.where(previous > 0, previous, 1) * 100, np.nan)
+
+        labels = np.datetime_as_string(np.arange(first, first + span).astype('datetime64[M]')).tolist()
+        return {
+            'labels': labels,
+            'income': _to_float(income),
+            'expenses': _to_float(expenses),
+            'net': _to_float(net),
+            'expense_delta': _to_float(expense_delta),
+            'net_delta': _to_float(net_delta),
+            'expense_change_pct': [None if np.isnan(pct) else round(float(pct), 2) for pct in change],
+        }
+
+    def expense_percentiles(self, percentiles=PERCENTILES):
+        """Size of a single expense at each percentile, e.g. {'p50': 12.5, ...}."""
+        spent = -self.amounts[self.amounts < 0]
+        if not len(spent):
+            return {f"p{p}": None for p in percentiles}
+        values = np.percentile(spent, percentiles, method='lower').astype(np.int64)
+        return dict(zip((f"p{p}" for p in percentiles), _to_float(values)))
+
+    def report(self):
+        """Everything above in one JSON-friendly dict."""
+        data = self.payload()
+        data['income'], data['expenses'], data['balance'] = (float(v) for v in self.totals())
+        data.update({
+            'transactions': len(self),
+            'rolling_spend': self.rolling_spend(),
+            'monthly': self.monthly_deltas(),
+            'expense_percentiles': self.expense_percentiles(),
+        })
+        return data
+
+
+def cached_report(user_id, version=None):
+    """TransactionFrame.load(user_id).report(), cached per (user, data version)."""
+    if version is None:
+        version = versioning.data_version(user_id)
+    return _cached(('report', user_id, version), lambda: TransactionFrame.load(user_id).report())
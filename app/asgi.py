@@ -0,0 +1,262 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from itsdangerous import BadSignature
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from werkzeug.http import parse_cookie, parse_etags
+
+from app import analytics, versioning
+from app.engine import create_async_engine
+from app.goals import cache_key as goals_cache_key, goals_json, progress_from, tracked_amounts, user_goals
+from app.pagination import page_json, transactions_page
+
+
+# Async (ASGI) read path for the dashboard data, served with e.g.
+#   uvicorn asgi:app --workers 4
+# GET /transactions/page, /api/analytics, /api/analytics/summary and
+# /api/goals are answered here on an asyncio engine (aiosqlite / asyncpg), so
+# a worker waiting on the database keeps serving other clients instead of
+# being held for the whole request like a sync gunicorn worker.
+#
+# The handlers run the same query functions as the Flask views, on a sync
+# Session driven by AsyncSession.run_sync, and use the same analytics cache
+# keys. Queries of one request that don't depend on each other run
+# concurrently, each on its own connection.
+#
+# Everything else (pages, forms, writes, and any request without a valid
+# login session cookie) goes to the Flask app on a thread pool, so clients
+# see one app. Those responses are buffered, so streamed exports arrive in
+# one piece.
+
+
+class _Request:
+    def __init__(self, scope, headers, user_id):
+        self.user_id = user_id
+        self.args = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+        self.if_none_match = parse_etags(headers.get('if-none-match'))
+
+
+class _Response:
+    def __init__(self, status, body=b'', content_type=None, etag=None):
+        self.status = status
+        self.body = body
+        self.headers = [(b'content-length', str(len(body)).encode())]
+        if content_type:
+            self.headers.append((b'content-type', content_type.encode()))
+        if etag:
+            self.headers += [(b'etag', f'"{etag}"'.encode()), (b'cache-control', b'private, no-cache')]
+
+    async def send(self, send):
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': self.headers})
+        await send({'type': 'http.response.body', 'body': self.body})
+
+
+def _headers(scope):
+    headers = {}
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1').lower(), value.decode('latin-1')
+        if name in headers:
+            value = headers[name] + ('; ' if name == 'cookie' else ', ') + value
+        headers[name] = value
+    return headers
+
+
+def _environ(scope, headers, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': '',
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers.items():
+        key = name.upper().replace('-', '_')
+        environ[key if key in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f"HTTP_{key}"] = value
+    return environ
+
+
+class AsyncApp:
+    """ASGI app: the async read handlers in front of a Flask app."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.engine = create_async_engine(flask_app.config)
+        self.sessions = async_sessionmaker(self.engine)
+        self.cache = flask_app.extensions['analytics_cache']
+        self.page_size = flask_app.config['TRANSACTIONS_PAGE_SIZE']
+        self._urls = flask_app.url_map.bind('localhost')
+        self._signer = flask_app.session_interface.get_signing_serializer(flask_app)
+        self._threads = ThreadPoolExecutor(flask_app.config['ASGI_WSGI_THREADS'], thread_name_prefix='wsgi')
+        self.routes = {
+            '/transactions/page': self.transactions_page,
+            '/api/analytics': self.analytics_series,
+            '/api/analytics/summary': self.analytics_summary,
+            '/api/goals': self.goals,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f"unsupported ASGI scope {scope['type']!r}")
+
+        headers = _headers(scope)
+        handler = self.routes.get(scope['path']) if scope['method'] == 'GET' else None
+        user_id = self._user_id(headers) if handler else None
+        response = await handler(_Request(scope, headers, user_id)) if user_id is not None else None
+        if response is None:
+            # not ours, not logged in, or the user is gone: Flask decides (redirect to login etc.)
+            response = await self._flask(scope, headers, receive)
+        await response.send(send)
+
+    # --- plumbing ---------------------------------------------------------
+
+    def _user_id(self, headers):
+        """The user id Flask-Login stored in the signed session cookie, or None."""
+        cookie = parse_cookie(headers.get('cookie', '')).get(self.flask_app.config['SESSION_COOKIE_NAME'])
+        if not cookie:
+            return None
+        try:
+            session = self._signer.loads(cookie, max_age=int(self.flask_app.permanent_session_lifetime.total_seconds()))
+            return int(session['_user_id'])
+        except (BadSignature, KeyError, TypeError, ValueError):
+            return None
+
+    async def _run(self, fn, *args):
+        """fn(*args, session=...) on its own connection."""
+        async with self.sessions() as session:
+            return await session.run_sync(lambda sync_session: fn(*args, session=sync_session))
+
+    async def _cached(self, key, compute):
+        data = self.cache.get(key)
+        if data is None:
+            data = await compute()
+            self.cache.set(key, data)
+        return data
+
+    def _json(self, data, status=200, etag=None):
+        return _Response(status, f"{self.flask_app.json.dumps(data)}\n".encode(), 'application/json', etag)
+
+    def _url_for(self, endpoint, **values):
+        return self._urls.build(endpoint, values)
+
+    async def _flask(self, scope, headers, receive):
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        environ = _environ(scope, headers, bytes(body))
+        return await asyncio.get_running_loop().run_in_executor(self._threads, self._call_flask, environ)
+
+    def _call_flask(self, environ):
+        started = {}
+        chunks = []
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+            return chunks.append
+
+        result = self.flask_app(environ, start_response)
+        try:
+            chunks.extend(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        response = _Response(started['status'], b''.join(chunks))
+        response.headers = [h for h in started['headers'] if h[0] != b'content-length'] + response.headers
+        return response
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                self._threads.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # --- handlers -----------------------------------------------------------
+    # Each returns None when the user no longer exists, so Flask answers instead.
+
+    async def transactions_page(self, request):
+        version, (rows, next_cursor) = await asyncio.gather(
+            self._run(versioning.data_version, request.user_id),
+            self._run(transactions_page, request.user_id, request.args.get('cursor'), self.page_size),
+        )
+        if version is None:
+            return None
+        return self._json(page_json(rows, next_cursor, self._url_for))
+
+    async def analytics_series(self, request):
+        try:
+            start, end, granularity = analytics.series_window(request.args)
+        except ValueError as e:
+            return self._json({'error': str(e)}, 400)
+
+        user_id = request.user_id
+        version = await self._run(versioning.data_version, user_id)
+        if version is None:
+            return None
+        etag = analytics.etag(user_id, version, start, end, granularity)
+        if etag in request.if_none_match:
+            return _Response(304, etag=etag)
+        data = await self._cached(('series', user_id, version, start, end, granularity),
+                                  lambda: self._run(analytics.series, user_id, start, end, granularity))
+        return self._json(data, etag=etag)
+
+    async def analytics_summary(self, request):
+        user_id = request.user_id
+        version = await self._run(versioning.data_version, user_id)
+        if version is None:
+            return None
+        etag = analytics.etag(user_id, version, 'summary')
+        if etag in request.if_none_match:
+            return _Response(304, etag=etag)
+
+        async def compute():
+            sums, category_rows = await asyncio.gather(
+                self._run(analytics.totals, user_id),
+                self._run(analytics.category_spending, user_id),
+            )
+            return analytics.payload_from(sums, category_rows)
+
+        data = await self._cached(('payload', user_id, version), compute)
+        return self._json(data, etag=etag)
+
+    async def goals(self, request):
+        user_id = request.user_id
+        version, goals = await asyncio.gather(
+            self._run(versioning.data_version, user_id),
+            self._run(user_goals, user_id),
+        )
+        if version is None:
+            return None
+        key = goals_cache_key(user_id, goals, version)
+        amounts = await self._cached(key, lambda: self._run(tracked_amounts, user_id)) if key else {}
+        return self._json(goals_json(goals, progress_from(goals, amounts)))
+
+
+def create_asgi_app(flask_app=None):
+    if flask_app is None:
+        from app import create_app
+        flask_app = create_app()
+    return AsyncApp(flask_app)
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
-from app import db
+from app import db, passwords
 from app.models import User
 from app.forms import RegistrationForm, LoginForm
 
@@ -13,7 +13,11 @@ def register():
     form = RegistrationForm()
     if form.validate_on_submit():
         user = User(username=form.username.data, email=form.email.data)
-        user.set_password(form.password.data)
+        try:
+            passwords.set_password(user, form.password.data)
+        except passwords.HashPoolBusy:
+            flash('We are busy right now, please try again in a moment.', 'warning')
+            return render_template('auth/register.html', form=form), 503
         db.session.add(user)
         db.session.commit()
         flash('Account created successfully! please login.', 'success')
@@ -26,7 +30,14 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
-        if user and user.check_password(form.password.data):
+        try:
+            valid = user is not None and passwords.check(user, form.password.data)
+        except passwords.HashPoolBusy:
+            flash('Too many sign-ins right now, please try again in a moment.', 'warning')
+            return render_template('auth/login.html', form=form), 503
+        if valid:
+            # saves the upgraded hash if check() rehashed an outdated one
+            db.session.commit()
             login_user(user)
             flash('Welcome back', 'success')
             return redirect(url_for('main.transactions'))
@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+from datetime import date
+
+from sqlalchemy import delete, select, update
+
+from app import db, fx, rollups, versioning
+from app.models import Category, Transaction
+
+
+# Batch edit and delete of transactions, for recategorizing or cleaning up
+# many rows at once (e.g. after an import). A selection is a list of ids, a
+# filter (date range, category, description substring) or both, always
+# limited to one user. The matching rows are read once (locked with FOR
+# UPDATE on Postgres) and then changed with a single
+#   UPDATE / DELETE ... WHERE user_id = ? AND id IN (...)
+# The rollup is adjusted with one batched upsert and the data version is
+# bumped, all in the same DB transaction, so totals never see half a batch.
+# Moving foreign-currency rows to another date re-converts them at that
+# date's rates with one more UPDATE (fx.reconvert).
+
+# columns a batch update may set
+FIELDS = ('category_id', 'date', 'description')
+
+
+class BatchError(ValueError):
+    """Raised when a selection or change can't be applied; the message is meant for the user."""
+
+
+@dataclass
+class Selection:
+    ids: tuple = ()
+    date_from: date = None
+    date_to: date = None
+    category_id: int = None
+    description: str = None  # substring, case-insensitive
+
+    def is_empty(self):
+        return not (self.ids or self.date_from or self.date_to or self.category_id or self.description)
+
+    def criteria(self, user_id):
+        clauses = [Transaction.user_id == user_id]
+        if self.ids:
+            clauses.append(Transaction.id.in_(self.ids))
+        if self.date_from:
+            clauses.append(Transaction.date >= self.date_from)
+        if self.date_to:
+            clauses.append(Transaction.date <= self.date_to)
+        if self.category_id:
+            clauses.append(Transaction.category_id == self.category_id)
+        if self.description:
+            pattern = self.description.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            clauses.append(Transaction.description.ilike(f"%{pattern}%", escape='\\'))
+        return clauses
+
+
+def _locked_rows(user_id, selection, limit):
+    """The selected rows as dicts (id plus what the rollup needs), locked until commit on Postgres."""
+    if selection.is_empty():
+        # an empty filter would match every transaction the user has
+        raise BatchError('Select some transactions or set a filter first.')
+
+    rows = db.session.execute(
+        select(Transaction.id, Transaction.user_id, Transaction.category_id, Transaction.date,
+               Transaction.amount_cents)
+        .where(*selection.criteria(user_id))
+        .limit(limit + 1)
+        .with_for_update()
+    ).mappings().all()
+    if len(rows) > limit:
+        raise BatchError(f"The selection matches more than {limit} transactions; narrow it down.")
+    return [dict(row) for row in rows]
+
+
+def delete_transactions(user_id, selection, limit=10000):
+    """Delete the selected transactions and commit. Returns the number of rows deleted."""
+    rows = _locked_rows(user_id, selection, limit)
+    if not rows:
+        return 0
+
+    result = db.session.execute(
+        delete(Transaction).where(Transaction.user_id == user_id, Transaction.id.in_([r['id'] for r in rows])),
+        execution_options={'synchronize_session': False},
+    )
+    rollups.apply_many(removed=rows)
+    versioning.bump(user_id)
+    db.session.commit()
+    return result.rowcount
+
+
+def update_transactions(user_id, selection, changes, limit=10000):
+    """Set `changes` ({column: value}, columns from FIELDS) on the selected transactions and commit.
+
+    Returns the number of rows updated.
+    """
+    changes = {name: value for name, value in changes.items() if value is not None}
+    unknown = changes.keys() - set(FIELDS)
+    if unknown:
+        raise BatchError(f"Can't batch-update {', '.join(sorted(unknown))}.")
+    if not changes:
+        raise BatchError('Choose something to change.')
+    if 'category_id' in changes and not db.session.query(
+            Category.query.filter_by(id=changes['category_id'], user_id=user_id).exists()).scalar():
+        raise BatchError('Unknown category.')
+
+    rows = _locked_rows(user_id, selection, limit)
+    if not rows:
+        return 0
+
+    selected = (Transaction.user_id == user_id, Transaction.id.in_([r['id'] for r in rows]))
+    result = db.session.execute(
+        update(Transaction).where(*selected).values(**changes),
+        execution_options={'synchronize_session': False},
+    )
+    if 'category_id' in changes or 'date' in changes:
+        moved = [{**row, **{k: changes[k] for k in ('category_id', 'date') if k in changes}} for row in rows]
+        if 'date' in changes:
+            try:
+                converted = fx.reconvert(*selected, Transaction.original_amount_cents.isnot(None))
+            except fx.FxError as e:
+                raise BatchError(str(e)) from None
+            if converted:
+                amounts = dict(db.session.execute(
+                    select(Transaction.id, Transaction.amount_cents).where(*selected)
+                ).all())
+                moved = [{**row, 'amount_cents': amounts[row['id']]} for row in moved]
+        rollups.apply_many(added=moved, removed=rows)
+    versioning.bump(user_id)
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,160 @@
+from sqlalchemy import and_, func, select
+
+from app import db
+from app.models import Category, MonthlySpend, Transaction, User
+from app.money import from_cents
+from app.upsert import upsert_increment, upsert_increment_many
+
+
+# Monthly category budgets. Category.budget_cents is the limit; monthly_spend
+# holds each category's month-to-date expenses. The counters are changed by
+# app/rollups.py next to the daily rollup (record/unrecord/apply_many), so
+# every write path (forms, imports, batch edits, recurring rules) keeps them
+# exact in the same DB transaction, with an atomic upsert increment rather
+# than a read-modify-write. Checking a budget after a save is then a primary
+# key lookup, never a scan of the month's transactions.
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def apply(user_id, category_id, day, cents, sign):
+    """Add (sign=1) or take away (sign=-1) one transaction's amount, if it is an expense."""
+    if cents >= 0:
+        return
+    month = month_start(day)
+    upsert_increment(
+        MonthlySpend.__table__,
+        {'user_id': user_id, 'category_id': category_id, 'month': month},
+        {'spent_cents': sign * -cents},
+    )
+    if sign < 0:
+        MonthlySpend.query.filter_by(
+            user_id=user_id, category_id=category_id, month=month, spent_cents=0,
+        ).delete(synchronize_session=False)
+
+
+def apply_many(added=(), removed=()):
+    """Add the expenses of `added` and take away those of `removed` (row dicts, as for rollups.apply_many)."""
+    deltas = {}
+    for rows, sign in ((added, 1), (removed, -1)):
+        for row in rows:
+            if row['amount_cents'] < 0:
+                key = (row['user_id'], row['category_id'], month_start(row['date']))
+                deltas[key] = deltas.get(key, 0) - sign * row['amount_cents']
+
+    upsert_increment_many(
+        MonthlySpend.__table__,
+        ['user_id', 'category_id', 'month'],
+        [{'user_id': u, 'category_id': c, 'month': m, 'spent_cents': cents}
+         for (u, c, m), cents in deltas.items() if cents],
+    )
+
+    if removed:
+        # like the rollup, keep no rows for months without expenses
+        MonthlySpend.query.filter(
+            MonthlySpend.user_id.in_({row['user_id'] for row in removed}),
+            MonthlySpend.spent_cents == 0,
+        ).delete(synchronize_session=False)
+
+
+def overspend(tx):
+    """A warning message if `tx` (an expense, just recorded) put its category over budget, else None."""
+    if tx.amount_cents >= 0:
+        return None
+    row = db.session.execute(
+        select(Category.name, Category.budget_cents, MonthlySpend.spent_cents, User.currency)
+        .join(User, User.id == Category.user_id)
+        .join(MonthlySpend, and_(MonthlySpend.category_id == Category.id,
+                                 MonthlySpend.user_id == tx.user_id,
+                                 MonthlySpend.month == month_start(tx.date)))
+        .where(Category.id == tx.category_id)
+    ).first()
+    if row is None or row.budget_cents is None or row.spent_cents <= row.budget_cents:
+        return None
+    return (f"{row.name} is over budget for {tx.date:%B %Y}: spent {row.currency} {from_cents(row.spent_cents):,.2f} "
+            f"of {row.currency} {from_cents(row.budget_cents):,.2f}.")
+
+
+def month_summary(user_id, month):
+    """Budget, spend and remaining amount (cents) of each of the user's categories for `month`.
+
+    One query over category and monthly_spend; categories with a budget first.
+    """
+    rows = db.session.execute(
+        select(Category.id, Category.name, Category.budget_cents,
+               func.coalesce(MonthlySpend.spent_cents, 0).label('spent_cents'))
+        .outerjoin(MonthlySpend, and_(MonthlySpend.category_id == Category.id,
+                                      MonthlySpend.user_id == user_id,
+                                      MonthlySpend.month == month_start(month)))
+        .where(Category.user_id == user_id)
+        .order_by(Category.budget_cents.is_(None), Category.name)
+    ).all()
+    return [
+        {
+            'category_id': row.id,
+            'name': row.name,
+            'budget_cents': row.budget_cents,
+            'spent_cents': row.spent_cents,
+            'remaining_cents': None if row.budget_cents is None else row.budget_cents - row.spent_cents,
+            'percent': (round(row.spent_cents * 100 / row.budget_cents) if row.budget_cents
+                        else None),
+        }
+        for row in rows
+    ]
+
+
+def _month(day, dialect):
+    if dialect == 'postgresql':
+        return func.date_trunc('month', day).cast(db.Date)
+    return func.date(day, 'start of month', type_=db.Date)
+
+
+def _aggregate_from_transactions():
+    """SELECT producing monthly_spend rows straight from the transaction table."""
+    month = _month(Transaction.date, db.engine.dialect.name)
+    return select(Transaction.user_id, Transaction.category_id, month, func.sum(-Transaction.amount_cents))\
+        .where(Transaction.amount_cents < 0)\
+        .group_by(Transaction.user_id, Transaction.category_id, month)
+
+
+def rebuild(user_id=None, commit=True):
+    """Recompute the counters from the transaction table (for everyone, or one user). Returns row count."""
+    aggregate = _aggregate_from_transactions()
+    delete = MonthlySpend.query
+    if user_id is not None:
+        aggregate = aggregate.where(Transaction.user_id == user_id)
+        delete = delete.filter(MonthlySpend.user_id == user_id)
+
+    delete.delete(synchronize_session=False)
+    db.session.execute(db.insert(MonthlySpend).from_select(
+        ['user_id', 'category_id', 'month', 'spent_cents'], aggregate,
+    ))
+    if not commit:
+        return None
+    db.session.commit()
+
+    query = MonthlySpend.query
+    if user_id is not None:
+        query = query.filter(MonthlySpend.user_id == user_id)
+    return query.count()
+
+
+def verify():
+    """Compare the counters with the raw transactions.
+
+    Returns a list of (user_id, category_id, month, expected, actual) for every
+    key that differs; an empty list means the counters are consistent.
+    """
+    expected = {
+        (u, c, m): cents
+        for u, c, m, cents in db.session.execute(_aggregate_from_transactions())
+    }
+    actual = {(r.user_id, r.category_id, r.month): r.spent_cents for r in MonthlySpend.query.yield_per(1000)}
+
+    return [
+        (*key, expected.get(key), actual.get(key))
+        for key in sorted(expected.keys() | actual.keys())
+        if expected.get(key) != actual.get(key)
+    ]
@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+# Small key/value caches used to skip repeated per-user queries.
+# Two backends share the same get/set/delete interface:
+#   - MemoryCache: in-process LRU, the default, one per worker
+#   - SQLiteCache: a local SQLite file that every worker on the host shares
+# Pick one with CACHE_BACKEND ('memory' or 'sqlite') in config.
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache with optional per-key TTL."""
+
+    def __init__(self, maxsize=1024, default_ttl=None):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.stats.hits += 1
+                    return value
+                del self._data[key]
+            self.stats.misses += 1
+            return None
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Cache stored in a local SQLite file, shared by every worker process.
+
+    Values must be JSON serialisable (tuples come back as lists).
+    """
+
+    def __init__(self, path, default_ttl=None):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+        self._local = threading.local()
+        self._conn().execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)'
+        )
+
+    def _conn(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is not None and (row[1] is None or row[1] > time.time()):
+            self.stats.hits += 1
+            return json.loads(row[0])
+        self.stats.misses += 1
+        return None
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires = time.time() + ttl if ttl else None
+        self._conn().execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires',
+            (key, json.dumps(value), expires),
+        )
+
+    def delete(self, key):
+        self._conn().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        self._conn().execute('DELETE FROM cache')
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+
+def make_cache(config):
+    backend = config['CACHE_BACKEND']
+    ttl = config['CACHE_DEFAULT_TTL']
+    if backend == 'memory':
+        return MemoryCache(maxsize=config['CACHE_MAXSIZE'], default_ttl=ttl)
+    if backend == 'sqlite':
+        path = config['CACHE_SQLITE_PATH']
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return SQLiteCache(path, default_ttl=ttl)
+    raise ValueError(f"unknown CACHE_BACKEND {backend!r}")
+
+
+def init_cache(app):
+    app.extensions['cache'] = make_cache(app.config)
+    # computed analytics payloads are bigger and versioned, so they get their own bounded LRU
+    app.extensions['analytics_cache'] = MemoryCache(maxsize=app.config['ANALYTICS_CACHE_MAXSIZE'])
+    # exchange rates by (currency, date), see app/fx.py
+    app.extensions['fx_rate_cache'] = MemoryCache(maxsize=app.config['FX_RATE_CACHE_MAXSIZE'],
+                                                  default_ttl=app.config['FX_RATE_CACHE_TTL'])
+
+
+def get_cache():
+    return current_app.extensions['cache']
@@ -0,0 +1,51 @@
+from sqlalchemy import select
+
+from app import db, versioning
+from app.cache import get_cache
+from app.models import Category
+from app.upsert import insert_missing
+
+
+# Cached per-user category choice lists for the transaction and goal forms.
+# Anything that creates, renames or deletes a category must call
+# invalidate_categories(user_id) after committing.
+#
+# Names are unique per user (the (user_id, name) index), and categories are
+# created with INSERT ... ON CONFLICT DO NOTHING rather than a SELECT first:
+# the index decides, so concurrent creates of the same name can't both
+# insert and neither fails, and different users never contend.
+
+def _key(user_id):
+    return f"categories:{user_id}"
+
+
+def category_choices(user_id):
+    """Return [(id, name)] for the user's categories, from cache when possible."""
+    cache = get_cache()
+    choices = cache.get(_key(user_id))
+    if choices is None:
+        choices = [(c.id, c.name) for c in Category.query.filter_by(user_id=user_id).order_by(Category.id)]
+        cache.set(_key(user_id), choices)
+    # the shared backends round-trip through JSON, which turns tuples into lists
+    return [tuple(choice) for choice in choices]
+
+
+def invalidate_categories(user_id):
+    get_cache().delete(_key(user_id))
+
+
+def create_category(user_id, name):
+    """Create the user's category `name` unless it exists. Returns (id, created); the caller commits.
+
+    A name that is already taken (even by a concurrent request) is not an error:
+    the existing category's id is returned with created=False.
+    """
+    inserted = insert_missing(Category.__table__, [{'user_id': user_id, 'name': name}], ['id'])
+    if inserted:
+        # a Core insert skips the flush hook that bumps the version of cached analytics
+        versioning.bump(user_id)
+        return inserted[0].id, True
+    existing = db.session.execute(
+        select(Category.id).where(Category.user_id == user_id, Category.name == name)
+    ).scalar_one()
+    return existing, False
@@ -0,0 +1,182 @@
+import json
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app import budgets as budget_counters, fx as exchange, recurring as recurring_rules, rollups as rollup_store, search as search_index
+from app.analytics_frame import TransactionFrame
+from app.importer import StatementError, import_transactions
+from app.models import User
+
+
+# Maintenance commands, available as `flask <group> <command>`.
+
+rollups = AppGroup('rollups', help='Maintain the daily_rollup analytics table.')
+
+
+@rollups.command('rebuild')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def rebuild_rollups(user_id):
+    """Recompute daily rollups from the transaction table."""
+    count = rollup_store.rebuild(user_id)
+    click.echo(f"Rebuilt {count} rollup rows.")
+
+
+@rollups.command('check')
+def check_rollups():
+    """Compare daily rollups with the raw transactions."""
+    mismatches = rollup_store.verify()
+    for user_id, category_id, day, expected, actual in mismatches[:20]:
+        click.echo(f"user={user_id} category={category_id} day={day}: expected {expected}, found {actual}")
+
+    if mismatches:
+        raise click.ClickException(f"{len(mismatches)} rollup rows differ; run `flask rollups rebuild`.")
+    click.echo('Rollups match the transaction table.')
+
+
+budgets = AppGroup('budgets', help='Maintain the monthly_spend budget counters.')
+
+
+@budgets.command('rebuild')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def rebuild_budgets(user_id):
+    """Recompute month-to-date spend counters from the transaction table."""
+    count = budget_counters.rebuild(user_id)
+    click.echo(f"Rebuilt {count} monthly spend rows.")
+
+
+@budgets.command('check')
+def check_budgets():
+    """Compare the monthly spend counters with the raw transactions."""
+    mismatches = budget_counters.verify()
+    for user_id, category_id, month, expected, actual in mismatches[:20]:
+        click.echo(f"user={user_id} category={category_id} month={month}: expected {expected}, found {actual}")
+
+    if mismatches:
+        raise click.ClickException(f"{len(mismatches)} counters differ; run `flask budgets rebuild`.")
+    click.echo('Monthly spend counters match the transaction table.')
+
+
+transactions = AppGroup('transactions', help='Bulk transaction tools.')
+
+
+@transactions.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--email', required=True, help='Owner of the imported transactions.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ofx']), default=None,
+              help='File format (default: from the file extension).')
+@click.option('--batch-size', type=int, default=None, help='Rows per INSERT batch.')
+def import_statement(path, email, fmt, batch_size):
+    """Import a CSV or OFX bank statement."""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException(f"No user with email {email}.")
+
+    fmt = fmt or ('ofx' if path.lower().endswith(('.ofx', '.qfx')) else 'csv')
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+
+    with open(path, newline='', encoding='utf-8-sig') as lines:
+        try:
+            result = import_transactions(user.id, lines, fmt, batch_size)
+        except StatementError as e:
+            raise click.ClickException(str(e))
+
+    click.echo(f"Imported {result.inserted} rows ({result.duplicates} duplicates, "
+               f"{result.invalid} invalid) in {result.seconds:.2f}s "
+               f"- {result.rows_per_second:,.0f} rows/s.")
+
+
+analytics = AppGroup('analytics', help='Exploratory analytics reports.')
+
+
+@analytics.command('report')
+@click.option('--email', required=True, help='Whose history to report on.')
+def analytics_report(email):
+    """Print rolling spend, monthly deltas and percentiles as JSON."""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException(f"No user with email {email}.")
+
+    click.echo(json.dumps(TransactionFrame.load(user.id).report(), indent=2))
+
+
+search = AppGroup('search', help='Maintain the transaction full-text search index.')
+
+
+@search.command('rebuild')
+def rebuild_search():
+    """Re-index every transaction description."""
+    count = search_index.rebuild()
+    click.echo(f"Indexed {count} transactions.")
+
+
+recurring = AppGroup('recurring', help='Materialize recurring transactions.')
+
+
+@recurring.command('run')
+@click.option('--until', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Materialize occurrences up to this date (default: today).')
+@click.option('--batch-size', type=int, default=500, help='Rules per batch (one commit each).')
+def run_recurring(until, batch_size):
+    """Create the transactions of every recurring rule that is due."""
+    result = recurring_rules.run(until.date() if until else None, batch_size)
+    click.echo(f"Created {result.inserted} transactions from {result.rules} rules "
+               f"({result.skipped} already existed) in {result.seconds:.2f}s.")
+    if result.no_rate:
+        click.echo(f"{result.no_rate} rules were left due for lack of an exchange rate; "
+                   f"load the rates with `flask fx load` and run again.")
+
+
+fx = AppGroup('fx', help='Manage exchange rates for multi-currency transactions.')
+
+
+@fx.command('load')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def load_rates(path):
+    """Load exchange rates from a CSV file with date, currency and rate columns.
+
+    A rate is the value of one unit of the currency in FX_BASE_CURRENCY on that
+    date. Transactions affected by the new rates are re-converted.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as lines:
+        try:
+            rates, count = exchange.load_rates(exchange.parse_rates(lines))
+        except exchange.FxError as e:
+            raise click.ClickException(str(e))
+    click.echo(f"Loaded {rates} rates; re-converted {count} transactions.")
+
+
+@fx.command('set')
+@click.argument('currency')
+@click.argument('rate', type=float)
+@click.option('--date', 'day', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Date the rate applies from (default: today).')
+def set_rate(currency, rate, day):
+    """Store the value of one unit of CURRENCY in FX_BASE_CURRENCY."""
+    try:
+        _, count = exchange.set_rate(currency, rate, day.date() if day else None)
+    except exchange.FxError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Stored the rate; re-converted {count} transactions.")
+
+
+@fx.command('reconvert')
+@click.option('--user-id', type=int, default=None, help='Only re-convert this user.')
+def reconvert(user_id):
+    """Re-convert foreign-currency transactions with the stored rates."""
+    try:
+        count = exchange.reconvert_all(user_id)
+    except exchange.FxError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Re-converted {count} transactions.")
+
+
+def register_commands(app):
+    app.cli.add_command(rollups)
+    app.cli.add_command(budgets)
+    app.cli.add_command(transactions)
+    app.cli.add_command(analytics)
+    app.cli.add_command(search)
+    app.cli.add_command(recurring)
+    app.cli.add_command(fx)
@@ -0,0 +1,93 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app import db
+
+
+# Engine tuning profiles (Config.DB_PROFILES, selected with DB_PROFILE).
+#   - Postgres and other server databases get the pool settings: pool size,
+#     overflow, pre-ping (drop dead connections before use) and recycle.
+#   - SQLite gets the profile's pragmas on every new connection: WAL lets
+#     readers run alongside the single writer, busy_timeout makes a writer
+#     wait for the lock instead of failing with "database is locked", and
+#     synchronous/mmap/cache trade durability-on-power-loss and memory for speed.
+
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_pre_ping', 'pool_recycle', 'pool_timeout')
+
+# asyncio drivers for the async read path (app/asgi.py), by backend
+ASYNC_DRIVERS = {'sqlite': 'aiosqlite', 'postgresql': 'asyncpg'}
+
+
+def engine_profile(config):
+    name = config['DB_PROFILE']
+    try:
+        return config['DB_PROFILES'][name]
+    except KeyError:
+        raise ValueError(f"unknown DB_PROFILE {name!r}") from None
+
+
+def _is_sqlite(config):
+    return make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite'
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured profile (pool settings, server databases only)."""
+    if _is_sqlite(config):
+        return {}
+    profile = engine_profile(config)
+    return {name: profile[name] for name in POOL_OPTIONS if name in profile}
+
+
+def sqlite_pragmas(config):
+    if not _is_sqlite(config):
+        return {}
+    return engine_profile(config).get('sqlite_pragmas', {})
+
+
+def _set_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    return on_connect
+
+
+def configure_engine(app):
+    """Merge the profile's pool settings into the engine options. Call before db.init_app()."""
+    # options set explicitly (config or overrides) win over the profile
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+
+
+def install_pragmas(app):
+    """Run the profile's SQLite pragmas on each new connection. Call after db.init_app()."""
+    pragmas = sqlite_pragmas(app.config)
+    if not pragmas:
+        return
+    with app.app_context():
+        event.listen(db.engine, 'connect', _set_pragmas(pragmas))
+
+
+def async_database_url(config):
+    """ASYNC_DATABASE_URL, or SQLALCHEMY_DATABASE_URI with its driver swapped for an asyncio one."""
+    if config.get('ASYNC_DATABASE_URL'):
+        return config['ASYNC_DATABASE_URL']
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"no asyncio driver known for {backend!r}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def create_async_engine(config):
+    """An AsyncEngine on the same database, with the same profile's pool settings and pragmas."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(async_database_url(config), **engine_options(config))
+    pragmas = sqlite_pragmas(config)
+    if pragmas:
+        event.listen(engine.sync_engine, 'connect', _set_pragmas(pragmas))
+    return engine
@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+
+from app import db
+from app.models import Category, Transaction
+from app.money import cents_to_float, from_cents
+
+
+# Streaming exports of a user's full transaction history.
+# Rows are fetched with yield_per (a server-side cursor on Postgres) and
+# written out in small chunks, so memory stays flat however long the
+# history is. The CSV columns match what app/importer.py reads back: amount
+# and currency as the transaction was entered, plus the amount converted to
+# the reporting currency, which the importer ignores.
+
+COLUMNS = ('date', 'description', 'amount', 'currency', 'category', 'reporting_amount')
+
+
+def _rows(user_id, chunk_size):
+    stmt = db.select(Transaction.date, Transaction.description,
+                     db.func.coalesce(Transaction.original_amount_cents, Transaction.amount_cents),
+                     Transaction.currency, Category.name, Transaction.amount_cents)\
+        .join(Category, Category.id == Transaction.category_id)\
+        .where(Transaction.user_id == user_id)\
+        .order_by(Transaction.date, Transaction.id)\
+        .execution_options(yield_per=chunk_size)
+    return db.session.execute(stmt)
+
+
+def iter_csv(user_id, chunk_size=1000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+
+    for i, (day, description, cents, currency, category, reporting_cents) in enumerate(_rows(user_id, chunk_size), 1):
+        writer.writerow((day.isoformat(), description, from_cents(cents), currency, category,
+                         from_cents(reporting_cents)))
+        if i % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def iter_ndjson(user_id, chunk_size=1000):
+    lines = []
+    for day, description, cents, currency, category, reporting_cents in _rows(user_id, chunk_size):
+        lines.append(json.dumps({
+            'date': day.isoformat(),
+            'description': description,
+            'amount': cents_to_float(cents),
+            'currency': currency,
+            'category': category,
+            'reporting_amount': cents_to_float(reporting_cents),
+        }))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
@@ -1,14 +1,18 @@
 from flask_wtf import FlaskForm
-from wtforms import BooleanField, StringField, FloatField, SelectField, DateField, SubmitField, PasswordField, TextAreaField, DecimalField
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import BooleanField, IntegerField, StringField, FloatField, SelectField, DateField, SubmitField, PasswordField, TextAreaField, DecimalField
 from wtforms.validators import DataRequired, NumberRange, Length, Email, Optional, EqualTo
 
+from app.recurring import FREQUENCIES, ScheduleError, validate as validate_schedule
+
 class CategoryForm(FlaskForm):
     name = StringField('Category Name', validators=[DataRequired(), Length(min=2, max=50)])
     submit = SubmitField('Add Category')
 
 class TransactionForm(FlaskForm):
     description = StringField('Description', validators=[DataRequired()])
-    amount = FloatField('Amount (Ksh)', validators=[DataRequired(), NumberRange(min=-1000000, max=1000000)])
+    amount = DecimalField('Amount', places=2, validators=[DataRequired(), NumberRange(min=-1000000, max=1000000)])
+    currency = SelectField('Currency')
     date = DateField('Date', validators=[DataRequired()])
     category_id = SelectField('Category', coerce=int, validators=[DataRequired()])
     submit = SubmitField('Save Transaction')
@@ -32,10 +36,63 @@ class LoginForm(FlaskForm):
 class GoalForm(FlaskForm):
     name = StringField('Goal Name', validators=[DataRequired()])
     description = TextAreaField('Description', validators=[Optional()])
-    target_amount = FloatField('Target Amount', validators=[DataRequired()])
-    current_amount = FloatField('Current Amount', default=0)
+    target_amount = DecimalField('Target Amount', places=2, validators=[DataRequired()])
+    current_amount = DecimalField('Current Amount', places=2, default=0)
     deadline = DateField('Deadline', format='%Y-%m-%d', validators=[DataRequired()])
     category_id = SelectField('Category', coerce=int, validators=[Optional()])
+    track_category = BooleanField('Track progress from this category\'s transactions')
     progress = FloatField('Progress', default=0, validators=[Optional()])
     status = StringField('Status', default='Not Started', validators=[Optional()])
     submit = SubmitField('Save Goal')
+
+class ImportForm(FlaskForm):
+    statement = FileField('Bank Statement', validators=[FileRequired(), FileAllowed(['csv', 'ofx', 'qfx'], 'CSV or OFX files only')])
+    format = SelectField('Format', choices=[('csv', 'CSV'), ('ofx', 'OFX')], default='csv')
+    submit = SubmitField('Import')
+
+class BatchForm(FlaskForm):
+    action = SelectField('Action', choices=[('update', 'Update'), ('delete', 'Delete')])
+    # which rows: the checked ids (posted as `ids`, outside the form) and/or these filters
+    date_from = DateField('From', validators=[Optional()])
+    date_to = DateField('To', validators=[Optional()])
+    category_id = SelectField('Category', coerce=int, default=0, validators=[Optional()])
+    description = StringField('Description contains', validators=[Optional(), Length(max=120)])
+    # what to change on update; empty fields are left alone
+    set_category_id = SelectField('Move to category', coerce=int, default=0, validators=[Optional()])
+    set_date = DateField('Set date', validators=[Optional()])
+    set_description = StringField('Set description', validators=[Optional(), Length(max=120)])
+
+class BudgetForm(FlaskForm):
+    category_id = SelectField('Category', coerce=int, validators=[DataRequired()])
+    limit = DecimalField('Monthly limit', places=2, validators=[Optional(), NumberRange(min=0, max=100000000)])
+    submit = SubmitField('Save Budget')
+
+class SettingsForm(FlaskForm):
+    currency = SelectField('Reporting currency')
+    submit = SubmitField('Save Settings')
+
+class RecurringRuleForm(FlaskForm):
+    description = StringField('Description', validators=[DataRequired(), Length(max=120)])
+    amount = DecimalField('Amount', places=2, validators=[DataRequired(), NumberRange(min=-1000000, max=1000000)])
+    currency = SelectField('Currency')
+    category_id = SelectField('Category', coerce=int, validators=[DataRequired()])
+    frequency = SelectField('Repeats', choices=[(f, f.capitalize()) for f in FREQUENCIES], default='monthly')
+    every = IntegerField('Every', default=1, validators=[Optional(), NumberRange(min=1, max=366)])
+    cron = StringField('Cron schedule', validators=[Optional(), Length(max=100)])
+    start_date = DateField('Starts', validators=[DataRequired()])
+    end_date = DateField('Ends', validators=[Optional()])
+    submit = SubmitField('Save Rule')
+
+    def validate(self, extra_validators=None):
+        if not super().validate(extra_validators):
+            return False
+        if self.frequency.data == 'cron' and not self.cron.data:
+            self.cron.errors.append('Enter a schedule such as "1,15 * *" or "* * mon-fri".')
+            return False
+        try:
+            validate_schedule(self.frequency.data, self.every.data or 1, self.cron.data,
+                              self.start_date.data, self.end_date.data)
+        except ScheduleError as e:
+            (self.cron if self.frequency.data == 'cron' else self.frequency).errors.append(str(e))
+            return False
+        return True
@@ -0,0 +1,307 @@
+import csv
+import math
+from datetime import date
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import BigInteger, Numeric, case, cast, func, literal, or_, select, update
+
+from app import budgets, db, rollups, versioning
+from app.models import Category, FxRate, Goal, Transaction, User
+from app.money import to_cents
+from app.upsert import upsert_many
+
+
+# Multi-currency amounts. A transaction keeps the currency it was made in
+# and, when that isn't its owner's reporting currency, its original amount;
+# amount_cents always holds the amount converted to the reporting currency at
+# the rate of the transaction's date. Conversion happens when rows are
+# written, so rollups, budgets, goals and analytics keep summing one integer
+# column and cost exactly what they did with a single currency.
+#
+#   - one row (the forms): convert(), with rate lookups memoized per
+#     (currency, date, rates version) in the fx_rate_cache
+#   - batches (imports, recurring runs): convert_rows(), one numpy multiply
+#     over the batch and one lookup per distinct (currency, date)
+#   - after new rates or a change of reporting currency: reconvert(), a single
+#     UPDATE that joins each row to its rates in SQL
+#
+# Every load stamps the rates it stores with a new version, and conversions
+# read the latest version (one indexed MAX) before using the memo, so a load
+# from another process (`flask fx load`) takes effect in every web worker at
+# once instead of when their memos expire.
+#
+# Rates are the value of one unit in FX_BASE_CURRENCY; a date without a rate
+# uses the latest earlier one. Converting X to Y is amount * rate(X) / rate(Y),
+# rounded half away from zero like to_cents(), in Python and SQL alike.
+
+
+class FxError(ValueError):
+    """Raised when an amount can't be converted or a rate can't be stored; the message is meant for the user."""
+
+
+def base_currency():
+    return current_app.config['FX_BASE_CURRENCY']
+
+
+def currency_choices():
+    return [(code, code) for code in current_app.config['CURRENCIES']]
+
+
+def reporting_currency(user_id):
+    """The user's reporting currency, read from the database.
+
+    Writes must use this rather than current_user.currency: the user loader
+    caches identities per worker, so after a change in another worker the
+    cached currency can be stale for up to USER_CACHE_TTL.
+    """
+    return db.session.execute(select(User.currency).where(User.id == user_id)).scalar_one()
+
+
+def rates_version():
+    """The version stamped on the latest rate load (0 before any)."""
+    return db.session.execute(select(func.max(FxRate.version))).scalar() or 0
+
+
+def rate(currency, day, version=None):
+    """The value of one unit of `currency` in the base currency on `day`.
+
+    Memoized per (currency, day, version); pass rates_version() when looking
+    up several rates in a row.
+    """
+    if currency == base_currency():
+        return 1.0
+    if version is None:
+        version = rates_version()
+    cache = current_app.extensions['fx_rate_cache']
+    value = cache.get((currency, day, version))
+    if value is None:
+        value = db.session.execute(
+            select(FxRate.rate)
+            .where(FxRate.currency == currency, FxRate.day <= day)
+            .order_by(FxRate.day.desc())
+            .limit(1)
+        ).scalar()
+        if value is None:
+            raise FxError(f"No {currency} exchange rate on or before {day}; load one with `flask fx load`.")
+        cache.set((currency, day, version), value)
+    return value
+
+
+def _round(values):
+    # half away from zero, as to_cents() and SQL round() do
+    return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+
+def convert(cents, from_currency, to_currency, day):
+    """`cents` in from_currency as cents in to_currency, at the rates of `day`."""
+    if from_currency == to_currency:
+        return cents
+    version = rates_version()
+    return int(_round(np.float64(cents) * rate(from_currency, day, version) / rate(to_currency, day, version)))
+
+
+def set_amount(tx, amount, reporting):
+    """Set a transaction's amount from `amount` (a Decimal in tx.currency), given the owner's reporting currency."""
+    cents = to_cents(amount)
+    if tx.currency == reporting:
+        tx.amount_cents, tx.original_amount_cents = cents, None
+    else:
+        tx.amount_cents, tx.original_amount_cents = convert(cents, tx.currency, reporting, tx.date), cents
+
+
+def convert_rows(rows, reporting):
+    """Convert transaction row dicts (as bulk inserts take them) to their owners' reporting currency, in place.
+
+    Each row has user_id, date, currency and amount_cents in that currency;
+    `reporting` maps user_id to the user's reporting currency. Afterwards
+    amount_cents is in the reporting currency and original_amount_cents is
+    set (None for rows already in it). Returns the rows without a rate,
+    which are left as they were.
+    """
+    foreign = []
+    for row in rows:
+        if row['currency'] == reporting[row['user_id']]:
+            row['original_amount_cents'] = None
+        else:
+            foreign.append(row)
+    if not foreign:
+        return []
+
+    rates = {}
+    version = rates_version()
+
+    def lookup(currency, day):
+        if (currency, day) not in rates:
+            try:
+                rates[currency, day] = rate(currency, day, version)
+            except FxError:
+                rates[currency, day] = math.nan
+        return rates[currency, day]
+
+    original = np.array([row['amount_cents'] for row in foreign], dtype=np.float64)
+    rate_from = np.array([lookup(row['currency'], row['date']) for row in foreign])
+    rate_to = np.array([lookup(reporting[row['user_id']], row['date']) for row in foreign])
+    converted = _round(original * rate_from / rate_to)
+
+    missing = []
+    for row, cents in zip(foreign, converted.tolist()):
+        if math.isnan(cents):
+            missing.append(row)
+            continue
+        row['original_amount_cents'] = row['amount_cents']
+        row['amount_cents'] = int(cents)
+    return missing
+
+
+def _rate_sql(currency, day):
+    """SQL for rate(currency, day); `currency` and `day` are column expressions."""
+    latest = select(FxRate.rate)\
+        .where(FxRate.currency == currency, FxRate.day <= day)\
+        .order_by(FxRate.day.desc())\
+        .limit(1)\
+        .scalar_subquery()
+    return case((currency == base_currency(), literal(1.0)), else_=latest)
+
+
+def _reporting_sql(reporting):
+    if reporting is not None:
+        return literal(reporting)
+    return select(User.currency).where(User.id == Transaction.user_id).scalar_subquery()
+
+
+def reconvert(*criteria, reporting=None):
+    """Recompute amount_cents from the original amounts of the transactions matching `criteria`.
+
+    One UPDATE; the rates are joined in SQL. `reporting` is the currency to
+    convert to (default: each owner's current reporting currency). Raises
+    FxError, changing nothing, if a rate is missing. The caller rebuilds the
+    rollups and budget counters and commits. Returns the number of rows updated.
+    """
+    to = _reporting_sql(reporting)
+    day = Transaction.date
+    missing = db.session.execute(
+        select(Transaction.currency, func.min(day))
+        .where(*criteria, Transaction.currency != to,
+               or_(_rate_sql(Transaction.currency, day).is_(None), _rate_sql(to, day).is_(None)))
+        .group_by(Transaction.currency)
+    ).first()
+    if missing is not None:
+        raise FxError(f"No exchange rate for {missing[0]} transactions on {missing[1]} (or no rate for the "
+                      f"reporting currency); load one with `flask fx load`.")
+
+    original = func.coalesce(Transaction.original_amount_cents, Transaction.amount_cents)
+    converted = cast(
+        func.round(cast(original * _rate_sql(Transaction.currency, day) / _rate_sql(to, day), Numeric)),
+        BigInteger,
+    )
+    result = db.session.execute(
+        update(Transaction)
+        .where(*criteria)
+        .values(
+            amount_cents=case((Transaction.currency == to, original), else_=converted),
+            original_amount_cents=case((Transaction.currency == to, None), else_=original),
+        ),
+        execution_options={'synchronize_session': False},
+    )
+    return result.rowcount
+
+
+def _refresh(user_ids):
+    """Rebuild derived data for users whose amounts changed, bump their versions and commit."""
+    for user_id in user_ids:
+        rollups.rebuild(user_id, commit=False)
+        budgets.rebuild(user_id, commit=False)
+    versioning.bump(*user_ids)
+    db.session.commit()
+
+
+def change_reporting_currency(user, currency):
+    """Switch `user` to another reporting currency and commit.
+
+    Transactions are converted at the rates of their dates; budget limits and
+    goal amounts, which have no date, at today's rates.
+    """
+    # not user.currency: current_user may come from another worker's stale cache entry
+    previous = reporting_currency(user.id)
+    if currency == previous:
+        return
+    today = date.today()
+    reconvert(Transaction.user_id == user.id, reporting=currency)
+
+    for category in Category.query.filter(Category.user_id == user.id, Category.budget_cents.isnot(None)):
+        category.budget_cents = convert(category.budget_cents, previous, currency, today)
+    for goal in Goal.query.filter_by(user_id=user.id):
+        goal.target_amount_cents = convert(goal.target_amount_cents, previous, currency, today)
+        if goal.current_amount_cents:
+            goal.current_amount_cents = convert(goal.current_amount_cents, previous, currency, today)
+    user.currency = currency
+    _refresh([user.id])
+
+
+def reconvert_all(user_id=None):
+    """Re-convert every foreign-currency transaction (of everyone, or one user) with the stored
+    rates, rebuild the derived data and commit. Returns the number of transactions re-converted.
+    """
+    criteria = [Transaction.original_amount_cents.isnot(None)]
+    if user_id is not None:
+        criteria.append(Transaction.user_id == user_id)
+    return _reconvert_and_refresh(criteria)
+
+
+def _reconvert_and_refresh(criteria):
+    user_ids = db.session.execute(select(Transaction.user_id).where(*criteria).distinct()).scalars().all()
+    count = reconvert(*criteria) if user_ids else 0
+    _refresh(user_ids)
+    return count
+
+
+def parse_rates(lines):
+    """Yield FxRate row dicts from CSV lines with date, currency and rate columns."""
+    reader = csv.DictReader(lines)
+    headers = {h.strip().lower(): h for h in (reader.fieldnames or [])}
+    missing = {'date', 'currency', 'rate'} - headers.keys()
+    if missing:
+        raise FxError(f"Rates file is missing column(s): {', '.join(sorted(missing))}")
+
+    for line, record in enumerate(reader, 2):
+        try:
+            yield _rate_row(record[headers['currency']], record[headers['date']], record[headers['rate']])
+        except (ValueError, TypeError) as e:
+            raise FxError(f"line {line}: {e}") from None
+
+
+def _rate_row(currency, day, value):
+    currency = (currency or '').strip().upper()
+    if len(currency) != 3 or not currency.isalpha():
+        raise FxError(f"'{currency}' is not a currency code")
+    value = float(value)
+    if not value > 0 or math.isinf(value):
+        raise FxError(f"rate must be a positive number, not {value}")
+    day = day if isinstance(day, date) else date.fromisoformat(day.strip())
+    return {'currency': currency, 'day': day, 'rate': value}
+
+
+def load_rates(rows):
+    """Store rate row dicts (replacing rates for the same currency and day), re-convert the
+    transactions they affect and commit. Returns (rates stored, transactions re-converted).
+    """
+    rows = list({(row['currency'], row['day']): row for row in rows}.values())
+    if not rows:
+        return 0, 0
+    if any(row['currency'] == base_currency() for row in rows):
+        raise FxError(f"{base_currency()} is the base currency; its rate is always 1.")
+
+    version = rates_version() + 1
+    upsert_many(FxRate.__table__, ['currency', 'day'], [{**row, 'version': version} for row in rows])
+
+    # rows converted with an older (or earlier-dated) rate of these currencies
+    since = min(row['day'] for row in rows)
+    count = _reconvert_and_refresh([Transaction.original_amount_cents.isnot(None), Transaction.date >= since])
+    return len(rows), count
+
+
+def set_rate(currency, value, day=None):
+    """Store one rate (for today by default); see load_rates()."""
+    return load_rates([_rate_row(currency, day or date.today(), value)])
+
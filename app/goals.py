@@ -0,0 +1,107 @@
+from collections import namedtuple
+
+from sqlalchemy import and_, func
+
+from app import db, versioning
+from app.analytics import _cached
+from app.models import DailyRollup, Goal
+from app.money import from_cents
+
+
+# Goal progress derived from transactions.
+# A goal with track_category set takes its current amount from the
+# transactions in its category between the day it was created and its
+# deadline, instead of the hand-typed current_amount. The amounts for all of
+# a user's goals come from one grouped query over daily_rollup, cached per
+# (user data version, tracked goals), so a transaction write refreshes them
+# and the goals page stays at a fixed number of queries however many goals
+# there are.
+
+GoalProgress = namedtuple('GoalProgress', 'current_amount progress')
+
+
+def user_goals(user_id, session=None):
+    return (session or db.session).query(Goal).filter(Goal.user_id == user_id).order_by(Goal.deadline).all()
+
+
+def tracked_amounts(user_id, session=None):
+    """Return {goal_id: cents} for the user's category-tracked goals.
+
+    The amount is the size of the category's net movement inside the goal's
+    window, so a savings category fed by expenses and an income category
+    both count up.
+    """
+    net = func.coalesce(func.sum(DailyRollup.income_cents - DailyRollup.expense_cents), 0)
+    rows = (session or db.session).query(Goal.id, net)\
+        .outerjoin(DailyRollup, and_(
+            DailyRollup.user_id == Goal.user_id,
+            DailyRollup.category_id == Goal.category_id,
+            DailyRollup.day >= func.date(Goal.created_at),
+            DailyRollup.day <= Goal.deadline,
+        ))\
+        .filter(Goal.user_id == user_id, Goal.track_category.is_(True), Goal.category_id.isnot(None))\
+        .group_by(Goal.id)\
+        .all()
+
+    return {goal_id: abs(cents) for goal_id, cents in rows}
+
+
+def cached_tracked_amounts(user_id, goals, version=None):
+    """tracked_amounts(), cached until a transaction write or a tracked goal's window changes."""
+    if version is None:
+        version = versioning.data_version(user_id)
+    key = cache_key(user_id, goals, version)
+    if key is None:
+        return {}
+    return _cached(key, lambda: tracked_amounts(user_id))
+
+
+def cache_key(user_id, goals, version):
+    """Cache key for tracked_amounts(), or None when none of the goals is tracked."""
+    # goal edits don't bump the data version, so the tracked goals' windows are part of the key
+    windows = tuple(sorted(
+        (g.id, g.category_id, g.created_at, g.deadline) for g in goals if g.track_category and g.category_id
+    ))
+    return ('goals', user_id, version, windows) if windows else None
+
+
+def goal_progress(user_id, goals):
+    """Return {goal_id: GoalProgress} for the given goals of one user.
+
+    Tracked goals get derived values; the rest keep their stored ones.
+    """
+    return progress_from(goals, cached_tracked_amounts(user_id, goals))
+
+
+def progress_from(goals, amounts):
+    """goal_progress() given the tracked_amounts() result."""
+    progress = {}
+    for goal in goals:
+        if goal.id not in amounts:
+            progress[goal.id] = GoalProgress(goal.current_amount, goal.progress or 0.0)
+            continue
+        current = from_cents(amounts[goal.id])
+        percent = float(current / goal.target_amount * 100) if goal.target_amount > 0 else 0.0
+        progress[goal.id] = GoalProgress(current, percent)
+    return progress
+
+
+def goals_json(goals, progress):
+    """The body of /api/goals."""
+    return {
+        'goals': [
+            {
+                'id': g.id,
+                'name': g.name,
+                'description': g.description,
+                'target_amount': g.target_amount,
+                'current_amount': progress[g.id].current_amount,
+                'progress': progress[g.id].progress,
+                'deadline': g.deadline.isoformat(),
+                'status': g.status,
+                'category_id': g.category_id,
+                'track_category': g.track_category,
+            }
+            for g in goals
+        ],
+    }
@@ -0,0 +1,212 @@
+import csv
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import func
+
+from app import db, fx, rollups, versioning
+from app.categories import create_category, invalidate_categories
+from app.models import Category, Transaction, User
+from app.money import to_cents
+
+
+# Streaming import of bank statements (CSV or OFX).
+# Files are parsed lazily, inserted in batches with one executemany each, and
+# deduplicated against the user's existing (date, amount, currency, description) rows,
+# so re-importing an overlapping export is safe. Rows in another currency than
+# the user's reporting one are converted a batch at a time (fx.convert_rows),
+# and deduplicated on the amount and currency as the statement states them.
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%Y%m%d')
+
+
+class StatementError(ValueError):
+    """Raised when a statement file can't be parsed at all."""
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows(self):
+        return self.inserted + self.duplicates + self.invalid
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _parse_date(value):
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date {value!r}")
+
+
+def parse_csv(lines):
+    """Yield row dicts from a CSV with date, description, amount and optional category and currency columns."""
+    reader = csv.DictReader(lines)
+    headers = {h.strip().lower(): h for h in (reader.fieldnames or [])}
+    missing = {'date', 'description', 'amount'} - headers.keys()
+    if missing:
+        raise StatementError(f"CSV is missing column(s): {', '.join(sorted(missing))}")
+
+    for record in reader:
+        yield {
+            'date': record[headers['date']],
+            'description': record[headers['description']],
+            'amount': record[headers['amount']],
+            'category': record[headers['category']] if 'category' in headers else None,
+            'currency': record[headers['currency']] if 'currency' in headers else None,
+        }
+
+
+OFX_TAG = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def parse_ofx(lines):
+    """Yield row dicts from the <STMTTRN> blocks of an OFX (SGML or XML) statement."""
+    current = None
+    default_currency = None
+    for line in lines:
+        for tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                current = {}
+            elif current is not None and value:
+                current[tag] = value.strip()
+            elif tag == 'CURDEF' and value:
+                default_currency = value.strip()
+        if current is not None and '</STMTTRN>' in line.upper():
+            yield {
+                # DTPOSTED is YYYYMMDD[HHMMSS[.XXX]][TZ]
+                'date': current.get('DTPOSTED', '')[:8],
+                'description': current.get('NAME') or current.get('MEMO') or '',
+                'amount': current.get('TRNAMT', ''),
+                'category': None,
+                # <CURRENCY><CURSYM> inside a transaction overrides the statement's CURDEF
+                'currency': current.get('CURSYM') or default_currency,
+            }
+            current = None
+
+
+PARSERS = {'csv': parse_csv, 'ofx': parse_ofx}
+
+
+def _clean(raw, user_id, category_ids, default_category, default_currency):
+    """Validate one parsed row and turn it into Transaction column values (amount not yet converted)."""
+    description = (raw['description'] or '').strip()[:120]
+    if not description:
+        raise ValueError('empty description')
+    if not raw['amount']:
+        raise ValueError('missing amount')
+    day = _parse_date(raw['date'])
+    amount_cents = to_cents(raw['amount'])
+    currency = (raw.get('currency') or '').strip().upper() or default_currency
+    if len(currency) != 3 or not currency.isalpha():
+        raise ValueError(f"unrecognised currency {currency!r}")
+
+    name = (raw['category'] or '').strip()[:50] or default_category
+    if name not in category_ids:
+        category_ids[name], _ = create_category(user_id, name)
+
+    return {
+        'date': day,
+        'description': description,
+        'amount_cents': amount_cents,
+        'currency': currency,
+        'user_id': user_id,
+        'category_id': category_ids[name],
+    }
+
+
+def _statement_amount(row):
+    return row['amount_cents'] if row['original_amount_cents'] is None else row['original_amount_cents']
+
+
+def _existing_keys(user_id, rows):
+    """Count the user's stored rows per (date, statement amount, currency, description) key of `rows`."""
+    days = [r['date'] for r in rows]
+    amount = func.coalesce(Transaction.original_amount_cents, Transaction.amount_cents)
+    existing = db.session.query(Transaction.date, amount, Transaction.currency, Transaction.description,
+                                func.count())\
+        .filter(Transaction.user_id == user_id)\
+        .filter(Transaction.date.between(min(days), max(days)))\
+        .filter(Transaction.description.in_({r['description'] for r in rows}))\
+        .group_by(Transaction.date, amount, Transaction.currency, Transaction.description)
+    return Counter({(day, cents, currency, description): n for day, cents, currency, description, n in existing})
+
+
+def import_transactions(user_id, lines, fmt='csv', batch_size=1000, default_category='Uncategorized'):
+    """Import a statement for a user. `lines` is any iterable of text lines."""
+    if fmt not in PARSERS:
+        raise StatementError(f"unknown format {fmt!r}; expected one of {', '.join(PARSERS)}")
+
+    started = time.perf_counter()
+    result = ImportResult()
+
+    # name -> id map, so categories are resolved without a query per row
+    category_ids = dict(db.session.query(Category.name, Category.id).filter_by(user_id=user_id))
+    known_categories = len(category_ids)
+    reporting = db.session.query(User.currency).filter_by(id=user_id).scalar()
+
+    # per key: rows this import inserted, and stored rows it matched as duplicates. Identical rows
+    # within the file are separate purchases; only as many as were stored before are skipped.
+    inserted, matched = Counter(), Counter()
+    parsed = PARSERS[fmt](lines)
+    while True:
+        chunk = list(islice(parsed, batch_size))
+        if not chunk:
+            break
+
+        batch = []
+        for raw in chunk:
+            try:
+                batch.append(_clean(raw, user_id, category_ids, default_category, reporting))
+            except (KeyError, ValueError, AttributeError, ArithmeticError):
+                result.invalid += 1
+
+        # rows in a currency without a rate for their date are invalid too
+        no_rate = fx.convert_rows(batch, {user_id: reporting})
+        if no_rate:
+            result.invalid += len(no_rate)
+            skip = {id(row) for row in no_rate}
+            batch = [row for row in batch if id(row) not in skip]
+
+        if batch:
+            stored = _existing_keys(user_id, batch)
+            fresh = []
+            for row in batch:
+                key = (row['date'], _statement_amount(row), row['currency'], row['description'])
+                if stored[key] - inserted[key] - matched[key] > 0:
+                    matched[key] += 1
+                    result.duplicates += 1
+                    continue
+                inserted[key] += 1
+                fresh.append(row)
+
+            if fresh:
+                db.session.execute(db.insert(Transaction), fresh)
+                rollups.record_many(fresh)
+                versioning.bump(user_id)
+                result.inserted += len(fresh)
+
+        # one commit per batch keeps locks and memory bounded; dedup makes re-runs safe
+        db.session.commit()
+
+    if len(category_ids) != known_categories:
+        invalidate_categories(user_id)
+
+    result.seconds = time.perf_counter() - started
+    return result
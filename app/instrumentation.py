@@ -0,0 +1,250 @@
+import heapq
+import logging
+import re
+import threading
+import time
+
+from flask import (current_app, g, has_request_context, request, before_render_template, request_finished,
+                   request_started, template_rendered)
+from sqlalchemy import event
+
+from app import db
+
+
+# Per-request timing: SQL (count, total time, slowest statements), template
+# rendering and the whole request, per endpoint. Turned on with
+# INSTRUMENTATION_ENABLED; when it is off nothing below is registered, so
+# requests pay nothing. When on, the numbers come out three ways:
+#   - a Server-Timing header on every response (visible in browser devtools)
+#   - /metrics in Prometheus text format (per worker process)
+#   - a warning on the `app.instrumentation` logger for requests slower
+#     than SLOW_REQUEST_MS, with the slowest statements
+
+log = logging.getLogger('app.instrumentation')
+
+# request duration histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _normalize(statement, limit=200):
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    return statement if len(statement) <= limit else statement[:limit - 3] + '...'
+
+
+class RequestTimings:
+    """What one request spent, collected on flask.g."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.render_seconds = 0.0
+        self.statements = []  # (seconds, raw statement)
+        self._render_started = []
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+class EndpointStats:
+    def __init__(self, keep):
+        self.keep = keep
+        self.requests = {}  # (method, status) -> count
+        self.buckets = [0] * len(BUCKETS)
+        self.seconds = 0.0
+        self.count = 0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.render_seconds = 0.0
+        self.slowest = {}  # statement -> worst seconds, at most `keep` statements
+
+    def add(self, method, status, seconds, timings):
+        key = (method, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+        self.seconds += seconds
+        self.count += 1
+        self.queries += timings.queries
+        self.sql_seconds += timings.sql_seconds
+        self.render_seconds += timings.render_seconds
+        for seconds, statement in heapq.nlargest(self.keep, timings.statements):
+            if len(self.slowest) == self.keep and seconds <= min(self.slowest.values()):
+                break  # sorted slowest first, so nothing further qualifies
+            statement = _normalize(statement)
+            if statement in self.slowest or len(self.slowest) < self.keep:
+                self.slowest[statement] = max(seconds, self.slowest.get(statement, 0.0))
+            else:
+                del self.slowest[min(self.slowest, key=self.slowest.get)]
+                self.slowest[statement] = seconds
+
+
+class Registry:
+    """Per-endpoint totals for this process."""
+
+    def __init__(self, keep=5):
+        self.keep = keep
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, method, status, seconds, timings):
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats(self.keep)
+            stats.add(method, status, seconds, timings)
+
+    def prometheus(self):
+        """The totals in Prometheus text exposition format."""
+        def labels(**values):
+            return ','.join(f'{name}="{_escape(value)}"' for name, value in values.items())
+
+        lines = [
+            '# HELP budget_requests_total Requests handled, by endpoint, method and status.',
+            '# TYPE budget_requests_total counter',
+        ]
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            for endpoint, stats in endpoints:
+                for (method, status), count in sorted(stats.requests.items()):
+                    lines.append(f"budget_requests_total{{{labels(endpoint=endpoint, method=method, status=status)}}} {count}")
+
+            lines += [
+                '# HELP budget_request_duration_seconds Time to build the response.',
+                '# TYPE budget_request_duration_seconds histogram',
+            ]
+            for endpoint, stats in endpoints:
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    lines.append(f"budget_request_duration_seconds_bucket{{{labels(endpoint=endpoint, le=bound)}}} {count}")
+                lines.append(f"budget_request_duration_seconds_bucket{{{labels(endpoint=endpoint, le='+Inf')}}} {stats.count}")
+                lines.append(f"budget_request_duration_seconds_sum{{{labels(endpoint=endpoint)}}} {stats.seconds:.6f}")
+                lines.append(f"budget_request_duration_seconds_count{{{labels(endpoint=endpoint)}}} {stats.count}")
+
+            for name, kind, help_text, attribute, fmt in (
+                ('budget_sql_queries_total', 'counter', 'SQL statements executed.', 'queries', '{}'),
+                ('budget_sql_duration_seconds_total', 'counter', 'Time spent in SQL.', 'sql_seconds', '{:.6f}'),
+                ('budget_render_duration_seconds_total', 'counter', 'Time spent rendering templates.',
+                 'render_seconds', '{:.6f}'),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for endpoint, stats in endpoints:
+                    lines.append(f"{name}{{{labels(endpoint=endpoint)}}} {fmt.format(getattr(stats, attribute))}")
+
+            lines += [
+                '# HELP budget_sql_slowest_statement_seconds Slowest statements seen, per endpoint.',
+                '# TYPE budget_sql_slowest_statement_seconds gauge',
+            ]
+            for endpoint, stats in endpoints:
+                for statement, seconds in sorted(stats.slowest.items(), key=lambda item: -item[1]):
+                    lines.append(f"budget_sql_slowest_statement_seconds{{{labels(endpoint=endpoint, statement=statement)}}} "
+                                 f"{seconds:.6f}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _timings():
+    return g.get('_timings') if has_request_context() else None
+
+
+# --- hooks ---------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _timings() is not None:
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _timings()
+    started = conn.info.get('_query_started')
+    if timings is None or not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+    timings.queries += 1
+    timings.sql_seconds += seconds
+    timings.statements.append((seconds, statement))
+
+
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute
+    started = context.connection.info.get('_query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def _start_request(sender, **extra):
+    g._timings = RequestTimings()
+
+
+def _before_render(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None:
+        timings._render_started.append((time.perf_counter(), timings.sql_seconds))
+
+
+def _rendered(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None and timings._render_started:
+        started, sql_before = timings._render_started.pop()
+        # queries run from the template (lazy loads) are already counted as SQL
+        timings.render_seconds += time.perf_counter() - started - (timings.sql_seconds - sql_before)
+
+
+def _finish_request(sender, response, **extra):
+    # sent after the after_request handlers, just before the response goes out
+    timings = _timings()
+    if timings is None:
+        return
+    seconds = timings.elapsed
+    app = sender
+
+    response.headers['Server-Timing'] = ', '.join((
+        f'sql;dur={timings.sql_seconds * 1000:.1f};desc="{timings.queries} queries"',
+        f'render;dur={timings.render_seconds * 1000:.1f}',
+        f'app;dur={seconds * 1000:.1f}',
+    ))
+
+    endpoint = request.endpoint or '<unmatched>'
+    app.extensions['instrumentation'].record(endpoint, request.method, response.status_code, seconds, timings)
+
+    if seconds * 1000 >= app.config['SLOW_REQUEST_MS']:
+        slowest = heapq.nlargest(app.config['INSTRUMENTATION_SLOWEST_STATEMENTS'], timings.statements)
+        log.warning(
+            'slow request %s %s (%s) %.0f ms: sql %.0f ms in %d queries, render %.0f ms%s',
+            request.method, request.path, endpoint, seconds * 1000,
+            timings.sql_seconds * 1000, timings.queries, timings.render_seconds * 1000,
+            ''.join(f"\n  {s * 1000:.1f} ms  {_normalize(statement)}" for s, statement in slowest),
+        )
+
+
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return current_app.response_class('unauthorized\n', status=401, mimetype='text/plain')
+    return current_app.response_class(
+        current_app.extensions['instrumentation'].prometheus(),
+        mimetype='text/plain; version=0.0.4',
+    )
+
+
+def init_instrumentation(app):
+    """Register the hooks and /metrics, only if INSTRUMENTATION_ENABLED is set."""
+    if not app.config['INSTRUMENTATION_ENABLED']:
+        return
+
+    app.extensions['instrumentation'] = Registry(keep=app.config['INSTRUMENTATION_SLOWEST_STATEMENTS'])
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(db.engine, 'handle_error', _handle_error)
+    request_started.connect(_start_request, app)
+    request_finished.connect(_finish_request, app)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.add_url_rule('/metrics', 'metrics', metrics)
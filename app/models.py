@@ -1,15 +1,18 @@
 from app import db
 from datetime import datetime
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+
+from app import passwords
+from app.money import from_cents, to_cents
 
 # Goals table
 class Goal(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    target_amount = db.Column(db.Float, default=0, nullable=False)
-    current_amount = db.Column(db.Float, default=0.0)
+    # money is stored in integer cents; target_amount/current_amount below present Decimals
+    target_amount_cents = db.Column(db.BigInteger, default=0, nullable=False)
+    current_amount_cents = db.Column(db.BigInteger, default=0)
     deadline = db.Column(db.Date, nullable=False)
     progress = db.Column(db.Float, default=0.0)
     status = db.Column(db.String(50), default="Not Started")
@@ -19,9 +22,31 @@ class Goal(db.Model):
 
     # optional: Link to category for financial grouping
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
+    # derive current_amount/progress from the category's transactions (see app/goals.py)
+    track_category = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_goal_user_id_deadline', 'user_id', 'deadline'),
+    )
+
+    @property
+    def target_amount(self):
+        return from_cents(self.target_amount_cents)
+
+    @target_amount.setter
+    def target_amount(self, value):
+        self.target_amount_cents = to_cents(value)
+
+    @property
+    def current_amount(self):
+        return from_cents(self.current_amount_cents)
+
+    @current_amount.setter
+    def current_amount(self, value):
+        self.current_amount_cents = to_cents(value)
+
     def __repr__(self):
         return f"<Goal {self.name} - {self.status}>"
         
@@ -31,26 +56,50 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(50), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
+    # bumped on every write to the user's transactions or categories (see app/versioning.py)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # reporting currency: Transaction.amount_cents, budgets and goals are in this currency
+    currency = db.Column(db.String(3), nullable=False, default='KES', server_default='KES')
 
     transactions = db.relationship('Transaction', backref='user', lazy=True)
     categories = db.relationship('Category', backref='user', lazy=True)
     goals = db.relationship('Goal', backref='user', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password, passwords.hash_method())
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # a match against an outdated hash swaps in a fresh one; the caller commits it
+        matches, new_hash = passwords.verify(self.password_hash, password, passwords.hash_method())
+        if new_hash is not None:
+            self.password_hash = new_hash
+        return matches
 
 
 # category table
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), nullable=False, unique=True)
+    # unique per user (ix_category_user_id_name), not globally
+    name = db.Column(db.String(50), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_category_user_id'), nullable=False)
+    # monthly spending limit in cents (None for no limit); see app/budgets.py
+    budget_cents = db.Column(db.BigInteger, nullable=True)
     # relationship to transaction
     transactions = db.relationship('Transaction', backref='category_ref', lazy=True)
 
+    __table_args__ = (
+        # also serves the lookups by user_id alone
+        db.Index('ix_category_user_id_name', 'user_id', 'name', unique=True),
+    )
+
+    @property
+    def budget(self):
+        return None if self.budget_cents is None else from_cents(self.budget_cents)
+
+    @budget.setter
+    def budget(self, value):
+        self.budget_cents = None if value is None else to_cents(value)
+
     def __repr__(self):
         return f'<Category {self.name}>'
 
@@ -58,10 +107,140 @@ class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     date=db.Column(db.Date, default=datetime.utcnow)
     description = db.Column(db.String(120), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    # integer cents in the owner's reporting currency, negative for expenses; `amount` below
+    # presents it as a Decimal. Everything that sums money reads this column.
+    amount_cents = db.Column(db.BigInteger, nullable=False)
+    # the currency the transaction was made in, and its amount in that currency when that is
+    # not the reporting currency (None otherwise); see app/fx.py
+    currency = db.Column(db.String(3), nullable=False, default='KES', server_default='KES')
+    original_amount_cents = db.Column(db.BigInteger, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', name='fk_trnsaction_user_id'), nullable=False)
     # foregin key to category
     category_id = db.Column(db.Integer, db.ForeignKey('category.id', name='fk_transaction_category_id'), nullable=False)
 
+    # every route filters on user_id; the list pages by (date, id) and analytics groups by category
+    __table_args__ = (
+        db.Index('ix_transaction_user_id_date_id', 'user_id', 'date', 'id'),
+        db.Index('ix_transaction_user_id_category_id', 'user_id', 'category_id'),
+    )
+
+    @property
+    def amount(self):
+        return from_cents(self.amount_cents)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = to_cents(value)
+
+    @property
+    def original_amount(self):
+        return from_cents(self.original_amount_cents)
+
+    def __repr__(self):
+        return f"<Transaction {self.description} - {self.amount}>"
+
+
+# Per-user, per-category, per-day totals kept in step with Transaction writes.
+# Analytics reads these O(days) rows instead of scanning every transaction.
+class DailyRollup(db.Model):
+    __tablename__ = 'daily_rollup'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    income_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    expense_cents = db.Column(db.BigInteger, nullable=False, default=0)  # stored as a positive number
+    income_count = db.Column(db.Integer, nullable=False, default=0)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_daily_rollup_user_id_day', 'user_id', 'day'),
+    )
+
+    def __repr__(self):
+        return f"<DailyRollup {self.user_id} {self.category_id} {self.day}>"
+
+
+# Month-to-date spend per user, category and month (the month's first day),
+# kept in step with Transaction writes like DailyRollup. Budget checks and the
+# budgets page read one row per category instead of the month's transactions.
+class MonthlySpend(db.Model):
+    __tablename__ = 'monthly_spend'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    spent_cents = db.Column(db.BigInteger, nullable=False, default=0)  # expenses, as a positive number
+
+    def __repr__(self):
+        return f"<MonthlySpend {self.user_id} {self.category_id} {self.month}>"
+
+
+# A transaction that repeats on a schedule (rent, salary, subscriptions).
+# `flask recurring run` turns due occurrences into Transaction rows; see app/recurring.py.
+class RecurringRule(db.Model):
+    __tablename__ = 'recurring_rule'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    description = db.Column(db.String(120), nullable=False)
+    # in the rule's own currency; converted when an occurrence is materialized
+    amount_cents = db.Column(db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default='KES', server_default='KES')
+    # 'daily', 'weekly' or 'monthly' (every `every` days/weeks/months from start_date), or
+    # 'cron' (the dates matching the day-of-month, month and day-of-week fields of `cron`)
+    frequency = db.Column(db.String(10), nullable=False)
+    every = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    cron = db.Column(db.String(100), nullable=True)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=True)
+    # first occurrence not materialized yet; None once the schedule has ended
+    next_date = db.Column(db.Date, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    category = db.relationship('Category')
+
+    __table_args__ = (
+        db.Index('ix_recurring_rule_user_id', 'user_id'),
+        db.Index('ix_recurring_rule_next_date', 'next_date'),
+    )
+
+    @property
+    def amount(self):
+        return from_cents(self.amount_cents)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = to_cents(value)
+
+    def __repr__(self):
+        return f"<RecurringRule {self.description} {self.frequency}>"
+
+
+# One row per occurrence a rule has materialized, so running the scheduler
+# twice (or two schedulers at once) never creates the same transaction again.
+class RecurringOccurrence(db.Model):
+    __tablename__ = 'recurring_occurrence'
+
+    rule_id = db.Column(db.Integer, db.ForeignKey('recurring_rule.id'), primary_key=True)
+    occurrence_date = db.Column(db.Date, primary_key=True)
+
+    def __repr__(self):
+        return f"<RecurringOccurrence {self.rule_id} {self.occurrence_date}>"
+
+
+# Exchange rates: the value of one unit of `currency` in FX_BASE_CURRENCY on `day`.
+# Loaded from a file or the CLI (`flask fx load/set`); a day without a row uses the
+# latest earlier rate.
+class FxRate(db.Model):
+    __tablename__ = 'fx_rate'
+
+    currency = db.Column(db.String(3), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    rate = db.Column(db.Float, nullable=False)
+    # the load that stored this rate (see fx.rates_version); part of the rate memo's key
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+
     def __repr__(self):
-        return f"<Transaction {self.description} - {self.amount}>"
\ No newline at end of file
+        return f"<FxRate {self.currency} {self.day} {self.rate}>"
@@ -0,0 +1,30 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+
+# Amounts are stored as integer cents (Ksh minor units) so that totals are
+# exact and can be summed entirely in SQL. Forms and templates work with
+# Decimals; these helpers convert at the edges.
+
+CENT = Decimal('0.01')
+
+
+def to_cents(value):
+    """Convert a Decimal, float, int or numeric string to integer cents (half-up)."""
+    if value is None:
+        return None
+    if not isinstance(value, Decimal):
+        # go through str() so 0.1 becomes Decimal('0.1'), not its binary expansion
+        value = Decimal(str(value).replace(',', '').strip())
+    return int((value * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """Integer cents -> Decimal with two places."""
+    if cents is None:
+        return None
+    return (Decimal(int(cents)) / 100).quantize(CENT)
+
+
+def cents_to_float(cents):
+    """For JSON/chart output: the nearest float to the exact 2dp amount."""
+    return int(cents or 0) / 100
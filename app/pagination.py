@@ -0,0 +1,73 @@
+from datetime import date
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Transaction
+from app.money import cents_to_float
+
+
+# Keyset (cursor) pagination for the transactions list.
+# Rows are ordered by (date DESC, id DESC) and a cursor is the (date, id) of the
+# last row on the previous page, so every page costs the same no matter how
+# deep into the history the user has scrolled.
+
+def encode_cursor(tx):
+    return f"{tx.date.isoformat()}_{tx.id}"
+
+
+def decode_cursor(cursor):
+    """Turn 'YYYY-MM-DD_id' back into (date, id). Returns None if malformed."""
+    try:
+        day, tx_id = cursor.split('_', 1)
+        return date.fromisoformat(day), int(tx_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def transactions_page(user_id, cursor=None, limit=50, session=None):
+    """Return (rows, next_cursor) for one page of a user's transactions.
+
+    next_cursor is None when there are no more rows.
+    """
+    # the list shows each row's category name, so load it in the same query
+    query = (session or db.session).query(Transaction).options(joinedload(Transaction.category_ref))\
+        .filter(Transaction.user_id == user_id)
+
+    after = decode_cursor(cursor) if cursor else None
+    if after:
+        last_date, last_id = after
+        # row-value comparison lets SQLite and Postgres seek the (user_id, date, id) index
+        query = query.filter(tuple_(Transaction.date, Transaction.id) < tuple_(last_date, last_id))
+
+    # fetch one extra row to know whether another page exists
+    rows = query.order_by(Transaction.date.desc(), Transaction.id.desc())\
+        .limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def page_json(rows, next_cursor, url_for):
+    """The body of /transactions/page. url_for(endpoint, **values) builds the row links."""
+    return {
+        'transactions': [
+            {
+                'id': t.id,
+                'date': t.date.strftime('%Y-%m-%d'),
+                'description': t.description,
+                'category': t.category_ref.name if t.category_ref else 'Uncategorized',
+                'amount': cents_to_float(t.amount_cents),
+                'currency': t.currency,
+                'original_amount': (cents_to_float(t.original_amount_cents)
+                                    if t.original_amount_cents is not None else None),
+                'edit_url': url_for('main.edit_transaction', id=t.id),
+                'delete_url': url_for('main.delete_transaction', id=t.id),
+            }
+            for t in rows
+        ],
+        'next_cursor': next_cursor,
+    }
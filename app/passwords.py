@@ -0,0 +1,101 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+# Password hashing with a configurable method and cost (PASSWORD_HASH_METHOD,
+# any werkzeug method string such as 'scrypt:32768:8:1' or
+# 'pbkdf2:sha256:600000'). A successful check against a hash made with other
+# parameters returns a fresh hash, so stored hashes follow the setting as
+# users log in.
+#
+# Hashing is deliberately slow, so login/register can run it on a small
+# per-worker thread pool (PASSWORD_HASH_WORKERS > 0). At most
+# PASSWORD_HASH_QUEUE more requests wait for it; anything past that, or
+# waiting longer than PASSWORD_HASH_TIMEOUT, gets HashPoolBusy instead of
+# tying up a request thread. This helps threaded workers (gunicorn
+# --threads / gthread): other requests keep running during a login burst.
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class HashPoolBusy(Exception):
+    pass
+
+
+def hash_method():
+    if has_app_context():
+        return current_app.config['PASSWORD_HASH_METHOD']
+    return DEFAULT_METHOD
+
+
+@lru_cache(maxsize=16)
+def _prefix(method):
+    # werkzeug fills in default parameters ('pbkdf2' -> 'pbkdf2:sha256:600000'),
+    # so take the prefix from a real hash rather than from the setting
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def needs_rehash(pwhash, method):
+    return pwhash.split('$', 1)[0] != _prefix(method)
+
+
+def hash_password(password, method):
+    return generate_password_hash(password, method)
+
+
+def verify(pwhash, password, method):
+    """Return (matches, new_hash). new_hash is set when a match used outdated parameters."""
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if needs_rehash(pwhash, method):
+        return True, hash_password(password, method)
+    return True, None
+
+
+class HashPool:
+    """A fixed number of hashing threads with a bounded number of waiting requests."""
+
+    def __init__(self, workers, queue_size, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashPoolBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+
+def _run(fn, *args):
+    pool = current_app.extensions.get('password_pool')
+    return pool.run(fn, *args) if pool is not None else fn(*args)
+
+
+def check(user, password):
+    """user.check_password(), with the hashing on the pool when one is configured."""
+    matches, new_hash = _run(verify, user.password_hash, password, hash_method())
+    if new_hash is not None:
+        user.password_hash = new_hash
+    return matches
+
+
+def set_password(user, password):
+    """user.set_password(), with the hashing on the pool when one is configured."""
+    user.password_hash = _run(hash_password, password, hash_method())
+
+
+def init_passwords(app):
+    workers = app.config['PASSWORD_HASH_WORKERS']
+    if workers > 0:
+        app.extensions['password_pool'] = HashPool(
+            workers, app.config['PASSWORD_HASH_QUEUE'], app.config['PASSWORD_HASH_TIMEOUT'])
@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import db
+
+
+# Helpers for counting the SQL statements a block of code issues.
+# Used by tests/test_query_counts.py and benchmarks/check_query_counts.py to catch
+# N+1 query patterns:
+#
+#     with assert_max_queries(3):
+#         client.get('/transactions')
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Count every statement sent to `engine` (db.engine by default) inside the block."""
+    engine = engine or db.engine
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._record)
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    """Fail with the offending statements if the block issues more than `limit` queries."""
+    with count_queries(engine) as counter:
+        yield counter
+
+    if counter.count > limit:
+        listing = '\n'.join(f"  {i}. {s}" for i, s in enumerate(counter.statements, 1))
+        raise AssertionError(f"expected at most {limit} queries, got {counter.count}:\n{listing}")
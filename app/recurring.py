@@ -0,0 +1,253 @@
+import calendar
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+
+from sqlalchemy import bindparam, select, update
+
+from app import db, fx, rollups, versioning
+from app.models import RecurringOccurrence, RecurringRule, Transaction, User
+from app.upsert import insert_missing
+
+
+# Recurring transactions. A RecurringRule describes a schedule; `flask
+# recurring run` (from cron or a timer) materializes every occurrence due by
+# today as a Transaction. Rules are read in batches of due ones (next_date <=
+# today, locked with FOR UPDATE SKIP LOCKED on Postgres so schedulers can run
+# side by side), and each batch is written with a handful of statements:
+#   - one numpy conversion of the due amounts to their owners' reporting
+#     currencies (fx.convert_rows); a rule whose rate is missing is left as it
+#     is, with nothing recorded, and picked up by the run after the rate is loaded
+#   - one INSERT ... ON CONFLICT DO NOTHING RETURNING into recurring_occurrence,
+#     whose (rule_id, occurrence_date) key makes re-runs and overlaps harmless
+#   - one executemany INSERT of the transactions for the occurrences that were new
+#   - one batched rollup upsert, one data version bump and one executemany
+#     UPDATE moving each rule's next_date past today
+# then committed, so a batch is all or nothing.
+
+FREQUENCIES = ('daily', 'weekly', 'monthly', 'cron')
+
+ONE_DAY = timedelta(days=1)
+# a cron schedule must match some date this far ahead (8 years always includes a 29 February)
+CRON_HORIZON = timedelta(days=8 * 366)
+
+MONTH_NAMES = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+WEEKDAY_NAMES = ('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat')
+
+
+class ScheduleError(ValueError):
+    """Raised for a schedule that can't be used; the message is meant for the user."""
+
+
+@dataclass(frozen=True)
+class CronSpec:
+    days: frozenset
+    months: frozenset
+    weekdays: frozenset  # 0 is Sunday, as in cron
+    any_day: bool
+    any_weekday: bool
+
+    def matches(self, day):
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = day.isoweekday() % 7 in self.weekdays
+        # cron rule: when both day fields are restricted, either one may match
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+
+def _cron_value(text, low, high, names):
+    if text in names:
+        return names.index(text) + low
+    if not text.isdigit() or not low <= int(text) <= high:
+        raise ScheduleError(f"'{text}' is not between {low} and {high}.")
+    return int(text)
+
+
+def _cron_field(text, low, high, names=()):
+    values = set()
+    for part in text.lower().split(','):
+        span, _, step = part.partition('/')
+        if step and (not step.isdigit() or int(step) == 0):
+            raise ScheduleError(f"Bad step in '{part}'.")
+        if span == '*':
+            first, last = low, high
+        else:
+            start, _, end = span.partition('-')
+            first = _cron_value(start, low, high, names)
+            # 'a/n' runs from a to the end of the range, like cron
+            last = _cron_value(end, low, high, names) if end else (high if step else first)
+        values.update(range(first, last + 1, int(step or 1)))
+    return frozenset(values)
+
+
+@lru_cache(maxsize=1024)
+def parse_cron(spec):
+    """Parse 'day-of-month month day-of-week' (or a 5-field crontab line, whose minute and hour are ignored)."""
+    fields = (spec or '').split()
+    if len(fields) == 5:
+        fields = fields[2:]
+    if len(fields) != 3:
+        raise ScheduleError('A cron schedule has 3 fields (day of month, month, day of week) or 5.')
+    day_field, month_field, weekday_field = fields
+    weekdays = _cron_field(weekday_field, 0, 7, WEEKDAY_NAMES)
+    return CronSpec(
+        days=_cron_field(day_field, 1, 31),
+        months=_cron_field(month_field, 1, 12, MONTH_NAMES),
+        weekdays=frozenset(d % 7 for d in weekdays),
+        any_day=day_field.startswith('*'),
+        any_weekday=weekday_field.startswith('*'),
+    )
+
+
+def _add_months(day, months):
+    year, month = divmod(day.month - 1 + months, 12)
+    year, month = day.year + year, month + 1
+    # the 31st of a rule falls on the last day of shorter months
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrences(rule, since, until):
+    """Yield the dates `rule` occurs on from `since` to `until` (both inclusive), in order.
+
+    `rule` is anything with RecurringRule's schedule attributes (a model or a row).
+    """
+    since = max(since, rule.start_date)
+    if rule.end_date is not None:
+        until = min(until, rule.end_date)
+    if since > until:
+        return
+
+    if rule.frequency == 'cron':
+        spec = parse_cron(rule.cron)
+        day = since
+        while day <= until:
+            if spec.matches(day):
+                yield day
+            day += ONE_DAY
+    elif rule.frequency == 'monthly':
+        months = (since.year - rule.start_date.year) * 12 + since.month - rule.start_date.month
+        k = max(months // rule.every - 1, 0)
+        while (day := _add_months(rule.start_date, k * rule.every)) <= until:
+            if day >= since:
+                yield day
+            k += 1
+    else:
+        step = rule.every * (7 if rule.frequency == 'weekly' else 1)
+        k = -(-(since - rule.start_date).days // step)
+        day = rule.start_date + timedelta(days=k * step)
+        while day <= until:
+            yield day
+            day += timedelta(days=step)
+
+
+def next_occurrence(rule, on_or_after):
+    """The first date `rule` occurs on from `on_or_after`, or None if it has ended."""
+    return next(occurrences(rule, on_or_after, on_or_after + CRON_HORIZON), None)
+
+
+def validate(frequency, every, cron, start_date, end_date=None):
+    """Raise ScheduleError unless the fields describe a schedule with at least one occurrence."""
+    if frequency not in FREQUENCIES:
+        raise ScheduleError(f"Frequency must be one of {', '.join(FREQUENCIES)}.")
+    if frequency != 'cron' and (not every or every < 1):
+        raise ScheduleError('Repeat every 1 or more days, weeks or months.')
+    if end_date is not None and end_date < start_date:
+        raise ScheduleError('The end date is before the start date.')
+    rule = RecurringRule(frequency=frequency, every=every or 1, cron=cron,
+                         start_date=start_date, end_date=end_date)
+    if next_occurrence(rule, start_date) is None:
+        raise ScheduleError('This schedule never occurs.')
+
+
+@dataclass
+class RunResult:
+    rules: int = 0
+    inserted: int = 0
+    skipped: int = 0  # occurrences that were already materialized
+    no_rate: int = 0  # rules left due because an exchange rate is missing
+    seconds: float = 0.0
+
+
+def _materialize(rules, until, result):
+    reporting = dict(db.session.execute(
+        select(User.id, User.currency).where(User.id.in_({rule.user_id for rule in rules}))
+    ).all())
+    due = {
+        (rule.id, day): {
+            'description': rule.description,
+            'amount_cents': rule.amount_cents,
+            'currency': rule.currency,
+            'date': day,
+            'user_id': rule.user_id,
+            'category_id': rule.category_id,
+        }
+        for rule in rules
+        for day in occurrences(rule, rule.next_date, until)
+    }
+    missing = {id(row) for row in fx.convert_rows(due.values(), reporting)}
+    no_rate = {rule_id for (rule_id, day), row in due.items() if id(row) in missing}
+    if no_rate:
+        rules = [rule for rule in rules if rule.id not in no_rate]
+        due = {key: row for key, row in due.items() if key[0] not in no_rate}
+
+    new = insert_missing(
+        RecurringOccurrence.__table__,
+        [{'rule_id': rule_id, 'occurrence_date': day} for rule_id, day in due],
+        ['rule_id', 'occurrence_date'],
+    )
+    rows = [due[key] for key in sorted(new)]
+    if rows:
+        db.session.execute(db.insert(Transaction), rows)
+        rollups.record_many(rows)
+        versioning.bump(*{row['user_id'] for row in rows})
+
+    if rules:
+        table = RecurringRule.__table__
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('rule_id')).values(next_date=bindparam('next_date')),
+            [{'rule_id': rule.id, 'next_date': next_occurrence(rule, until + ONE_DAY)} for rule in rules],
+        )
+
+    result.rules += len(rules)
+    result.inserted += len(rows)
+    result.skipped += len(due) - len(rows)
+    result.no_rate += len(no_rate)
+
+
+def run(until=None, batch_size=500, rule_ids=None):
+    """Materialize every occurrence due by `until` (default today), for all users or just `rule_ids`.
+
+    Commits once per batch of `batch_size` rules. Returns a RunResult.
+    """
+    until = until or date.today()
+    started = time.perf_counter()
+    result = RunResult()
+
+    table = RecurringRule.__table__
+    last_id = 0
+    while True:
+        query = select(table).where(table.c.next_date <= until, table.c.id > last_id)
+        if rule_ids is not None:
+            query = query.where(table.c.id.in_(rule_ids))
+        rules = db.session.execute(
+            query.order_by(table.c.id).limit(batch_size).with_for_update(skip_locked=True)
+        ).all()
+        if not rules:
+            break
+        last_id = rules[-1].id
+        _materialize(rules, until, result)
+        db.session.commit()
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def delete_rule(rule):
+    """Delete a rule and its occurrence log; transactions it already created are kept."""
+    db.session.execute(RecurringOccurrence.__table__.delete().where(RecurringOccurrence.rule_id == rule.id))
+    db.session.delete(rule)
+    db.session.commit()
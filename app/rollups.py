@@ -0,0 +1,152 @@
+from sqlalchemy import case, func
+
+from app import budgets, db
+from app.models import DailyRollup, Transaction
+from app.upsert import upsert_increment, upsert_increment_many
+
+
+# Incremental maintenance of the daily_rollup table, and of the monthly_spend
+# budget counters next to it (see app/budgets.py).
+# Routes call record()/unrecord() before committing, so the rollup changes in
+# the same DB transaction as the Transaction row itself. Amounts >= 0 count as
+# income and amounts < 0 as expenses, matching the analytics page. All sums
+# are integer cents, so the rollup always matches the raw rows exactly.
+
+def _apply(user_id, category_id, day, cents, sign):
+    is_expense = cents < 0
+    upsert_increment(
+        DailyRollup.__table__,
+        {'user_id': user_id, 'category_id': category_id, 'day': day},
+        {
+            'income_cents': 0 if is_expense else sign * cents,
+            'expense_cents': sign * -cents if is_expense else 0,
+            'income_count': 0 if is_expense else sign,
+            'expense_count': sign if is_expense else 0,
+        },
+    )
+    budgets.apply(user_id, category_id, day, cents, sign)
+
+    if sign < 0:
+        # drop rows that no longer summarise any transaction
+        DailyRollup.query.filter_by(
+            user_id=user_id, category_id=category_id, day=day,
+            income_count=0, expense_count=0,
+        ).delete(synchronize_session=False)
+
+
+def record(tx):
+    """Add a (new or edited) transaction to the rollup."""
+    _apply(tx.user_id, tx.category_id, tx.date, tx.amount_cents, 1)
+
+
+def unrecord(tx):
+    """Remove a transaction's current values from the rollup (before delete or edit)."""
+    _apply(tx.user_id, tx.category_id, tx.date, tx.amount_cents, -1)
+
+
+def record_many(rows):
+    """Add many new transactions to the rollup in one batched upsert.
+
+    rows: dicts with user_id, category_id, date and amount_cents (as used for bulk inserts)
+    """
+    apply_many(added=rows)
+
+
+def apply_many(added=(), removed=()):
+    """Add `added` and take away `removed` transactions, in one batched upsert.
+
+    Both are row dicts like record_many() takes; `removed` describes rows as
+    they were before a bulk UPDATE or DELETE. Keys whose changes cancel out
+    (e.g. a row moved to the category it was already in) are skipped.
+    """
+    buckets = {}
+    for rows, sign in ((added, 1), (removed, -1)):
+        for row in rows:
+            key = (row['user_id'], row['category_id'], row['date'])
+            bucket = buckets.setdefault(key, [0, 0, 0, 0])
+            if row['amount_cents'] < 0:
+                bucket[1] -= sign * row['amount_cents']
+                bucket[3] += sign
+            else:
+                bucket[0] += sign * row['amount_cents']
+                bucket[2] += sign
+
+    upsert_increment_many(
+        DailyRollup.__table__,
+        ['user_id', 'category_id', 'day'],
+        [
+            {'user_id': u, 'category_id': c, 'day': d, 'income_cents': inc,
+             'expense_cents': exp, 'income_count': ni, 'expense_count': ne}
+            for (u, c, d), (inc, exp, ni, ne) in buckets.items()
+            if inc or exp or ni or ne
+        ],
+    )
+
+    budgets.apply_many(added, removed)
+
+    if removed:
+        # drop rows that no longer summarise any transaction
+        DailyRollup.query.filter(
+            DailyRollup.user_id.in_({row['user_id'] for row in removed}),
+            DailyRollup.income_count == 0, DailyRollup.expense_count == 0,
+        ).delete(synchronize_session=False)
+
+
+def _aggregate_from_transactions():
+    """SELECT producing rollup rows straight from the transaction table."""
+    is_expense = Transaction.amount_cents < 0
+    return db.select(
+        Transaction.user_id,
+        Transaction.category_id,
+        Transaction.date,
+        func.sum(case((is_expense, 0), else_=Transaction.amount_cents)),
+        func.sum(case((is_expense, -Transaction.amount_cents), else_=0)),
+        func.sum(case((is_expense, 0), else_=1)),
+        func.sum(case((is_expense, 1), else_=0)),
+    ).group_by(Transaction.user_id, Transaction.category_id, Transaction.date)
+
+
+def rebuild(user_id=None, commit=True):
+    """Recompute the rollup from scratch (for everyone, or one user). Returns row count."""
+    select = _aggregate_from_transactions()
+    delete = DailyRollup.query
+    if user_id is not None:
+        select = select.where(Transaction.user_id == user_id)
+        delete = delete.filter(DailyRollup.user_id == user_id)
+
+    delete.delete(synchronize_session=False)
+    db.session.execute(db.insert(DailyRollup).from_select(
+        ['user_id', 'category_id', 'day', 'income_cents', 'expense_cents',
+         'income_count', 'expense_count'],
+        select,
+    ))
+    if not commit:
+        return None
+    db.session.commit()
+
+    query = DailyRollup.query
+    if user_id is not None:
+        query = query.filter(DailyRollup.user_id == user_id)
+    return query.count()
+
+
+def verify():
+    """Compare the rollup with the raw transactions.
+
+    Returns a list of (user_id, category_id, day, expected, actual) for every
+    key that differs; an empty list means the rollup is consistent.
+    """
+    expected = {
+        (u, c, d): (inc, exp, ni, ne)
+        for u, c, d, inc, exp, ni, ne in db.session.execute(_aggregate_from_transactions())
+    }
+    actual = {
+        (r.user_id, r.category_id, r.day): (r.income_cents, r.expense_cents, r.income_count, r.expense_count)
+        for r in DailyRollup.query.yield_per(1000)
+    }
+
+    return [
+        (*key, expected.get(key), actual.get(key))
+        for key in sorted(expected.keys() | actual.keys())
+        if expected.get(key) != actual.get(key)
+    ]
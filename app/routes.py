@@ -1,11 +1,22 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app, Response, stream_with_context, abort
 from flask_login import login_required, current_user
 from sqlalchemy import text
-from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from datetime import datetime, timedelta
+import io
 
-from app.models import Category, Goal, Transaction, User
+from app.models import Category, Goal, RecurringRule, Transaction, User
 from app import db
-from app.forms import GoalForm, TransactionForm, CategoryForm, RegistrationForm, LoginForm
+from app import analytics as analytics_queries
+from app.analytics_frame import cached_report
+from app.pagination import page_json, transactions_page
+from app import batch, budgets, fx, recurring, rollups, search, versioning
+from app.forms import BatchForm, BudgetForm, GoalForm, RecurringRuleForm, SettingsForm, TransactionForm, CategoryForm, RegistrationForm, LoginForm, ImportForm
+from app.importer import StatementError, import_transactions
+from app import export
+from app.categories import category_choices, create_category, invalidate_categories
+from app.goals import goal_progress, goals_json, user_goals
 
 
 bp = Blueprint('main', __name__)
@@ -22,34 +33,76 @@ def home():
 @bp.route('/transactions')
 @login_required
 def transactions():
-    transactions = Transaction.query.filter_by(user_id=current_user.id)\
-    .order_by(Transaction.date.desc()).all()
+    page_size = current_app.config['TRANSACTIONS_PAGE_SIZE']
+    query = request.args.get('q', '').strip()
+    if query:
+        # ranked full-text matches instead of the date-ordered list
+        transactions, next_cursor = search.search(current_user.id, query, request.args.get('cursor'), page_size)
+    else:
+        transactions, next_cursor = transactions_page(
+            current_user.id, request.args.get('cursor'), page_size)
+
+    # Summary covers the whole history, so it comes from one aggregate query
+    income, expenses, balance = analytics_queries.totals(current_user.id)
+
+    batch_form = BatchForm()
+    choices = category_choices(current_user.id)
+    batch_form.category_id.choices = [(0, 'Any category')] + choices
+    batch_form.set_category_id.choices = [(0, 'Keep category')] + choices
+    return render_template('transactions.html', transactions=transactions, next_cursor=next_cursor,
+                           income=income, expenses=expenses, balance=balance, batch_form=batch_form,
+                           query=query)
+
+# "Load more" endpoint used by the transactions page
+@bp.route('/transactions/page')
+@login_required
+def transactions_page_json():
+    page_size = current_app.config['TRANSACTIONS_PAGE_SIZE']
+    transactions, next_cursor = transactions_page(
+        current_user.id, request.args.get('cursor'), page_size)
+
+    return jsonify(page_json(transactions, next_cursor, url_for))
 
-    income = sum(t.amount for t in transactions if t.amount > 0)
-    expenses = sum(abs(t.amount) for t in transactions if t.amount < 0)
-    balance = income - expenses
-    return render_template('transactions.html', transactions=transactions, income=income, expenses=expenses, balance=balance)
+# Full-text search by description, best matches first; same JSON as /transactions/page
+@bp.route('/transactions/search')
+@login_required
+def search_transactions():
+    page_size = current_app.config['TRANSACTIONS_PAGE_SIZE']
+    transactions, next_cursor = search.search(
+        current_user.id, request.args.get('q', ''), request.args.get('cursor'), page_size)
+
+    return jsonify(page_json(transactions, next_cursor, url_for))
 
 # Add Transaction Route
 @bp.route('/transactions/add', methods=['GET', 'POST'])
 @login_required
 def add_transaction():
-    form = TransactionForm()
-    form.category_id.choices = [
-    (c.id, c.name) for c in Category.query.filter_by(user_id=current_user.id).all()] # Load Categories
+    # amounts are in the user's reporting currency unless the form says otherwise
+    form = TransactionForm(currency=current_user.currency)
+    form.category_id.choices = category_choices(current_user.id) # Load Categories
+    form.currency.choices = fx.currency_choices()
 
     if form.validate_on_submit():
         new_tx = Transaction(
             description=form.description.data,
-            amount=form.amount.data,
             date=form.date.data,
             category_id=form.category_id.data,
+            currency=form.currency.data,
             user_id=current_user.id  # ✅ Assign user here
 
         )
+        try:
+            fx.set_amount(new_tx, form.amount.data, fx.reporting_currency(current_user.id))
+        except fx.FxError as e:
+            form.currency.errors.append(str(e))
+            return render_template('add_transaction.html', form=form)
         db.session.add(new_tx)
+        rollups.record(new_tx)
+        warning = budgets.overspend(new_tx)
         db.session.commit()
         flash('Transaction added successfully!', "success")
+        if warning:
+            flash(warning, 'warning')
         return redirect(url_for('main.transactions'))
     if form.errors:
         flash('Please fix the errors below.', "danger")
@@ -58,6 +111,50 @@ def add_transaction():
 
 
 
+# Export the full history as CSV or NDJSON, streamed row chunk by row chunk
+@bp.route('/transactions/export')
+@login_required
+def export_transactions():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        abort(400)
+
+    generate, mimetype = export.FORMATS[fmt]
+    filename = f"transactions-{datetime.utcnow():%Y%m%d}.{fmt}"
+    return Response(
+        stream_with_context(generate(current_user.id)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+# Import a bank statement (CSV / OFX)
+@bp.route('/transactions/import', methods=['GET', 'POST'])
+@login_required
+def import_statement():
+    form = ImportForm()
+
+    if form.validate_on_submit():
+        # stream the upload line by line instead of reading it into memory
+        lines = io.TextIOWrapper(form.statement.data.stream, encoding='utf-8-sig', newline='')
+        try:
+            result = import_transactions(current_user.id, lines, form.format.data,
+                                         current_app.config['IMPORT_BATCH_SIZE'])
+        except (StatementError, UnicodeDecodeError) as e:
+            db.session.rollback()
+            flash(f'Could not import file: {e}', 'danger')
+            return render_template('import_transactions.html', form=form)
+
+        flash(f'Imported {result.inserted} transactions '
+              f'({result.duplicates} duplicates skipped, {result.invalid} invalid rows).', 'success')
+        return redirect(url_for('main.transactions'))
+
+    if form.errors:
+        flash('Please fix the errors below.', 'danger')
+
+    return render_template('import_transactions.html', form=form)
+
+
+
 # Edit transaction
 @bp.route('/transactions/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
@@ -66,18 +163,32 @@ def edit_transaction(id):
     tx = Transaction.query.filter_by(id=id, user_id=current_user.id).first_or_404()
 
     form = TransactionForm(obj=tx)
-    form.category_id.choices = [
-        (c.id, c.name) for c in Category.query.filter_by(user_id=current_user.id).all()
-    ]
+    form.category_id.choices = category_choices(current_user.id)
+    form.currency.choices = fx.currency_choices()
+    if not form.is_submitted() and tx.original_amount_cents is not None:
+        form.amount.data = tx.original_amount
 
     if form.validate_on_submit():
+        changed = Transaction(currency=form.currency.data, date=form.date.data)
+        try:
+            fx.set_amount(changed, form.amount.data, fx.reporting_currency(current_user.id))
+        except fx.FxError as e:
+            form.currency.errors.append(str(e))
+            return render_template('edit_transaction.html', form=form, tx=tx)
+
+        rollups.unrecord(tx)
         tx.description = form.description.data
-        tx.amount = form.amount.data
         tx.date = form.date.data
         tx.category_id = form.category_id.data
+        tx.currency = changed.currency
+        tx.amount_cents, tx.original_amount_cents = changed.amount_cents, changed.original_amount_cents
+        rollups.record(tx)
+        warning = budgets.overspend(tx)
 
         db.session.commit()
         flash('Transaction updated successfully!', 'success')
+        if warning:
+            flash(warning, 'warning')
         return redirect(url_for('main.transactions'))
 
     if form.errors:
@@ -90,12 +201,60 @@ def edit_transaction(id):
 @login_required
 def delete_transaction(id):
     transaction = Transaction.query.filter_by(id=id, user_id=current_user.id).first_or_404(id)
+    rollups.unrecord(transaction)
     db.session.delete(transaction)
     db.session.commit()
     flash('Transaction deleted successfully!', 'success')
     return redirect(url_for('main.transactions'))
 
 
+# Batch edit / delete of the checked (or filtered) transactions
+@bp.route('/transactions/batch', methods=['POST'])
+@login_required
+def batch_transactions():
+    form = BatchForm()
+    choices = category_choices(current_user.id)
+    form.category_id.choices = [(0, 'Any category')] + choices
+    form.set_category_id.choices = [(0, 'Keep category')] + choices
+    wants_json = request.accept_mimetypes.best == 'application/json'
+
+    def fail(message):
+        db.session.rollback()
+        if wants_json:
+            return jsonify(error=message), 400
+        flash(message, 'danger')
+        return redirect(url_for('main.transactions'))
+
+    if not form.validate_on_submit():
+        return fail('Could not apply the batch: ' + '; '.join(
+            f"{form[name].label.text}: {', '.join(errors)}" for name, errors in form.errors.items()))
+
+    selection = batch.Selection(
+        ids=tuple(request.form.getlist('ids', type=int)),
+        date_from=form.date_from.data,
+        date_to=form.date_to.data,
+        category_id=form.category_id.data or None,
+        description=form.description.data,
+    )
+    limit = current_app.config['BATCH_MAX_ROWS']
+    try:
+        if form.action.data == 'delete':
+            affected = batch.delete_transactions(current_user.id, selection, limit)
+        else:
+            affected = batch.update_transactions(current_user.id, selection, {
+                'category_id': form.set_category_id.data or None,
+                'date': form.set_date.data,
+                'description': form.set_description.data or None,
+            }, limit)
+    except batch.BatchError as e:
+        return fail(str(e))
+
+    if wants_json:
+        return jsonify(action=form.action.data, affected=affected)
+    verb = 'Deleted' if form.action.data == 'delete' else 'Updated'
+    flash(f"{verb} {affected} transaction{'s' if affected != 1 else ''}.", 'success')
+    return redirect(url_for('main.transactions'))
+
 
 # Add Categories Route
 @bp.route('/categories', methods=['GET', 'POST'])
@@ -105,14 +264,13 @@ def categories():
     categories = Category.query.filter_by(user_id=current_user.id).all()
 
     if form.validate_on_submit():
-        new_category = Category(
-            name=form.name.data.strip(),
-            user_id=current_user.id
-            
-            )
-        db.session.add(new_category)
+        _, created = create_category(current_user.id, form.name.data.strip())
         db.session.commit()
-        flash('Category added successfully!', "success")
+        if created:
+            invalidate_categories(current_user.id)
+            flash('Category added successfully!', "success")
+        else:
+            flash('You already have a category with that name!', 'warning')
         return redirect(url_for('main.categories'))
     
     return render_template('categories.html', form=form, categories=categories)
@@ -125,7 +283,14 @@ def edit_category(id):
 
     if form.validate_on_submit():
         category.name = form.name.data.strip()
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # the (user_id, name) index: another of the user's categories has this name
+            db.session.rollback()
+            flash('You already have a category with that name!', 'warning')
+            return redirect(url_for('main.edit_category', id=id))
+        invalidate_categories(current_user.id)
         flash('Category updated successfully!', 'success')
         return redirect(url_for('main.categories'))
 
@@ -140,9 +305,13 @@ def delete_category(id):
     if category.transactions:
         flash("Cannot delete this category because it has linked transactions.", "danger")
         return redirect(url_for('main.categories'))
+    if RecurringRule.query.filter_by(category_id=category.id).first():
+        flash("Cannot delete this category because a recurring transaction uses it.", "danger")
+        return redirect(url_for('main.categories'))
 
     db.session.delete(category)
     db.session.commit()
+    invalidate_categories(current_user.id)
 
     flash('Category deleted successfully!', 'success')
     return redirect(url_for('main.categories'))
@@ -159,18 +328,14 @@ def add_category_modal():
         flash('Category name cannot be empty!', 'danger')
         return redirect(url_for('main.add_transaction'))
 
-    # ✅ Ensure category names are unique *per user*, not globally
-    existing = Category.query.filter_by(name=name, user_id=current_user.id).first()
-    if existing:
-        flash('You already have a category with that name!', 'warning')
-    else:
-        new_category = Category(
-            name=name,
-            user_id=current_user.id
-        )
-        db.session.add(new_category)
-        db.session.commit()
+    # names are unique per user; the insert itself tells whether this one was taken
+    _, created = create_category(current_user.id, name)
+    db.session.commit()
+    if created:
+        invalidate_categories(current_user.id)
         flash('Category added successfully!', 'success')
+    else:
+        flash('You already have a category with that name!', 'warning')
 
     return redirect(url_for('main.add_transaction'))
 
@@ -178,48 +343,91 @@ def add_category_modal():
 
 
 
+# Budgets: monthly limits per category, read from the month-to-date counters
+@bp.route('/budgets', methods=['GET', 'POST'])
+@login_required
+def budgets_page():
+    form = BudgetForm()
+    form.category_id.choices = category_choices(current_user.id)
+
+    if form.validate_on_submit():
+        category = Category.query.filter_by(id=form.category_id.data, user_id=current_user.id).first_or_404()
+        category.budget = form.limit.data
+        db.session.commit()
+        flash(f"Budget for {category.name} {'saved' if form.limit.data is not None else 'removed'}.", 'success')
+        return redirect(url_for('main.budgets_page', month=request.args.get('month')))
+    if form.errors:
+        flash('Please fix the errors below.', 'danger')
+
+    try:
+        month = datetime.strptime(request.args.get('month', ''), '%Y-%m').date()
+    except ValueError:
+        month = budgets.month_start(datetime.utcnow().date())
+    rows = budgets.month_summary(current_user.id, month)
+    return render_template('budgets.html', form=form, rows=rows, month=month,
+                           previous_month=(month - timedelta(days=1)).replace(day=1),
+                           next_month=(month + timedelta(days=31)).replace(day=1))
+
+
 # Analytics
 @bp.route('/analytics')
 @login_required
 def analytics():
-    # Get all transactions for the logged-in user
-    transactions = Transaction.query.filter_by(user_id=current_user.id).all()
-
-    # Compute income, expenses, and balance
-    income = sum(t.amount for t in transactions if t.amount > 0)
-    expenses = sum(abs(t.amount) for t in transactions if t.amount < 0)
-    balance = income - expenses
-
-    # Spending by category (filtered by user)
-    user_categories = Category.query.filter_by(user_id=current_user.id).all()
-    categories = [c.name for c in user_categories]
-    category_amounts = [
-        sum(abs(t.amount) for t in transactions if t.category_id == c.id and t.amount < 0)
-        for c in user_categories
-    ]
-
-    # Spending over time (grouped by date)
-    from collections import defaultdict
-    from datetime import datetime
-
-    daily_spending = defaultdict(float)
-    for t in transactions:
-        date_str = t.date.strftime("%Y-%m-%d") if isinstance(t.date, datetime) else str(t.date)
-        daily_spending[date_str] += t.amount
-
-    dates = list(daily_spending.keys())
-    daily_totals = list(daily_spending.values())
-
-    return render_template(
-        'analytics.html',
-        income=income,
-        expenses=expenses,
-        balance=balance,
-        categories=categories,
-        category_amounts=category_amounts,
-        dates=dates,
-        daily_totals=daily_totals
-    )
+    # Totals, per-category spend and daily series come from the rollup table,
+    # cached until the user's data version changes
+    data = analytics_queries.cached_payload(current_user.id)
+    return render_template('analytics.html', **data)
+
+# Time series for the analytics charts, for one window at a time
+@bp.route('/api/analytics')
+@login_required
+def analytics_api():
+    try:
+        start, end, granularity = analytics_queries.series_window(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    # the response only changes when the user's data version does
+    version = versioning.data_version(current_user.id)
+    etag = analytics_queries.etag(current_user.id, version, start, end, granularity)
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(analytics_queries.cached_series(current_user.id, start, end, granularity, version))
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Summary cards and category chart data, the JSON form of the analytics page
+@bp.route('/api/analytics/summary')
+@login_required
+def analytics_summary():
+    version = versioning.data_version(current_user.id)
+    etag = analytics_queries.etag(current_user.id, version, 'summary')
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(analytics_queries.cached_payload(current_user.id, version))
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Rolling spend, monthly deltas and percentiles over the whole history
+@bp.route('/api/analytics/report')
+@login_required
+def analytics_report():
+    version = versioning.data_version(current_user.id)
+    etag = analytics_queries.etag(current_user.id, version, 'report')
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(cached_report(current_user.id, version))
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 # Goals
@@ -227,16 +435,24 @@ def analytics():
 @bp.route('/goals')
 @login_required
 def goals():
-    user_goals = Goal.query.filter_by(user_id=current_user.id).all()
-    return render_template('goals.html', goals=user_goals)
+    goals = user_goals(current_user.id)
+    # tracked goals get their amounts from one grouped, cached query
+    progress = goal_progress(current_user.id, goals)
+    return render_template('goals.html', goals=goals, progress=progress)
+
+# The goals list as JSON
+@bp.route('/api/goals')
+@login_required
+def goals_api():
+    goals = user_goals(current_user.id)
+    return jsonify(goals_json(goals, goal_progress(current_user.id, goals)))
 
 # Add new goal
 @bp.route('/goals/add', methods=['GET', 'POST'])
 @login_required
 def add_goal():
     form = GoalForm()
-    form.category_id.choices = [
-    (c.id, c.name) for c in Category.query.filter_by(user_id=current_user.id).all()]
+    form.category_id.choices = category_choices(current_user.id)
 
     if form.validate_on_submit():
         
@@ -249,12 +465,12 @@ def add_goal():
             progress=form.progress.data or 0,
             status=form.status.data,
             user_id=current_user.id,
-            category_id=form.category_id.data
+            category_id=form.category_id.data,
+            track_category=form.track_category.data
         )
-        new_goal.progress = (new_goal.current_amount / new_goal.target_amount * 100) if new_goal.target_amount > 0 else 0.0
+        new_goal.progress = float(new_goal.current_amount / new_goal.target_amount * 100) if new_goal.target_amount > 0 else 0.0
         db.session.add(new_goal)
         db.session.commit()
-        print('✅ Form Submitted')
         flash('New goal added successfully!', 'success')
         return redirect(url_for('main.goals'))
     return render_template('add_goal.html', form=form)
@@ -264,7 +480,8 @@ def add_goal():
 @login_required
 def view_goal(id):
     goal = Goal.query.filter_by(id=id, user_id=current_user.id).first_or_404()
-    return render_template('goals/view_goal.html', goal=goal)
+    progress = goal_progress(current_user.id, [goal])[goal.id]
+    return render_template('goals/view_goal.html', goal=goal, progress=progress)
 
 
 # Edit goal
@@ -272,18 +489,23 @@ def view_goal(id):
 @login_required
 def edit_goal(id):
     goal = Goal.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    form = GoalForm(obj=goal)
+    form.category_id.choices = category_choices(current_user.id)
 
-    if request.method == 'POST':
-        goal.name = request.form['name']
-        goal.target_amount = float(request.form['target_amount']) or 0
-        goal.current_amount = float(request.form['current_amount']) or 0
-        goal.deadline = request.form['deadline']
-        goal.status = request.form['status']
-        goal.progress = (goal.current_amount / goal.target_amount) * 100 if goal.target_amount else 0
+    if form.validate_on_submit():
+        goal.name = form.name.data
+        goal.description = form.description.data
+        goal.target_amount = form.target_amount.data or 0
+        goal.current_amount = form.current_amount.data or 0
+        goal.deadline = form.deadline.data
+        goal.status = form.status.data
+        goal.category_id = form.category_id.data
+        goal.track_category = form.track_category.data
+        goal.progress = float(goal.current_amount / goal.target_amount * 100) if goal.target_amount > 0 else 0.0
         db.session.commit()
         flash('Goal updated successfully!', 'success')
-        return redirect(url_for('main.goal'))
-    return render_template('goals/edit_goal.html', goal=goal)
+        return redirect(url_for('main.goals'))
+    return render_template('goals/edit_goal.html', form=form, goal=goal)
 
 # delete goal
 @bp.route('/goals/delete/<int:id>', methods=['POST'])
@@ -293,3 +515,74 @@ def delete_goal(id):
     db.session.commit()
     flash('Goal deleted successfully', 'success')
     return redirect(url_for('main.goals'))
+
+
+# Recurring transactions
+@bp.route('/recurring', methods=['GET', 'POST'])
+@login_required
+def recurring_rules():
+    form = RecurringRuleForm(currency=current_user.currency)
+    form.category_id.choices = category_choices(current_user.id)
+    form.currency.choices = fx.currency_choices()
+
+    if form.validate_on_submit():
+        rule = RecurringRule(
+            description=form.description.data,
+            amount=form.amount.data,
+            currency=form.currency.data,
+            category_id=form.category_id.data,
+            frequency=form.frequency.data,
+            every=form.every.data or 1,
+            cron=form.cron.data if form.frequency.data == 'cron' else None,
+            start_date=form.start_date.data,
+            end_date=form.end_date.data,
+            user_id=current_user.id,
+        )
+        rule.next_date = recurring.next_occurrence(rule, rule.start_date)
+        db.session.add(rule)
+        db.session.commit()
+        # a rule that started in the past catches up right away instead of at the next scheduler run
+        result = recurring.run(rule_ids=[rule.id])
+        flash(f"Recurring transaction added ({result.inserted} past occurrence"
+              f"{'s' if result.inserted != 1 else ''} recorded).", 'success')
+        if result.no_rate:
+            flash(f"Past occurrences wait for {rule.currency} exchange rates back to {rule.start_date}; "
+                  f"they are recorded by the next run after the rates are loaded.", 'warning')
+        return redirect(url_for('main.recurring_rules'))
+    if form.errors:
+        flash('Please fix the errors below.', 'danger')
+
+    rules = RecurringRule.query.options(joinedload(RecurringRule.category))\
+        .filter_by(user_id=current_user.id).order_by(RecurringRule.next_date).all()
+    return render_template('recurring.html', form=form, rules=rules)
+
+
+@bp.route('/recurring/delete/<int:id>', methods=['POST'])
+@login_required
+def delete_recurring_rule(id):
+    rule = RecurringRule.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    recurring.delete_rule(rule)
+    flash('Recurring transaction deleted; transactions it already created are kept.', 'success')
+    return redirect(url_for('main.recurring_rules'))
+
+
+# Settings
+@bp.route('/settings', methods=['GET', 'POST'])
+@login_required
+def settings():
+    form = SettingsForm(currency=current_user.currency)
+    form.currency.choices = fx.currency_choices()
+
+    if form.validate_on_submit():
+        try:
+            fx.change_reporting_currency(current_user, form.currency.data)
+        except fx.FxError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        else:
+            flash(f"Settings saved; amounts are reported in {form.currency.data}.", 'success')
+            return redirect(url_for('main.settings'))
+    if form.errors:
+        flash('Please fix the errors below.', 'danger')
+
+    return render_template('settings.html', form=form)
@@ -0,0 +1,158 @@
+import re
+
+from sqlalchemy import DDL, event, func, literal_column, select, text
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Transaction
+
+
+# Full-text search over transaction descriptions.
+#   - SQLite: an FTS5 table, transaction_fts(user_key, description), kept in
+#     step by triggers on "transaction", so every write path (routes, imports,
+#     batch edits) updates it in the same DB transaction. user_key is 'u<id>'
+#     and is indexed too, so a search only reads the postings of one user.
+#     The table is contentless (it stores the index, not the text); the
+#     triggers remove old entries with the FTS5 'delete' command.
+#   - Postgres: a GIN index on to_tsvector('simple', description), which the
+#     database keeps up to date itself.
+# Both use the 'simple' word splitting (no stemming), so results match
+# across backends. The query text is split into words; every word must
+# appear, as a prefix. Results are ranked (bm25 / ts_rank), newest first on
+# ties, and paged with an offset cursor. Only the newest CANDIDATES matches
+# are ranked: scoring every row that contains a common word ("payment") is
+# what makes such a search slow on a large history.
+#
+# The objects are created with the transaction table (db.create_all) and by
+# migration 0b7c4e9d2f61 for existing databases.
+
+FTS_TABLE = 'transaction_fts'
+PG_INDEX = 'ix_transaction_description_fts'
+
+SQLITE_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "user_key, description, content='', tokenize='unicode61 remove_diacritics 2')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON "transaction" BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, user_key, description) VALUES (new.id, 'u' || new.user_id, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON "transaction" BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_key, description)
+            VALUES ('delete', old.id, 'u' || old.user_id, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF description, user_id ON "transaction" BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_key, description)
+            VALUES ('delete', old.id, 'u' || old.user_id, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, user_key, description) VALUES (new.id, 'u' || new.user_id, new.description);
+    END""",
+)
+SQLITE_POPULATE = (
+    f"INSERT INTO {FTS_TABLE}(rowid, user_key, description) "
+    "SELECT id, 'u' || user_id, description FROM \"transaction\""
+)
+POSTGRES_DDL = (
+    f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON \"transaction\" USING gin (to_tsvector('simple', description))",
+)
+
+for _statement in SQLITE_DDL:
+    event.listen(Transaction.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in POSTGRES_DDL:
+    event.listen(Transaction.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+# SQLite drops the triggers with the table, but not the FTS table
+event.listen(Transaction.__table__, 'after_drop',
+             DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect='sqlite'))
+
+MAX_TERMS = 8
+CANDIDATES = 2000
+# letters and digits, split like the FTS5 unicode61 tokenizer does (so no '_')
+_WORD = re.compile(r'[^\W_]+')
+
+
+def terms(query):
+    """The words of a search box query, lowercased (at most MAX_TERMS)."""
+    return _WORD.findall(query.lower())[:MAX_TERMS]
+
+
+def _ranked_ids_sqlite(user_id, words, limit, offset):
+    match = f'user_key : "u{user_id}" AND description : (' + ' AND '.join(f'"{w}"*' for w in words) + ')'
+    # FTS5 walks matches in rowid order cheaply; bm25 weights per column ignore
+    # user_key, which every candidate row matches
+    return db.session.execute(text(
+        f"SELECT id FROM (SELECT rowid AS id, bm25({FTS_TABLE}, 0.0, 1.0) AS score FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH :match ORDER BY rowid DESC LIMIT :candidates) "
+        "ORDER BY score, id DESC LIMIT :limit OFFSET :offset"
+    ), {'match': match, 'candidates': CANDIDATES, 'limit': limit, 'offset': offset}).scalars().all()
+
+
+def _ranked_ids_postgres(user_id, words, limit, offset):
+    # the config is inlined, not bound, so the expression matches the GIN index
+    simple = literal_column("'simple'")
+    document = func.to_tsvector(simple, Transaction.description)
+    query = func.to_tsquery(simple, ' & '.join(f"'{w}':*" for w in words))
+    candidates = select(Transaction.id, func.ts_rank(document, query).label('score'))\
+        .where(Transaction.user_id == user_id, document.op('@@')(query))\
+        .order_by(Transaction.id.desc())\
+        .limit(CANDIDATES)\
+        .subquery()
+    return db.session.execute(
+        select(candidates.c.id)
+        .order_by(candidates.c.score.desc(), candidates.c.id.desc())
+        .limit(limit).offset(offset)
+    ).scalars().all()
+
+
+def _ranked_ids_scan(user_id, words, limit, offset):
+    # other databases: unranked substring match, newest first
+    return db.session.execute(
+        select(Transaction.id)
+        .where(Transaction.user_id == user_id, *(Transaction.description.ilike(f"%{w}%") for w in words))
+        .order_by(Transaction.date.desc(), Transaction.id.desc())
+        .limit(limit).offset(offset)
+    ).scalars().all()
+
+
+_RANKED_IDS = {'sqlite': _ranked_ids_sqlite, 'postgresql': _ranked_ids_postgres}
+
+
+def search(user_id, query, cursor=None, limit=50):
+    """Return (rows, next_cursor) for one page of a user's transactions matching `query`, best first.
+
+    The cursor is the offset of the next page; next_cursor is None on the
+    last page (at most CANDIDATES results in all).
+    """
+    words = terms(query or '')
+    if not words:
+        return [], None
+    try:
+        offset = max(int(cursor), 0) if cursor else 0
+    except ValueError:
+        offset = 0
+
+    ranked_ids = _RANKED_IDS.get(db.engine.dialect.name, _ranked_ids_scan)
+    # fetch one extra id to know whether another page exists
+    ids = ranked_ids(user_id, words, limit + 1, offset)
+    next_cursor = str(offset + limit) if len(ids) > limit else None
+    ids = ids[:limit]
+    if not ids:
+        return [], None
+
+    # the ids are already limited to the user, but isolation shouldn't rest on the
+    # index alone, so filter on user_id again. As `user_id + 0`: a plain
+    # comparison makes SQLite walk the user's index instead of looking up the ids
+    rows = Transaction.query.options(joinedload(Transaction.category_ref))\
+        .filter(Transaction.id.in_(ids), Transaction.user_id + 0 == user_id).all()
+    position = {tx_id: i for i, tx_id in enumerate(ids)}
+    return sorted(rows, key=lambda tx: position[tx.id]), next_cursor
+
+
+def rebuild():
+    """Rebuild the search index from the transaction table. Returns the number of rows indexed."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"))
+        db.session.execute(text(SQLITE_POPULATE))
+        # merge the index into one b-tree, which is what queries read fastest
+        db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+    elif dialect == 'postgresql':
+        db.session.execute(text(f"REINDEX INDEX {PG_INDEX}"))
+    db.session.commit()
+    return db.session.query(func.count(Transaction.id)).scalar()
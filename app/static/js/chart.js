@@ -9,7 +9,7 @@ document.addEventListener("DOMContentLoaded", function () {
         labels: ["Income", "Expenses"],
         datasets: [
           {
-            label: "Ksh",
+            label: window.analyticsData.currency,
             data: window.analyticsData.incomeExpense,
             backgroundColor: ["#198754", "#dc3545"],
             borderWidth: 1,
@@ -48,34 +48,59 @@ document.addEventListener("DOMContentLoaded", function () {
     });
   }
 
-  // spending over time chart
-const ctx3 = document.getElementById("timeChart");
-    if (ctx3 && window.analyticsData.dates.length) {
-        new Chart(ctx3, {
-            type: "line",
-            data: {
-                labels: window.analyticsData.dates,
-                datasets: [{
-                    label: "Net Spending (Ksh)",
-                    data: window.analyticsData.dailyTotals,
-                    borderColor: "rgba(13, 110, 253, 0.1)",
-                    fill: true,
-                    tension: 0.3,
-                }]
-            },
-            options: {
-                responsive: true,
-                plugins: {
-                    legend: { display: false },
-                },
-                scales: {
-                    x: { title: { display: true, text: "Date" } },
-                    y: { title: { display: true, text: "Amount (Ksh)"} }
-                }
-            }
-        });
+  // spending over time chart, fetched from /api/analytics one window at a time
+  const ctx3 = document.getElementById("timeChart");
+  const controls = document.getElementById("timeChartControls");
+  let timeChart = null;
+
+  async function loadTimeChart() {
+    const params = new URLSearchParams();
+    new FormData(controls).forEach((value, key) => { if (value) params.set(key, value); });
+
+    // the browser revalidates with If-None-Match and gets a 304 when nothing changed
+    const response = await fetch(window.analyticsData.seriesUrl + "?" + params, {
+      headers: { Accept: "application/json" },
+    });
+    if (!response.ok) return;
+    const series = await response.json();
+
+    if (timeChart) {
+      timeChart.data.labels = series.labels;
+      timeChart.data.datasets[0].data = series.net;
+      timeChart.update();
+      return;
     }
 
+    timeChart = new Chart(ctx3, {
+      type: "line",
+      data: {
+        labels: series.labels,
+        datasets: [{
+          label: "Net Spending (" + window.analyticsData.currency + ")",
+          data: series.net,
+          borderColor: "rgba(13, 110, 253, 0.1)",
+          fill: true,
+          tension: 0.3,
+        }]
+      },
+      options: {
+        responsive: true,
+        plugins: {
+          legend: { display: false },
+        },
+        scales: {
+          x: { title: { display: true, text: "Date" } },
+          y: { title: { display: true, text: "Amount (" + window.analyticsData.currency + ")"} }
+        }
+      }
+    });
+  }
+
+  if (ctx3 && controls) {
+    controls.addEventListener("change", loadTimeChart);
+    loadTimeChart();
+  }
+
 });
 
 
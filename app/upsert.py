@@ -0,0 +1,65 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+
+
+# INSERT ... ON CONFLICT helpers. Both SQLite (3.24+) and PostgreSQL support
+# the same upsert syntax, but SQLAlchemy exposes it per dialect.
+
+def dialect_insert(table):
+    """Return an INSERT construct for `table` that supports on_conflict_do_*()."""
+    name = db.engine.dialect.name
+    if name == 'postgresql':
+        return postgresql.insert(table)
+    if name == 'sqlite':
+        return sqlite.insert(table)
+    raise NotImplementedError(f"upsert is not supported on {name}")
+
+
+def upsert_increment(table, keys, increments):
+    """Insert a row for `keys` or add `increments` to the existing row, atomically.
+
+    keys: {column_name: value} matching a primary key / unique index
+    increments: {column_name: amount} added to the current values
+    """
+    upsert_increment_many(table, list(keys), [{**keys, **increments}])
+
+
+def upsert_increment_many(table, key_columns, rows):
+    """Batched upsert_increment(): one executemany for a list of row dicts.
+
+    Every column of a row that is not in `key_columns` is added to the
+    existing value on conflict.
+    """
+    if not rows:
+        return
+    increment_columns = [name for name in rows[0] if name not in key_columns]
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={name: table.c[name] + stmt.excluded[name] for name in increment_columns},
+    )
+    db.session.execute(stmt, rows)
+
+
+def upsert_many(table, key_columns, rows):
+    """Insert row dicts, or overwrite the other columns of the row already stored under the same key."""
+    if not rows:
+        return
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={name: stmt.excluded[name] for name in rows[0] if name not in key_columns},
+    )
+    db.session.execute(stmt, rows)
+
+
+def insert_missing(table, rows, returning):
+    """Insert the row dicts whose primary key / unique key isn't taken yet, in one executemany.
+
+    Returns the `returning` columns (a list of names) of the rows actually inserted.
+    """
+    if not rows:
+        return []
+    stmt = dialect_insert(table).on_conflict_do_nothing().returning(*(table.c[name] for name in returning))
+    return db.session.execute(stmt, rows).all()
@@ -0,0 +1,82 @@
+import time
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db
+from app.cache import get_cache
+from app.models import User
+
+
+# Short-TTL identity cache behind Flask-Login's user_loader.
+# The cached entry holds the user's public columns only (never the password
+# hash); a hit rebuilds a User and attaches it to the session with
+# merge(load=False), so `current_user` costs no query. Unloaded attributes
+# such as password_hash are still fetched lazily if something reads them.
+# Only the worker that changes a user invalidates its entry, so other
+# workers may serve stale columns for up to USER_CACHE_TTL: fine for display,
+# but writes that depend on one (the reporting currency) read it from the DB.
+
+CACHED_COLUMNS = ('id', 'username', 'email', 'currency')
+
+
+class UserLoaderStats:
+    """Process-wide hit/miss counters, plus the DB time spent on misses."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+
+    @property
+    def saved_seconds(self):
+        # every hit avoided one query of roughly the average miss cost
+        return self.hits * (self.miss_seconds / self.misses) if self.misses else 0.0
+
+    def as_dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'miss_seconds': self.miss_seconds,
+            'saved_seconds': self.saved_seconds,
+        }
+
+
+stats = UserLoaderStats()
+
+
+def _key(user_id):
+    return f"user:{user_id}"
+
+
+def load_user(user_id):
+    user_id = int(user_id)
+    ttl = current_app.config['USER_CACHE_TTL']
+    cache = get_cache()
+
+    data = cache.get(_key(user_id)) if ttl > 0 else None
+    if data is not None:
+        stats.hits += 1
+        user = User(**data)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    started = time.perf_counter()
+    user = db.session.get(User, user_id)
+    stats.misses += 1
+    stats.miss_seconds += time.perf_counter() - started
+
+    if user is not None and ttl > 0:
+        cache.set(_key(user_id), {name: getattr(user, name) for name in CACHED_COLUMNS}, ttl=ttl)
+    return user
+
+
+def invalidate_user(user_id):
+    get_cache().delete(_key(user_id))
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    invalidate_user(target.id)
@@ -0,0 +1,45 @@
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Category, Transaction, User
+
+
+# Per-user data version, used as part of cache keys for derived data
+# (e.g. the analytics payload). Any flush that touches a Transaction or
+# Category bumps the owner's user.data_version in the same DB transaction,
+# so a cache entry stamped with an older version is simply never read again.
+#
+# Bulk statements (db.session.execute(insert(...), rows)) bypass the unit of
+# work; code that uses them must call bump(user_id) itself.
+
+VERSIONED = (Transaction, Category)
+
+
+def data_version(user_id, session=None):
+    return (session or db.session).query(User.data_version).filter(User.id == user_id).scalar()
+
+
+def bump(*user_ids, connection=None):
+    ids = {uid for uid in user_ids if uid is not None}
+    if not ids:
+        return
+    stmt = update(User.__table__)\
+        .where(User.__table__.c.id.in_(ids))\
+        .values(data_version=User.__table__.c.data_version + 1)
+    (connection or db.session.connection()).execute(stmt)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_on_flush(session, flush_context):
+    # new/dirty/deleted still describe what was just flushed at this point
+    touched = set()
+    for obj in session.new | session.deleted:
+        if isinstance(obj, VERSIONED):
+            touched.add(obj.user_id)
+    for obj in session.dirty:
+        if isinstance(obj, VERSIONED) and session.is_modified(obj, include_collections=False):
+            touched.add(obj.user_id)
+
+    if touched:
+        bump(*touched, connection=session.connection())
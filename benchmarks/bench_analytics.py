@@ -0,0 +1,59 @@
+"""Compare the analytics aggregation in SQL with the old load-everything loop.
+
+    python -m benchmarks.bench_analytics [--sizes 1000,10000,100000] [--database-url URL]
+
+The SQL path only returns aggregate rows, so it stays far below the Python
+path, which hydrates every row and walks it once per category.
+"""
+import argparse
+from collections import defaultdict
+
+from app import analytics, db
+from app.models import Category, Transaction
+
+from benchmarks.common import make_app, seed_user, timeit
+
+
+def python_path(user_id):
+    # the pre-aggregation implementation of analytics(), kept for comparison
+    transactions = Transaction.query.filter_by(user_id=user_id).all()
+    income = sum(t.amount_cents for t in transactions if t.amount_cents > 0)
+    expenses = sum(abs(t.amount_cents) for t in transactions if t.amount_cents < 0)
+    user_categories = Category.query.filter_by(user_id=user_id).all()
+    category_amounts = [
+        sum(abs(t.amount_cents) for t in transactions if t.category_id == c.id and t.amount_cents < 0)
+        for c in user_categories
+    ]
+    daily = defaultdict(int)
+    for t in transactions:
+        daily[str(t.date)] += t.amount_cents
+    return income, expenses, category_amounts, daily
+
+
+def sql_path(user_id):
+    return (
+        analytics.totals(user_id),
+        analytics.category_spending(user_id),
+        analytics.daily_totals(user_id),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    print(f"{'transactions':>12} {'python ms':>10} {'sql ms':>10}")
+    with app.app_context():
+        for i, size in enumerate(int(s) for s in args.sizes.split(',')):
+            user_id = seed_user(f"bench{i}", size)
+            py_ms = timeit(lambda: python_path(user_id), repeat=3)
+            db.session.expire_all()
+            sql_ms = timeit(lambda: sql_path(user_id))
+            print(f"{size:>12} {py_ms:>10.1f} {sql_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
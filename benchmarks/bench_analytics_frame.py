@@ -0,0 +1,95 @@
+"""Time the columnar (NumPy) analytics engine against plain Python loops.
+
+    python -m benchmarks.bench_analytics_frame [--sizes 10000,100000,1000000] [--database-url URL]
+
+For each size a user is seeded with that many transactions, then:
+  - load:   TransactionFrame.load(), one query into three arrays
+  - vector: every /analytics metric plus rolling 7/30-day spend, monthly
+            deltas and percentiles on the loaded frame
+  - python: the same report computed with one Python loop per metric over
+            the same (day, cents, category) tuples
+The vector and python results are compared, so a mismatch fails loudly.
+"""
+import argparse
+import sys
+from collections import defaultdict
+from datetime import timedelta
+
+from app import db
+from app.analytics_frame import TransactionFrame
+from app.models import Transaction
+
+from benchmarks.common import make_app, seed_user, timeit
+
+
+def python_report(rows, category_ids):
+    # one pass per metric, the way analytics() used to be written
+    income = sum(cents for _, cents, _ in rows if cents > 0)
+    expenses = sum(-cents for _, cents, _ in rows if cents < 0)
+    per_category = [sum(-cents for _, cents, c in rows if c == cid and cents < 0) for cid in category_ids]
+
+    daily = defaultdict(int)
+    for day, cents, _ in rows:
+        if cents < 0:
+            daily[day] -= cents
+    first, last = min(day for day, _, _ in rows), max(day for day, _, _ in rows)
+    calendar = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+    rolling = {n: [sum(daily.get(d - timedelta(days=k), 0) for k in range(n)) for d in calendar] for n in (7, 30)}
+
+    monthly = defaultdict(int)
+    for day, cents, _ in rows:
+        if cents < 0:
+            monthly[(day.year, day.month)] -= cents
+    months = sorted(monthly)
+    deltas = [monthly[m] - monthly[p] for p, m in zip(months, months[1:])]
+
+    spent = sorted(-cents for _, cents, _ in rows if cents < 0)
+    p50 = spent[(len(spent) - 1) * 50 // 100]
+    return income, expenses, per_category, rolling, deltas, p50
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    failed = False
+    print(f"{'transactions':>12} {'load ms':>10} {'vector ms':>10} {'python ms':>10} {'speedup':>8}")
+    with app.app_context():
+        for i, size in enumerate(int(s) for s in args.sizes.split(',')):
+            # two years of history, so the monthly and 30-day windows have something to do
+            user_id = seed_user(f"bench{i}", size, days=730)
+            load_ms = timeit(lambda: TransactionFrame.load(user_id), repeat=3)
+            frame = TransactionFrame.load(user_id)
+            vector_ms = timeit(frame.report)
+
+            rows = db.session.execute(
+                db.select(Transaction.date, Transaction.amount_cents, Transaction.category_id)
+                .where(Transaction.user_id == user_id)
+            ).all()
+            py_ms = timeit(lambda: python_report(rows, frame.category_ids.tolist()), repeat=1)
+            print(f"{size:>12} {load_ms:>10.1f} {vector_ms:>10.1f} {py_ms:>10.1f} {py_ms / vector_ms:>7.0f}x")
+
+            income, expenses, per_category, rolling, deltas, p50 = python_report(rows, frame.category_ids.tolist())
+            report = frame.report()
+            monthly = report['monthly']['expenses']
+            checks = {
+                'totals': (round(report['income'] * 100), round(report['expenses'] * 100)) == (income, expenses),
+                'categories': [round(a * 100) for a in report['category_amounts']] == per_category,
+                'rolling 7d': [round(a * 100) for a in report['rolling_spend']['spend_7d']] == rolling[7],
+                'rolling 30d': [round(a * 100) for a in report['rolling_spend']['spend_30d']] == rolling[30],
+                'monthly deltas': [round(a * 100) for a in report['monthly']['expense_delta'][1:]] == deltas
+                                  and len(monthly) == len(deltas) + 1,
+                'p50': round(report['expense_percentiles']['p50'] * 100) == p50,
+            }
+            for name, ok in checks.items():
+                if not ok:
+                    failed = True
+                    print(f"  MISMATCH: {name}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Requests/s of the dashboard read endpoints: sync Flask views on gunicorn vs the async path on uvicorn.
+
+    python -m benchmarks.bench_async_reads [--clients 100,200] [--duration 10]
+        [--workers 4] [--users 20] [--transactions 2000] [--no-cache]
+        [--database-url postgresql://...]
+
+Both servers run against the same seeded database with the same number of
+worker processes. `clients` connections at a time cycle through
+/transactions/page, /api/analytics, /api/analytics/summary and /api/goals as
+logged-in users, for `duration` seconds per run. Reports requests/s, p50,
+p95, p99 and errors.
+
+--no-cache sets ANALYTICS_CACHE_MAXSIZE=0 in the servers, so every request
+runs its queries instead of mostly hitting the cached results.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from app import db
+
+from benchmarks.common import make_app, percentile
+from benchmarks.loadtest.drivers import GunicornDriver, UvicornDriver, login
+from benchmarks.loadtest.seed import seed
+
+PATHS = (
+    '/transactions/page',
+    '/api/analytics?granularity=week',
+    '/api/analytics/summary',
+    '/api/goals',
+)
+
+
+async def _read_response(reader):
+    """Return (status, keep_alive) after reading one response."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def client(port, cookies, offset, deadline, latencies, statuses):
+    """One connection (reopened when the server closes it) sending requests until the deadline."""
+    reader = writer = None
+    i = offset
+    while time.perf_counter() < deadline:
+        if writer is None:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        request = (f"GET {PATHS[i % len(PATHS)]} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                   f"Cookie: session={cookies[i % len(cookies)]}\r\n\r\n").encode()
+        i += 1
+        started = time.perf_counter()
+        try:
+            writer.write(request)
+            status, keep_alive = await _read_response(reader)
+        except (OSError, asyncio.IncompleteReadError):
+            status, keep_alive = 599, False
+        latencies.append(time.perf_counter() - started)
+        statuses.append(status)
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port, cookies, clients, duration):
+    latencies, statuses = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(port, cookies, n, started + duration, latencies, statuses) for n in range(clients)
+    ))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def session_cookie(driver, user):
+    session = login(driver.session(), user)
+    return next(c.value for c in session.cookies if c.name == 'session')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', default='100,200', help='Comma-separated concurrent connection counts.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per run.')
+    parser.add_argument('--workers', type=int, default=4, help='Worker processes for each server.')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=2000, help='Transactions per user.')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    if args.no_cache:
+        os.environ['ANALYTICS_CACHE_MAXSIZE'] = '0'
+    app = make_app(args.database_url)
+    with app.app_context():
+        users = seed(args.users, 10, args.transactions, 5)
+        db.engine.dispose()
+    database_url = app.config['SQLALCHEMY_DATABASE_URI']
+
+    print(f"{args.users} users x {args.transactions} transactions, {args.workers} workers, "
+          f"{args.duration:.0f}s per run, cache {'off' if args.no_cache else 'on'}")
+    print(f"{'server':<22} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for name, driver_class in (('gunicorn sync (Flask)', GunicornDriver), ('uvicorn async (ASGI)', UvicornDriver)):
+        driver = driver_class(database_url, args.workers)
+        try:
+            cookies = [session_cookie(driver, user) for user in users]
+            for clients in (int(c) for c in args.clients.split(',')):
+                latencies, statuses, elapsed = asyncio.run(drive(driver.port, cookies, clients, args.duration))
+                ms = [seconds * 1000 for seconds in latencies]
+                errors = sum(1 for status in statuses if status >= 400)
+                print(f"{name:<22} {clients:>7} {len(statuses) / elapsed:>8.1f} {percentile(ms, 50):>8.1f} "
+                      f"{percentile(ms, 95):>8.1f} {percentile(ms, 99):>8.1f} {errors:>6}")
+        finally:
+            driver.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Cost of the overspend check on each saved transaction: counters vs rescanning the month.
+
+    python -m benchmarks.bench_budgets [--month-rows 1000,10000,100000] [--writes 200]
+        [--database-url postgresql://...]
+
+For each size, a user gets `month-rows` expenses this month in one budgeted
+category. Then `writes` more expenses are saved one at a time, each followed
+by a budget check and a commit, the way add_transaction does it:
+  - counters: rollups.record() bumps monthly_spend, budgets.overspend() reads one row
+  - rescan:   SUM(amount) over the category's transactions this month
+Prints p50/p95 per save in ms.
+"""
+import argparse
+import time
+from datetime import date
+
+from sqlalchemy import func, select
+
+from app import budgets, db, rollups
+from app.models import Category, Transaction
+
+from benchmarks.common import make_app, percentile, seed_user
+
+
+def seed(month_rows):
+    user_id = seed_user(f"budget{month_rows}", 0, n_categories=1)
+    category = Category.query.filter_by(user_id=user_id).one()
+    category.budget = 1
+    month = budgets.month_start(date.today())
+    rows = [{'description': f"spend {i}", 'amount_cents': -100, 'date': month.replace(day=1 + i % 28),
+             'user_id': user_id, 'category_id': category.id} for i in range(month_rows)]
+    for start in range(0, len(rows), 5000):
+        db.session.execute(db.insert(Transaction), rows[start:start + 5000])
+    db.session.commit()
+    rollups.rebuild(user_id)
+    budgets.rebuild(user_id)
+    return user_id, category.id
+
+
+def save(user_id, category_id, i, check):
+    tx = Transaction(description=f"new {i}", amount_cents=-100, date=date.today(),
+                     user_id=user_id, category_id=category_id)
+    db.session.add(tx)
+    rollups.record(tx)
+    check(tx)
+    db.session.commit()
+
+
+def rescan(tx):
+    month = budgets.month_start(tx.date)
+    spent = db.session.execute(
+        select(func.sum(-Transaction.amount_cents))
+        .where(Transaction.user_id == tx.user_id, Transaction.category_id == tx.category_id,
+               Transaction.date >= month, Transaction.amount_cents < 0)
+    ).scalar()
+    budget = db.session.get(Category, tx.category_id).budget_cents
+    return spent > budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--month-rows', default='1000,10000,100000', help='Comma-separated sizes.')
+    parser.add_argument('--writes', type=int, default=200)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    with app.app_context():
+        print(f"{'month rows':>10} {'check':<9} {'p50 ms':>8} {'p95 ms':>8}  ({db.engine.dialect.name})")
+        for month_rows in (int(n) for n in args.month_rows.split(',')):
+            user_id, category_id = seed(month_rows)
+            for label, check in (('counters', budgets.overspend), ('rescan', rescan)):
+                times = []
+                for i in range(args.writes):
+                    started = time.perf_counter()
+                    save(user_id, category_id, i, check)
+                    times.append((time.perf_counter() - started) * 1000)
+                print(f"{month_rows:>10} {label:<9} {percentile(times, 50):>8.2f} {percentile(times, 95):>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Concurrent category creation: INSERT ... ON CONFLICT vs check-then-insert.
+
+    python -m benchmarks.bench_category_create [--workers 8] [--users 20] [--names 10]
+        [--database-url postgresql://...]
+
+Like gunicorn with several workers, each worker is a separate process with
+its own app and engine (DB_PROFILE=default, so SQLite runs in WAL mode with
+a busy timeout). All workers walk the same list of (user, name) pairs in the
+same order, so nearly every create races against the others, and every user
+uses the same names, so users share them:
+  - upsert: app.categories.create_category(), then commit
+  - check:  the old add-category path, SELECT by (user_id, name), INSERT if
+            missing, commit; losing a race is an IntegrityError (a 500)
+
+Afterwards each pair must exist exactly once and every worker must have got
+the same id for it. The script exits with status 1 if the upsert path failed
+a create or disagreed on an id.
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app import db
+from app.categories import create_category
+from app.models import Category, User
+
+from benchmarks.common import make_app, percentile
+
+NAMES = ('Food', 'Rent', 'Transport', 'Salary', 'Airtime', 'Utilities', 'Health', 'Savings', 'Fun', 'School',
+         'Gifts', 'Clothes', 'Fuel', 'Insurance', 'Church', 'Travel')
+
+
+def check_then_insert(user_id, name):
+    existing = db.session.execute(
+        select(Category.id).where(Category.user_id == user_id, Category.name == name)
+    ).scalar()
+    if existing is not None:
+        return existing, False
+    category = Category(name=name, user_id=user_id)
+    db.session.add(category)
+    db.session.flush()
+    return category.id, True
+
+
+STRATEGIES = {'upsert': create_category, 'check': check_then_insert}
+
+
+def worker(database_url, strategy, pairs):
+    from app import create_app
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, 'DB_PROFILE': 'default'})
+    create = STRATEGIES[strategy]
+    latencies, errors, ids, created = [], [], {}, 0
+    with app.app_context():
+        for user_id, name in pairs:
+            started = time.perf_counter()
+            try:
+                category_id, new = create(user_id, name)
+                db.session.commit()
+                latencies.append(time.perf_counter() - started)
+                ids[user_id, name] = category_id
+                created += new
+            except (IntegrityError, OperationalError) as e:
+                db.session.rollback()
+                errors.append(type(e.orig).__name__ + ': ' + str(e.orig).splitlines()[0])
+            db.session.remove()
+    return latencies, errors, ids, created
+
+
+def seed_users(n):
+    user = User(username='template', email='template@example.com')
+    user.set_password('password')
+    db.session.execute(db.insert(User), [
+        {'username': f"cat{i}", 'email': f"cat{i}@example.com", 'password_hash': user.password_hash}
+        for i in range(n)
+    ])
+    db.session.commit()
+    return db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+
+
+def run(strategy, args):
+    app = make_app(args.database_url, DB_PROFILE='default')
+    database_url = app.config['SQLALCHEMY_DATABASE_URI']
+    with app.app_context():
+        user_ids = seed_users(args.users)
+        db.engine.dispose()
+    pairs = [(user_id, name) for name in NAMES[:args.names] for user_id in user_ids]
+
+    started = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(args.workers) as pool:
+        results = pool.starmap(worker, [(database_url, strategy, pairs)] * args.workers)
+    elapsed = time.perf_counter() - started
+
+    latencies = [seconds for lat, _, _, _ in results for seconds in lat]
+    errors = [e for _, errs, _, _ in results for e in errs]
+    created = sum(n for _, _, _, n in results)
+    # every worker that got an id for a pair must have got the same one
+    disagreements = sum(
+        len({ids[pair] for _, _, ids, _ in results if pair in ids}) > 1 for pair in pairs
+    )
+    with app.app_context():
+        rows = db.session.execute(select(func.count()).select_from(Category)).scalar()
+    return latencies, errors, elapsed, created, disagreements, rows, len(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--names', type=int, default=10, help=f"Category names per user (max {len(NAMES)}).")
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.users} users x {args.names} names, every create contended")
+    print(f"{'strategy':<8} {'ok':>6} {'failed':>7} {'created':>8} {'rows':>6} {'same id':>8} "
+          f"{'creates/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    failed = False
+    for strategy in STRATEGIES:
+        latencies, errors, elapsed, created, disagreements, rows, expected = run(strategy, args)
+        consistent = created == rows == expected and not disagreements
+        print(f"{strategy:<8} {len(latencies):>6} {len(errors):>7} {created:>8} {rows:>6} "
+              f"{'yes' if not disagreements else 'NO':>8} {len(latencies) / elapsed:>10.0f} "
+              f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f}")
+        for message in sorted(set(errors))[:3]:
+            print(f"  error: {message}")
+        if strategy == 'upsert' and (errors or not consistent):
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
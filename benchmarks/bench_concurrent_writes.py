@@ -0,0 +1,96 @@
+"""Concurrent add-transaction writes under each DB_PROFILE.
+
+    python -m benchmarks.bench_concurrent_writes [--workers 8] [--writes 200]
+        [--profiles stock,default,production] [--database-url URL]
+
+Like gunicorn with several workers, each worker is a separate process with
+its own app and engine. Every write does what add_transaction does: read
+the category (form validation), insert the transaction, bump its daily
+rollup and commit. For every profile a fresh database is used; the script
+reports throughput, latency percentiles and how many writes failed
+(on stock SQLite: "database is locked").
+"""
+import argparse
+import multiprocessing
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy.exc import OperationalError
+
+from app import db, rollups
+from app.models import Category, Transaction
+
+from benchmarks.common import make_app, percentile, seed_user
+
+
+def worker(database_url, profile, user_id, category_ids, writes, seed):
+    from app import create_app
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, 'DB_PROFILE': profile})
+    rng = random.Random(seed)
+    latencies, errors = [], []
+    with app.app_context():
+        for i in range(writes):
+            started = time.perf_counter()
+            try:
+                category = db.session.get(Category, rng.choice(category_ids))
+                tx = Transaction(description=f"w{seed}-{i}", amount=rng.randint(-5000, 5000),
+                                 date=date.today() - timedelta(days=rng.randrange(30)),
+                                 user_id=user_id, category_id=category.id)
+                db.session.add(tx)
+                rollups.record(tx)
+                db.session.commit()
+                latencies.append(time.perf_counter() - started)
+            except OperationalError as e:
+                db.session.rollback()
+                errors.append(str(e.orig))
+            # drop the identity map so every write reads again, like a new request
+            db.session.remove()
+    return latencies, errors
+
+
+def run(profile, args):
+    app = make_app(args.database_url, DB_PROFILE=profile)
+    database_url = app.config['SQLALCHEMY_DATABASE_URI']
+    with app.app_context():
+        user_id = seed_user('writer', 0, n_categories=5)
+        category_ids = [c.id for c in Category.query.filter_by(user_id=user_id)]
+        db.engine.dispose()
+
+    jobs = [(database_url, profile, user_id, category_ids, args.writes, seed) for seed in range(args.workers)]
+    started = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(args.workers) as pool:
+        results = pool.starmap(worker, jobs)
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for lat, _ in results for ms in lat]
+    errors = [e for _, errs in results for e in errs]
+    with app.app_context():
+        mismatches = rollups.verify()
+    return latencies, errors, elapsed, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200, help='Writes per worker.')
+    parser.add_argument('--profiles', default='stock,default,production')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.writes} writes")
+    print(f"{'profile':<12} {'ok':>6} {'failed':>7} {'writes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for profile in args.profiles.split(','):
+        latencies, errors, elapsed, mismatches = run(profile, args)
+        print(f"{profile:<12} {len(latencies):>6} {len(errors):>7} {len(latencies) / elapsed:>9.0f} "
+              f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f} "
+              f"{percentile(latencies, 99) * 1000:>8.1f}")
+        for message in sorted(set(errors))[:3]:
+            print(f"  error: {message}")
+        if mismatches:
+            print(f"  {len(mismatches)} rollup rows differ from the transactions")
+
+
+if __name__ == '__main__':
+    main()
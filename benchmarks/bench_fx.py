@@ -0,0 +1,111 @@
+"""Cost of multi-currency support: analytics, conversion of a batch and re-conversion after new rates.
+
+    python -m benchmarks.bench_fx [--rows 100000] [--naive-rows 5000] [--database-url postgresql://...]
+
+Two users get `rows` transactions each over the last year: one only in the
+reporting currency, one with two thirds in USD and EUR (daily rates for both).
+  - analytics: the SQL analytics queries for each user, which should cost the
+    same, since amounts are converted when written
+  - convert: `rows` import-style row dicts converted with fx.convert_rows()
+    (one numpy pass and one rates-version check), per row with fx.convert()
+    (memoized rates, but a version check per call, as a form save does) and,
+    for `naive-rows` rows, per row with a rate query each time
+  - reconvert: fx.reconvert_all() for the mixed user, the single UPDATE plus
+    the rollup and budget rebuild that follow a rate load
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import case, update
+
+from app import analytics, db, fx
+from app.models import Transaction
+
+from benchmarks.common import make_app, seed_user, timeit
+
+CURRENCIES = ('USD', 'EUR')
+
+
+def load_daily_rates(days):
+    start = date.today() - timedelta(days=days)
+    rows = [{'currency': currency, 'day': start + timedelta(days=n), 'rate': base + (n % 30) / 10}
+            for currency, base in (('USD', 129.0), ('EUR', 140.0)) for n in range(days + 1)]
+    fx.load_rates(rows)
+
+
+def make_mixed(user_id):
+    """Move two thirds of the user's transactions to USD and EUR, keeping amount_cents as the original."""
+    db.session.execute(
+        update(Transaction)
+        .where(Transaction.user_id == user_id)
+        .values(currency=case((Transaction.id % 3 == 1, 'USD'), (Transaction.id % 3 == 2, 'EUR'), else_='KES'),
+                original_amount_cents=case((Transaction.id % 3 == 0, None), else_=Transaction.amount_cents)),
+        execution_options={'synchronize_session': False},
+    )
+    db.session.commit()
+
+
+def analytics_queries(user_id):
+    return (
+        analytics.totals(user_id),
+        analytics.category_spending(user_id),
+        analytics.daily_totals(user_id),
+    )
+
+
+def import_rows(n, days):
+    start = date.today() - timedelta(days=days)
+    return [{'amount_cents': -(i % 5000) - 1, 'currency': CURRENCIES[i % 2],
+             'date': start + timedelta(days=i % days), 'user_id': 1} for i in range(n)]
+
+
+def per_row(rows, clear_cache=False):
+    cache = current_app.extensions['fx_rate_cache']
+    for row in rows:
+        if clear_cache:
+            cache.clear()
+        fx.convert(row['amount_cents'], row['currency'], 'KES', row['date'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--naive-rows', type=int, default=5000, help='Rows for the query-per-row baseline.')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+    days = 365
+
+    app = make_app(args.database_url)
+    with app.app_context():
+        load_daily_rates(days)
+        single = seed_user('single', args.rows, days=days)
+        mixed = seed_user('mixed', args.rows, days=days, seed=1)
+        make_mixed(mixed)
+        started = time.perf_counter()
+        count = fx.reconvert_all(mixed)
+        print(f"reconvert: {count} transactions in {time.perf_counter() - started:.2f}s "
+              f"(UPDATE plus rollup and budget rebuild, {db.engine.dialect.name})")
+
+        print(f"{'analytics':<26} {'best ms':>9}")
+        for label, user_id in (('single currency', single), ('two thirds USD/EUR', mixed)):
+            db.session.expire_all()
+            print(f"{label:<26} {timeit(lambda: analytics_queries(user_id)):>9.1f}")
+
+        print(f"{'convert':<26} {'rows':>9} {'rows/s':>12}")
+        reporting = {1: 'KES'}
+        for label, n, convert in (
+            ('convert_rows (numpy)', args.rows, lambda rows: fx.convert_rows(rows, reporting)),
+            ('convert() per row', args.rows, per_row),
+            ('rate query per row', args.naive_rows, lambda rows: per_row(rows, clear_cache=True)),
+        ):
+            rows = import_rows(n, days)
+            current_app.extensions['fx_rate_cache'].clear()
+            started = time.perf_counter()
+            convert(rows)
+            print(f"{label:<26} {n:>9} {n / (time.perf_counter() - started):>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
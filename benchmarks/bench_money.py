@@ -0,0 +1,85 @@
+"""Compare float money totals with integer-cent totals: speed and exactness.
+
+    python -m benchmarks.bench_money [--rows 1000000] [--database-url URL]
+
+Fills a scratch table with the same random 2dp amounts stored both as a
+float (the old Transaction.amount) and as integer cents, then times:
+  - python float: load every float and sum() it in Python (old analytics)
+  - sql float:    SUM() over the float column
+  - sql cents:    SUM() over the integer column (what the app does now)
+and reports how far each total drifts from the exact value.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+
+import sqlalchemy as sa
+
+from app.money import from_cents
+
+
+metadata = sa.MetaData()
+money_bench = sa.Table(
+    'money_bench', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('amount', sa.Float, nullable=False),
+    sa.Column('amount_cents', sa.BigInteger, nullable=False),
+)
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    url = args.database_url
+    if url is None:
+        fd, path = tempfile.mkstemp(suffix='.db', prefix='budget-bench-')
+        os.close(fd)
+        url = f"sqlite:///{path}"
+    engine = sa.create_engine(url)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    rng = random.Random(0)
+    exact_cents = 0
+    with engine.begin() as conn:
+        batch = []
+        for i in range(args.rows):
+            cents = rng.randint(-500000, 500000)
+            exact_cents += cents
+            batch.append({'amount': cents / 100, 'amount_cents': cents})
+            if len(batch) == 10000:
+                conn.execute(money_bench.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(money_bench.insert(), batch)
+
+    exact = from_cents(exact_cents)
+    with engine.connect() as conn:
+        paths = {
+            'python float': lambda: sum(a for (a,) in conn.execute(sa.select(money_bench.c.amount))),
+            'sql float': lambda: conn.execute(sa.select(sa.func.sum(money_bench.c.amount))).scalar(),
+            'sql cents': lambda: from_cents(conn.execute(sa.select(sa.func.sum(money_bench.c.amount_cents))).scalar()),
+        }
+
+        print(f"{args.rows:,} rows, exact total {exact}")
+        print(f"{'path':<14} {'ms':>9} {'total':>22} {'drift':>14}")
+        for name, fn in paths.items():
+            total, ms = timed(fn)
+            drift = Decimal(repr(total)) - exact if isinstance(total, float) else total - exact
+            print(f"{name:<14} {ms:>9.1f} {total!s:>22} {drift!s:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Logins per second for each password hash setting, and what a login burst does to other pages.
+
+    python -m benchmarks.bench_passwords [--methods scrypt:32768:8:1,pbkdf2:sha256:600000]
+        [--workers 0,2] [--concurrency 8] [--logins 80]
+
+For every (PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS) pair, `concurrency`
+test clients post to /auth/login at once while one more client keeps
+loading the home page. Reports logins/s, login p95, home page p95 during
+the burst and how many logins were turned away (503).
+
+Before timing, it checks that a hash made with other parameters is
+upgraded on login.
+"""
+import argparse
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import db
+from app.models import User
+
+from benchmarks.common import make_app, percentile, seed_user
+
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def login_client(app, email):
+    client = app.test_client()
+    token = CSRF_TOKEN.search(client.get('/auth/login').get_data(as_text=True)).group(1)
+    return client, {'email': email, 'password': 'password', 'csrf_token': token}
+
+
+def check_rehash(method):
+    app = make_app(PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    with app.app_context():
+        seed_user('old', 0, n_categories=1)
+    app.config['PASSWORD_HASH_METHOD'] = method
+    client, form = login_client(app, 'old@example.com')
+    status = client.post('/auth/login', data=form).status_code
+    with app.app_context():
+        prefix = User.query.filter_by(username='old').one().password_hash.split('$')[0]
+    print(f"rehash on login: status {status}, pbkdf2:sha256:1000 -> {prefix}")
+
+
+def run(method, workers, args):
+    app = make_app(PASSWORD_HASH_METHOD=method, PASSWORD_HASH_WORKERS=workers)
+    app.testing = False
+    with app.app_context():
+        for n in range(args.concurrency):
+            seed_user(f"user{n}", 0, n_categories=1)
+        db.engine.dispose()
+
+    clients = [login_client(app, f"user{n}@example.com") for n in range(args.concurrency)]
+    done = threading.Event()
+    home_latencies = []
+
+    def browse():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get('/')
+            home_latencies.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+    def log_in(n):
+        client, form = clients[n % len(clients)]
+        started = time.perf_counter()
+        status = client.post('/auth/login', data=form).status_code
+        return status, time.perf_counter() - started
+
+    browser = threading.Thread(target=browse)
+    browser.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        results = list(executor.map(log_in, range(args.logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    browser.join()
+
+    ok = [seconds for status, seconds in results if status == 302]
+    busy = sum(1 for status, _ in results if status == 503)
+    return len(ok) / elapsed, percentile(ok, 95), percentile(home_latencies, 95), busy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--methods', default='scrypt:32768:8:1,scrypt:16384:8:1,pbkdf2:sha256:600000,pbkdf2:sha256:100000')
+    parser.add_argument('--workers', default='0,2', help='PASSWORD_HASH_WORKERS values to try.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=80)
+    args = parser.parse_args()
+
+    check_rehash(args.methods.split(',')[0])
+    print(f"{args.concurrency} concurrent clients, {args.logins} logins per setting")
+    print(f"{'method':<24} {'pool':>4} {'logins/s':>9} {'login p95 ms':>13} {'home p95 ms':>12} {'503s':>5}")
+    for method in args.methods.split(','):
+        for workers in (int(w) for w in args.workers.split(',')):
+            rate, login_p95, home_p95, busy = run(method, workers, args)
+            print(f"{method:<24} {workers:>4} {rate:>9.1f} {login_p95 * 1000:>13.1f} {home_p95 * 1000:>12.1f} {busy:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Time to catch up a year of recurring transactions for many users.
+
+    python -m benchmarks.bench_recurring [--users 2000] [--batch-size 500]
+        [--naive-users 50] [--database-url postgresql://...]
+
+Every user gets four rules starting a year ago: monthly rent, monthly salary,
+a weekly ride and a cron subscription ('1,15 * *'). The batched scheduler
+(app.recurring.run) materializes all of them, then runs again to show that a
+re-run inserts nothing. For comparison, the same rules for `naive-users`
+users are materialized one transaction and one commit at a time.
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from app import db, recurring, rollups
+from app.models import Category, RecurringRule, Transaction, User
+
+from benchmarks.common import make_app
+
+RULES = (
+    {'description': 'Rent', 'amount_cents': -2500000, 'frequency': 'monthly', 'cron': None},
+    {'description': 'Salary', 'amount_cents': 12000000, 'frequency': 'monthly', 'cron': None},
+    {'description': 'Uber ride', 'amount_cents': -45000, 'frequency': 'weekly', 'cron': None},
+    {'description': 'Netflix', 'amount_cents': -110000, 'frequency': 'cron', 'cron': '1,15 * *'},
+)
+
+
+def seed(n_users, start):
+    # one shared password hash: hashing thousands of passwords would dominate the setup
+    user = User(username='template', email='template@example.com')
+    user.set_password('password')
+    password_hash = user.password_hash
+
+    db.session.execute(db.insert(User), [
+        {'username': f"recur{i}", 'email': f"recur{i}@example.com", 'password_hash': password_hash}
+        for i in range(n_users)
+    ])
+    user_ids = db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+    db.session.execute(db.insert(Category), [{'name': f"recur{uid}-bills", 'user_id': uid} for uid in user_ids])
+    categories = dict(db.session.execute(select(Category.user_id, Category.id)).all())
+
+    rules = []
+    for uid in user_ids:
+        for rule in RULES:
+            rules.append({**rule, 'user_id': uid, 'category_id': categories[uid], 'every': 1,
+                          'start_date': start, 'next_date': start})
+    db.session.execute(db.insert(RecurringRule), rules)
+    db.session.commit()
+    return user_ids
+
+
+def naive(user_ids, until):
+    """One ORM insert and one commit per occurrence, the way the add-transaction form does it."""
+    inserted = 0
+    rules = RecurringRule.query.filter(RecurringRule.user_id.in_(user_ids)).all()
+    for rule in rules:
+        for day in recurring.occurrences(rule, rule.next_date, until):
+            tx = Transaction(description=rule.description, amount_cents=rule.amount_cents, date=day,
+                             user_id=rule.user_id, category_id=rule.category_id)
+            db.session.add(tx)
+            rollups.record(tx)
+            db.session.commit()
+            inserted += 1
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500, help='Rules per scheduler batch.')
+    parser.add_argument('--naive-users', type=int, default=50, help='Users for the row-at-a-time baseline.')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    until = date.today()
+    start = until - timedelta(days=365)
+
+    app = make_app(args.database_url)
+    with app.app_context():
+        started = time.perf_counter()
+        seed(args.users, start)
+        print(f"seeded {args.users} users x {len(RULES)} rules in {time.perf_counter() - started:.1f}s "
+              f"({db.engine.dialect.name})")
+
+        print(f"{'run':<28} {'rules':>6} {'inserted':>9} {'skipped':>8} {'seconds':>8} {'rows/s':>9}")
+        for label in ('batched, year of backlog', 'batched, re-run'):
+            result = recurring.run(until, args.batch_size)
+            print(f"{label:<28} {result.rules:>6} {result.inserted:>9} {result.skipped:>8} "
+                  f"{result.seconds:>8.2f} {result.inserted / result.seconds:>9,.0f}")
+
+    app = make_app(args.database_url)
+    with app.app_context():
+        naive_ids = seed(args.naive_users, start)
+        started = time.perf_counter()
+        inserted = naive(naive_ids, until)
+        seconds = time.perf_counter() - started
+        print(f"{'row at a time':<28} {args.naive_users * len(RULES):>6} {inserted:>9} {0:>8} "
+              f"{seconds:>8.2f} {inserted / seconds:>9,.0f}")
+
+
+if __name__ == '__main__':
+    main()
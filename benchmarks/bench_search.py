@@ -0,0 +1,106 @@
+"""Full-text search latency against a substring (ILIKE) scan on a large transaction table.
+
+    python -m benchmarks.bench_search [--rows 500000] [--users 5] [--repeat 50]
+        [--database-url postgresql://...]
+
+Seeds `rows` transactions spread over `users` users, with descriptions drawn
+from a merchant/word vocabulary. Each query is run `repeat` times through
+app.search.search() (first page, ranked) and through a plain
+description ILIKE '%word%' filter. The table prints p50/p95 for both.
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from app import db, search
+from app.models import Category, Transaction
+
+from benchmarks.common import make_app, percentile, seed_user
+
+MERCHANTS = ['Naivas', 'Carrefour', 'Java House', 'Uber', 'Bolt', 'Safaricom', 'KPLC', 'Shell', 'Total',
+             'Jumia', 'Glovo', 'Artcaffe', 'Quickmart', 'Netflix', 'Spotify', 'Zuku', 'Chandarana']
+WORDS = ['payment', 'transfer', 'groceries', 'fuel', 'airtime', 'bundle', 'token', 'ride', 'lunch', 'dinner',
+         'coffee', 'subscription', 'refund', 'salary', 'rent', 'school', 'fees', 'insurance', 'pharmacy', 'gift']
+
+QUERIES = {
+    'rare word': 'pharmacy refund',
+    'common word': 'payment',
+    'prefix': 'groc',
+    'merchant + word': 'java coffee',
+    'no match': 'xylophone',
+}
+
+
+def seed(n_rows, n_users, seed=0):
+    rng = random.Random(seed)
+    user_ids = [seed_user(f"search{u}", 0, n_categories=5) for u in range(n_users)]
+    categories = {uid: [c for c, in db.session.execute(select(Category.id).where(Category.user_id == uid))]
+                  for uid in user_ids}
+    start = date.today() - timedelta(days=730)
+    batch = []
+    for i in range(n_rows):
+        uid = user_ids[i % n_users]
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        batch.append({
+            'description': f"{rng.choice(MERCHANTS)} {' '.join(words)} {rng.randrange(100000)}",
+            'amount_cents': rng.randint(-500000, 500000),
+            'date': start + timedelta(days=rng.randrange(730)),
+            'user_id': uid,
+            'category_id': rng.choice(categories[uid]),
+        })
+        if len(batch) >= 5000:
+            db.session.execute(db.insert(Transaction), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(Transaction), batch)
+    db.session.commit()
+    return user_ids
+
+
+def ilike(user_id, query, limit):
+    clauses = [Transaction.description.ilike(f"%{word}%") for word in search.terms(query)]
+    return db.session.execute(
+        select(Transaction.id).where(Transaction.user_id == user_id, *clauses)
+        .order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit)
+    ).all()
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return percentile(times, 50), percentile(times, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=50, help='Results per page.')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    with app.app_context():
+        started = time.perf_counter()
+        user_ids = seed(args.rows, args.users)
+        print(f"seeded {args.rows} rows for {args.users} users in {time.perf_counter() - started:.1f}s "
+              f"({db.engine.dialect.name})")
+
+        user_id = user_ids[0]
+        print(f"{'query':<18} {'matches':>8} {'fts p50':>8} {'fts p95':>8} {'ilike p50':>10} {'ilike p95':>10}  ms")
+        for label, query in QUERIES.items():
+            rows, _ = search.search(user_id, query, limit=args.limit)
+            fts = timed(lambda: search.search(user_id, query, limit=args.limit), args.repeat)
+            scan = timed(lambda: ilike(user_id, query, args.limit), args.repeat)
+            print(f"{label:<18} {len(rows):>8} {fts[0]:>8.1f} {fts[1]:>8.1f} {scan[0]:>10.1f} {scan[1]:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
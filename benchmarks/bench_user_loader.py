@@ -0,0 +1,61 @@
+"""Measure the DB work the cached user loader saves under load.
+
+    python -m benchmarks.bench_user_loader [--users 50] [--requests 2000]
+
+Drives a cheap authenticated page for many users with the identity cache
+disabled (USER_CACHE_TTL=0) and enabled, and reports queries per request,
+requests per second and the DB time the cache saved.
+"""
+import argparse
+import time
+
+from app import db, users
+from app.querycount import count_queries
+
+from benchmarks.common import make_app, seed_user
+
+
+def run(app, user_ids, n_requests):
+    clients = {}
+    for user_id in user_ids:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        clients[user_id] = client
+
+    with app.app_context():
+        engine = db.engine
+    with count_queries(engine) as counter:
+        started = time.perf_counter()
+        statuses = {clients[user_ids[i % len(user_ids)]].get('/transactions/page').status_code
+                    for i in range(n_requests)}
+        elapsed = time.perf_counter() - started
+
+    assert statuses == {200}, statuses
+    return counter.count / n_requests, n_requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        user_ids = [seed_user(f"loader{i}", 20, n_categories=2, seed=i) for i in range(args.users)]
+
+    print(f"{'mode':<10} {'queries/req':>12} {'req/s':>8} {'hits':>7} {'misses':>7} {'saved ms':>9}")
+    for mode, ttl in (('no cache', 0), ('cache', 60)):
+        app.config['USER_CACHE_TTL'] = ttl
+        app.extensions['cache'].clear()
+        users.stats.__init__()
+
+        per_request, rps = run(app, user_ids, args.requests)
+        s = users.stats
+        print(f"{mode:<10} {per_request:>12.2f} {rps:>8.0f} {s.hits:>7} {s.misses:>7} {s.saved_seconds * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Fail if any page's query count grows with the amount of data (N+1 detector).
+
+    python -m benchmarks.check_query_counts
+
+Seeds a small and a large account, renders every read-only GET route for
+both, and compares the number of SQL statements issued. A route whose count
+depends on how many rows the user has is reported and the script exits 1.
+tests/test_query_counts.py runs the same check with the test suite; this
+script prints the counts for every route.
+"""
+import sys
+
+from app import db
+from app.models import Category, Goal, Transaction
+from app.querycount import assert_max_queries, count_queries
+
+from benchmarks.common import make_app, seed_goals, seed_user
+
+
+# endpoints that change data on GET or end the session
+SKIP = {'static', 'auth.logout', 'main.delete_transaction'}
+
+
+def route_urls(app, user_id):
+    """Yield (endpoint, url) for every GET route, filling ids with the user's own rows."""
+    ids = {
+        'main.edit_transaction': Transaction.query.filter_by(user_id=user_id).first().id,
+        'main.edit_category': Category.query.filter_by(user_id=user_id).first().id,
+        'main.view_goal': Goal.query.filter_by(user_id=user_id).first().id,
+        'main.edit_goal': Goal.query.filter_by(user_id=user_id).first().id,
+    }
+    with app.test_request_context():
+        from flask import url_for
+        for rule in app.url_map.iter_rules():
+            if 'GET' not in rule.methods or rule.endpoint in SKIP:
+                continue
+            if rule.arguments and rule.endpoint not in ids:
+                continue
+            args = {'id': ids[rule.endpoint]} if rule.arguments else {}
+            yield rule.endpoint, url_for(rule.endpoint, **args)
+
+
+def client_for(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def main():
+    app = make_app()
+    with app.app_context():
+        small = seed_user('small', n_transactions=5, n_categories=2)
+        large = seed_user('large', n_transactions=500, n_categories=25)
+        seed_goals(small, 1)
+        seed_goals(large, 20)
+
+    # report broken pages as 500s instead of aborting the whole run
+    app.testing = False
+
+    with app.app_context():
+        engine = db.engine
+        small_urls = dict(route_urls(app, small))
+        large_urls = dict(route_urls(app, large))
+    small_client, large_client = client_for(app, small), client_for(app, large)
+
+    failures = 0
+    print(f"{'endpoint':<32} {'small':>6} {'large':>6}")
+    for endpoint in sorted(small_urls):
+        # start each endpoint cold, so results cached by an earlier endpoint can't favour one account
+        app.extensions['analytics_cache'].clear()
+        with count_queries(engine) as baseline:
+            small_client.get(small_urls[endpoint])
+
+        # the large account may not issue more statements than the small one
+        flag = ''
+        try:
+            with assert_max_queries(baseline.count, engine) as counter:
+                response = large_client.get(large_urls[endpoint])
+        except AssertionError as e:
+            flag = '  <-- grows with data'
+            failures += 1
+            print(e)
+        print(f"{endpoint:<32} {baseline.count:>6} {counter.count:>6}  [{response.status_code}]{flag}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app import budgets, create_app, db, rollups
+from app.models import Category, Goal, Transaction, User
+
+
+# Shared helpers for the benchmark scripts in this folder.
+# Run them from the repo root, e.g. `python -m benchmarks.bench_analytics`.
+
+def make_app(database_url=None, **config):
+    """Create the app against a throwaway database (SQLite temp file by default).
+
+    Extra keyword arguments are passed on as config, e.g. DB_PROFILE='stock'.
+    """
+    if database_url is None:
+        fd, path = tempfile.mkstemp(suffix='.db', prefix='budget-bench-')
+        os.close(fd)
+        database_url = f"sqlite:///{path}"
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'TESTING': True,
+        **config,
+    })
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def seed_user(username, n_transactions, n_categories=10, days=365, seed=0):
+    """Create a user with categories and random transactions. Returns the user id."""
+    rng = random.Random(seed)
+
+    user = User(username=username, email=f"{username}@example.com")
+    user.set_password('password')
+    db.session.add(user)
+    db.session.flush()
+
+    categories = [Category(name=f"{username}-cat-{i}", user_id=user.id) for i in range(n_categories)]
+    db.session.add_all(categories)
+    db.session.flush()
+    category_ids = [c.id for c in categories]
+
+    start = date.today() - timedelta(days=days)
+    batch = []
+    for i in range(n_transactions):
+        batch.append({
+            'description': f"tx {i}",
+            'amount_cents': rng.randint(-500000, 500000),
+            'date': start + timedelta(days=rng.randrange(days)),
+            'user_id': user.id,
+            'category_id': rng.choice(category_ids),
+        })
+        if len(batch) >= 5000:
+            db.session.execute(db.insert(Transaction), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(Transaction), batch)
+
+    db.session.commit()
+    rollups.rebuild(user.id)
+    budgets.rebuild(user.id)
+    return user.id
+
+
+def seed_goals(user_id, n):
+    """Give the user n goals on their first category, every other one tracking it."""
+    category = Category.query.filter_by(user_id=user_id).first()
+    db.session.add_all(
+        Goal(name=f"goal {i}", target_amount=1000, deadline=date.today() + timedelta(days=i),
+             user_id=user_id, category_id=category.id, track_category=i % 2 == 0)
+        for i in range(n)
+    )
+    db.session.commit()
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+def timeit(fn, repeat=5):
+    """Return the best wall time of `repeat` calls to fn, in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
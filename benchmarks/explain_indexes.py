@@ -0,0 +1,107 @@
+"""Check that the hot per-user queries are served by the composite indexes.
+
+    python -m benchmarks.explain_indexes [--database-url URL] [--transactions N]
+
+Runs the real query helpers against a seeded database, captures the SQL they
+emit and prints the EXPLAIN plan of each one. Works on SQLite (EXPLAIN QUERY
+PLAN) and PostgreSQL (EXPLAIN). Exits non-zero if an expected index is not
+used.
+"""
+import argparse
+import sys
+
+from sqlalchemy import event
+
+from app import analytics, db
+from app.models import Goal
+from app.pagination import transactions_page
+
+from benchmarks.common import make_app, seed_user
+
+
+# name -> (callable(user_id), index names of which one must appear in the plan)
+CHECKS = {
+    'transactions page': (
+        lambda uid: transactions_page(uid, limit=50),
+        ('ix_transaction_user_id_date_id',),
+    ),
+    'transactions next page': (
+        lambda uid: transactions_page(uid, cursor='2000-01-01_1', limit=50),
+        ('ix_transaction_user_id_date_id',),
+    ),
+    'analytics totals': (
+        analytics.totals,
+        ('ix_daily_rollup_user_id_day', 'sqlite_autoindex_daily_rollup_1', 'daily_rollup_pkey'),
+    ),
+    'analytics daily totals': (
+        analytics.daily_totals,
+        ('ix_daily_rollup_user_id_day',),
+    ),
+    'analytics category spending': (
+        analytics.category_spending,
+        # rollup primary key is (user_id, category_id, day)
+        ('sqlite_autoindex_daily_rollup_1', 'daily_rollup_pkey'),
+    ),
+    'goals list': (
+        lambda uid: Goal.query.filter_by(user_id=uid).order_by(Goal.deadline).all(),
+        ('ix_goal_user_id_deadline',),
+    ),
+}
+
+
+def capture(engine, fn):
+    """Run fn and return the (statement, parameters) it sent to the database."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        fn()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return statements
+
+
+def explain(conn, statement, parameters):
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        return '\n'.join(str(row[-1]) for row in rows)
+    rows = conn.exec_driver_sql('EXPLAIN ' + statement, parameters).fetchall()
+    return '\n'.join(row[0] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--transactions', type=int, default=20000)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    failures = 0
+    with app.app_context():
+        # a few users so "filter by user" is selective, like production
+        for i in range(4):
+            user_id = seed_user(f"explain{i}", args.transactions // 4, seed=i)
+
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('ANALYZE')
+            if conn.dialect.name == 'postgresql':
+                # small test tables are cheap to seq-scan; we only want to know the index is usable
+                conn.exec_driver_sql('SET enable_seqscan = off')
+
+            for name, (fn, indexes) in CHECKS.items():
+                statements = capture(db.engine, lambda: fn(user_id))
+                plan = '\n'.join(explain(conn, s, p) for s, p in statements)
+                ok = any(index in plan for index in indexes)
+                failures += not ok
+                print(f"[{'ok' if ok else 'FAIL'}] {name} -> expects {' or '.join(indexes)}")
+                for line in plan.splitlines():
+                    print(f"      {line}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+"""Load-test harness: seed a database, drive every route, record per-route numbers.
+
+    python -m benchmarks.loadtest [--users 5] [--transactions 1000] [--requests 50]
+        [--concurrency 8] [--driver client|gunicorn] [--output results.json]
+        [--compare baseline.json]
+
+- seed.py seeds users, categories, transactions and goals through the models
+- scenarios.py turns every route of the `main` and `auth` blueprints into
+  requests (GETs, form POSTs, deletes of spare rows, login/logout)
+- drivers.py sends them with Flask test clients in threads, or over HTTP
+  to a local gunicorn
+- report.py writes p50/p95/p99 latency, query count and peak RSS per route
+  to JSON and compares a run with an earlier one
+"""
@@ -0,0 +1,133 @@
+import argparse
+import logging
+import math
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from app import db
+from app.querycount import count_queries
+
+from benchmarks.common import make_app
+from benchmarks.loadtest import __doc__ as DOC, report, scenarios
+from benchmarks.loadtest.drivers import ClientDriver, GunicornDriver, PeakRSS, SessionPool
+from benchmarks.loadtest.seed import seed
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def send_alone(pool, request):
+    session = pool.acquire(request.user)
+    try:
+        return session.send(request.method, request.url, request.data, request.files)
+    finally:
+        pool.release(request.user, session)
+
+
+def run_route(pool, requests, concurrency):
+    """Send the requests with `concurrency` threads. Returns (latencies, statuses, elapsed)."""
+    def send(request):
+        started = time.perf_counter()
+        status, _ = send_alone(pool, request)
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(send, requests))
+    elapsed = time.perf_counter() - started
+    return [latency for latency, _ in results], [status for _, status in results], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DOC.splitlines()[0])
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--categories', type=int, default=10, help='Categories per user.')
+    parser.add_argument('--transactions', type=int, default=1000, help='Transactions per user.')
+    parser.add_argument('--goals', type=int, default=5, help='Goals per user.')
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per route.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--driver', choices=['client', 'gunicorn'], default='client')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers.')
+    parser.add_argument('--routes', default=None,
+                        help='Comma-separated substrings; only matching "METHOD endpoint" keys run.')
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--output', default='loadtest-results.json')
+    parser.add_argument('--compare', default=None, help='Earlier results file to check for regressions.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown before it counts.')
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    # report broken pages as 500s instead of raising into the harness; they are counted per route
+    app.testing = False
+    app.logger.setLevel(logging.CRITICAL)
+    database_url = app.config['SQLALCHEMY_DATABASE_URI']
+
+    # two extra requests per route go first, on their own: one to warm caches, one to count queries
+    planned = args.requests + 2
+    if planned <= args.users:
+        parser.error('--requests must be at least --users')
+    per_user = math.ceil(planned / args.users)
+    with app.app_context():
+        users = seed(args.users, args.categories, args.transactions, args.goals, spares=per_user)
+        engine = db.engine
+    only = args.routes.split(',') if args.routes else None
+    routes, uncovered = scenarios.plan(app, users, planned, only)
+    for endpoint in uncovered:
+        print(f"warning: no scenario for {endpoint}", file=sys.stderr)
+
+    driver = ClientDriver(app) if args.driver == 'client' else GunicornDriver(database_url, args.workers)
+    try:
+        counting = SessionPool(ClientDriver(app), users, 1)
+        pool = SessionPool(driver, users, max(1, math.ceil(args.concurrency / args.users)))
+        results = {}
+        print(f"{'route':<40} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'errors':>6} {'RSS MiB':>8}")
+        for key, requests in routes:
+            # warm up and count with the same user, so its cached identity and data are reused
+            warmup, first = requests[0], next(r for r in requests[1:] if r.user == requests[0].user)
+            timed = [r for r in requests[1:] if r is not first]
+            send_alone(counting, warmup)
+            with count_queries(engine) as counter:
+                send_alone(counting, first)
+
+            with PeakRSS(driver.pids()) as rss:
+                latencies, statuses, elapsed = run_route(pool, timed, args.concurrency)
+            results[key] = report.summarize(latencies, statuses, elapsed, counter.count, rss.peak_kb, first.url)
+            r = results[key]
+            print(f"{key:<40} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                  f"{r['queries']:>7} {r['errors']:>6} {r['peak_rss_kb'] / 1024:>8.1f}")
+    finally:
+        driver.close()
+
+    meta = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'driver': args.driver,
+        'workers': args.workers if args.driver == 'gunicorn' else None,
+        'concurrency': args.concurrency,
+        'requests_per_route': args.requests,
+        'database': engine.dialect.name,
+        'seed': {'users': args.users, 'categories': args.categories,
+                 'transactions': args.transactions, 'goals': args.goals},
+    }
+    report.write(args.output, meta, results)
+    print(f"wrote {args.output}")
+
+    if args.compare:
+        regressions = report.compare(report.load(args.compare), {'meta': meta, 'routes': results}, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
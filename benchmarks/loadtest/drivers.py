@@ -0,0 +1,238 @@
+import http.cookiejar
+import io
+import os
+import queue
+import re
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+# How requests reach the app.
+#   - ClientDriver: Flask test clients in this process, one per session
+#   - GunicornDriver: a local `gunicorn run:app` on a free port, over HTTP
+#   - UvicornDriver: the same for the ASGI app, `uvicorn asgi:app`
+# Both hand out sessions with the same send() interface, log in through the
+# real login form and post forms with the CSRF token scraped from a page.
+
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+        self.csrf_token = None
+
+    def send(self, method, url, data=None, files=None):
+        data = dict(data or {})
+        if method == 'POST' and self.csrf_token:
+            data['csrf_token'] = self.csrf_token
+        for name, (filename, content) in (files or {}).items():
+            data[name] = (io.BytesIO(content), filename)
+        response = self.client.open(url, method=method, data=data)
+        # read the whole body, so streamed responses are timed to the end
+        return response.status_code, response.get_data()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # report 302s like the test client does instead of following them
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPSession:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.csrf_token = None
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect())
+
+    def _encode(self, data, files):
+        if not files:
+            return urllib.parse.urlencode(data, doseq=True).encode(), 'application/x-www-form-urlencoded'
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in data.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for name, (filename, content) in files.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                         f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+    def send(self, method, url, data=None, files=None):
+        body, headers = None, {}
+        if method == 'POST':
+            data = dict(data or {})
+            if self.csrf_token:
+                data['csrf_token'] = self.csrf_token
+            body, headers['Content-Type'] = self._encode(data, files)
+        request = urllib.request.Request(self.base_url + url, data=body, method=method, headers=headers)
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def login(session, user):
+    """Log the session in through /auth/login and keep its CSRF token for later POSTs."""
+    _, body = session.send('GET', '/auth/login')
+    session.csrf_token = CSRF_TOKEN.search(body.decode()).group(1)
+    status, _ = session.send('POST', '/auth/login', {'email': user.email, 'password': user.password})
+    if status != 302:
+        raise RuntimeError(f"login as {user.email} failed with {status}")
+    return session
+
+
+class ClientDriver:
+    name = 'client'
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        return TestClientSession(self.app)
+
+    def pids(self):
+        return [os.getpid()]
+
+    def close(self):
+        pass
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class GunicornDriver:
+    name = 'gunicorn'
+
+    def __init__(self, database_url, workers=4, threads=1, timeout=30):
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        env = {**os.environ, 'DATABASE_URL': database_url}
+        self.process = subprocess.Popen(self._command(workers, threads), cwd=ROOT, env=env)
+        self._wait_ready(timeout)
+
+    def _command(self, workers, threads):
+        return [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+                '--bind', f"127.0.0.1:{self.port}", '--log-level', 'warning', 'run:app']
+
+    def _wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name} exited with {self.process.returncode}")
+            try:
+                urllib.request.urlopen(self.base_url + '/', timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        self.close()
+        raise RuntimeError(f"{self.name} did not answer on {self.base_url} within {timeout}s")
+
+    def session(self):
+        return HTTPSession(self.base_url)
+
+    def pids(self):
+        """The server's master process and its workers."""
+        master = self.process.pid
+        children = []
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # the command name may contain spaces, so split after its closing parenthesis
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            if ppid == master:
+                children.append(int(entry))
+        return [master] + children
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class UvicornDriver(GunicornDriver):
+    name = 'uvicorn'
+
+    def _command(self, workers, threads):
+        # one event loop per worker; `threads` does not apply
+        return [sys.executable, '-m', 'uvicorn', '--workers', str(workers), '--host', '127.0.0.1',
+                '--port', str(self.port), '--log-level', 'warning', '--no-access-log', 'asgi:app']
+
+
+class SessionPool:
+    """Logged-in sessions per seeded user, shared by the worker threads."""
+
+    def __init__(self, driver, users, per_user):
+        self._free = {}
+        for index, user in enumerate(users):
+            self._free[index] = queue.Queue()
+            for _ in range(per_user):
+                self._free[index].put(login(driver.session(), user))
+
+    def acquire(self, user_index):
+        return self._free[user_index].get()
+
+    def release(self, user_index, session):
+        self._free[user_index].put(session)
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class PeakRSS:
+    """Sample the summed RSS of the given pids in the background; `peak_kb` is the highest seen.
+
+    Without /proc (e.g. macOS) it falls back to this process's lifetime peak.
+    """
+
+    def __init__(self, pids, interval=0.005):
+        self.pids = pids
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while True:
+            self.peak_kb = max(self.peak_kb, sum(_rss_kb(pid) for pid in self.pids))
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if not os.path.exists('/proc'):
+            self.peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
@@ -0,0 +1,65 @@
+import json
+
+from benchmarks.common import percentile
+
+
+# Results file layout:
+#   {"meta": {...run settings...},
+#    "routes": {"GET main.transactions": {"p50_ms": ..., "queries": ..., ...}, ...}}
+# compare() reads two of these and lists what got worse.
+
+def summarize(latencies, statuses, elapsed, queries, peak_rss_kb, url):
+    """One route's numbers. latencies are in seconds."""
+    ms = [seconds * 1000 for seconds in latencies]
+    counts = {}
+    for status in statuses:
+        counts[str(status)] = counts.get(str(status), 0) + 1
+    return {
+        'url': url,
+        'requests': len(statuses),
+        'errors': sum(1 for status in statuses if status >= 400),
+        'statuses': counts,
+        'rps': len(statuses) / elapsed if elapsed else 0.0,
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'mean_ms': round(sum(ms) / len(ms), 3) if ms else 0.0,
+        'max_ms': round(max(ms), 3) if ms else 0.0,
+        'queries': queries,
+        'peak_rss_kb': peak_rss_kb,
+    }
+
+
+def write(path, meta, routes):
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'routes': routes}, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.25, min_ms=1.0):
+    """Return human-readable regressions of `current` against `baseline`.
+
+    Latency and RSS count as regressed when they grow by more than
+    `threshold` (a fraction); latency must also grow by at least `min_ms`
+    so sub-millisecond noise is ignored. Any increase in queries or errors
+    counts.
+    """
+    regressions = []
+    for key, old in sorted(baseline['routes'].items()):
+        new = current['routes'].get(key)
+        if new is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if new[metric] > old[metric] * (1 + threshold) and new[metric] - old[metric] >= min_ms:
+                regressions.append(f"{key}: {metric} {old[metric]:.1f} -> {new[metric]:.1f}")
+        if old['queries'] is not None and new['queries'] is not None and new['queries'] > old['queries']:
+            regressions.append(f"{key}: queries {old['queries']} -> {new['queries']}")
+        if new['errors'] > old['errors']:
+            regressions.append(f"{key}: errors {old['errors']} -> {new['errors']}")
+        if old['peak_rss_kb'] and new['peak_rss_kb'] > old['peak_rss_kb'] * (1 + threshold):
+            regressions.append(f"{key}: peak RSS {old['peak_rss_kb']} -> {new['peak_rss_kb']} KiB")
+    return regressions
@@ -0,0 +1,173 @@
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from flask import url_for
+
+
+# What the load test sends to each route.
+# Every rule of the `main` and `auth` blueprints is covered: GET routes without
+# arguments are requested as they are, everything else is listed in SCENARIOS
+# as (method, phase, build). build(user, i) returns the URL arguments and the
+# form data of the i-th request. Phases run in order, so pages are measured
+# before writes change the data and logout comes last.
+
+READ, WRITE, DELETE, SESSION = range(4)
+
+BLUEPRINTS = ('main', 'auth')
+
+
+@dataclass
+class Request:
+    method: str
+    url: str
+    user: int  # index into the seeded users
+    data: dict = field(default_factory=dict)
+    files: dict = field(default_factory=dict)  # name -> (filename, bytes)
+
+
+def _transaction_form(user, i):
+    return {
+        'description': f"load test {i}",
+        'amount': f"{-(i % 500) - 1}.25",
+        'currency': 'KES',
+        'date': (date.today() - timedelta(days=i % 30)).isoformat(),
+        'category_id': user.category_ids[i % len(user.category_ids)],
+    }
+
+
+def _goal_form(user, i):
+    return {
+        'name': f"load goal {i}",
+        'target_amount': '1000.00',
+        'current_amount': '100.00',
+        'deadline': (date.today() + timedelta(days=30)).isoformat(),
+        'category_id': user.category_ids[0],
+        'status': 'In Progress',
+    }
+
+
+def _statement(user, i):
+    rows = ''.join(f"{date.today().isoformat()},import {i}-{n},-{n + 1}.00\n" for n in range(20))
+    return ('statement.csv', f"date,description,amount\n{rows}".encode())
+
+
+SCENARIOS = {
+    'main.add_transaction': [
+        ('POST', WRITE, lambda user, i: ({}, _transaction_form(user, i))),
+    ],
+    'main.edit_transaction': [
+        ('GET', READ, lambda user, i: ({'id': user.transaction_ids[i % len(user.transaction_ids)]}, {})),
+        ('POST', WRITE, lambda user, i: ({'id': user.transaction_ids[i % len(user.transaction_ids)]},
+                                         _transaction_form(user, i))),
+    ],
+    'main.delete_transaction': [
+        ('GET', DELETE, lambda user, i: ({'id': user.spare_transaction_ids[i]}, {})),
+    ],
+    'main.batch_transactions': [
+        ('POST', WRITE, lambda user, i: ({}, {'action': 'update', 'ids': user.transaction_ids[:20],
+                                              'set_category_id': user.category_ids[i % len(user.category_ids)]})),
+    ],
+    'main.search_transactions': [
+        ('GET', READ, lambda user, i: ({'q': f"tx {i % 10}"}, {})),
+    ],
+    'main.import_statement': [
+        ('POST', WRITE, lambda user, i: ({}, {'format': 'csv'}, {'statement': _statement(user, i)})),
+    ],
+    'main.categories': [
+        ('POST', WRITE, lambda user, i: ({}, {'name': f"u{user.id}-new-{i}"})),
+    ],
+    'main.edit_category': [
+        ('GET', READ, lambda user, i: ({'id': user.category_ids[i % len(user.category_ids)]}, {})),
+        ('POST', WRITE, lambda user, i: ({'id': user.category_ids[-1]}, {'name': f"u{user.id}-renamed-{i}"})),
+    ],
+    'main.delete_category': [
+        ('POST', DELETE, lambda user, i: ({'id': user.spare_category_ids[i]}, {})),
+    ],
+    'main.add_category_modal': [
+        ('POST', WRITE, lambda user, i: ({}, {'name': f"u{user.id}-modal-{i}"})),
+    ],
+    'main.add_goal': [
+        ('POST', WRITE, lambda user, i: ({}, _goal_form(user, i))),
+    ],
+    'main.view_goal': [
+        ('GET', READ, lambda user, i: ({'id': user.goal_ids[i % len(user.goal_ids)]}, {})),
+    ],
+    'main.edit_goal': [
+        ('GET', READ, lambda user, i: ({'id': user.goal_ids[i % len(user.goal_ids)]}, {})),
+        ('POST', WRITE, lambda user, i: ({'id': user.goal_ids[i % len(user.goal_ids)]}, _goal_form(user, i))),
+    ],
+    'main.delete_goal': [
+        ('POST', DELETE, lambda user, i: ({'id': user.spare_goal_ids[i]}, {})),
+    ],
+    'main.budgets_page': [
+        ('POST', WRITE, lambda user, i: ({}, {'category_id': user.category_ids[i % len(user.category_ids)],
+                                              'limit': f"{1000 + i}.00"})),
+    ],
+    'main.recurring_rules': [
+        ('POST', WRITE, lambda user, i: ({}, {
+            **_transaction_form(user, i), 'frequency': 'monthly', 'every': '1', 'start_date': date.today().isoformat(),
+        })),
+    ],
+    'main.delete_recurring_rule': [
+        ('POST', DELETE, lambda user, i: ({'id': user.spare_rule_ids[i]}, {})),
+    ],
+    'main.settings': [
+        # the seeded users' own currency: a save that converts nothing, since there are no rates to convert with
+        ('POST', WRITE, lambda user, i: ({}, {'currency': 'KES'})),
+    ],
+    'auth.register': [
+        ('POST', WRITE, lambda user, i: ({}, {
+            'username': f"newuser{user.id}x{i}",
+            'email': f"newuser{user.id}x{i}@example.com",
+            'password': 'password',
+            'confirm_password': 'password',
+        })),
+    ],
+    'auth.login': [
+        ('POST', SESSION, lambda user, i: ({}, {'email': user.email, 'password': user.password})),
+    ],
+    'auth.logout': [
+        ('GET', SESSION + 1, lambda user, i: ({}, {})),
+    ],
+}
+
+
+def _scenarios(rule):
+    """[(method, phase, build)] for one URL rule."""
+    scenarios = list(SCENARIOS.get(rule.endpoint, []))
+    listed = {method for method, _, _ in scenarios}
+    if 'GET' in rule.methods and not rule.arguments and 'GET' not in listed:
+        scenarios.append(('GET', READ, lambda user, i: ({}, {})))
+    return scenarios
+
+
+def plan(app, users, requests_per_route, only=None):
+    """Return ([(key, [Request])] in run order, [endpoints without a scenario]).
+
+    Requests of one route are spread round-robin over the users; user k's
+    i-th request of a route gets build(user, i // len(users)), so per-user
+    indexes (spare rows, unique names) never collide.
+    """
+    routes, uncovered = [], []
+    with app.test_request_context():
+        for rule in app.url_map.iter_rules():
+            if rule.endpoint.split('.')[0] not in BLUEPRINTS:
+                continue
+            scenarios = _scenarios(rule)
+            if not scenarios:
+                uncovered.append(rule.endpoint)
+            for method, phase, build in scenarios:
+                key = f"{method} {rule.endpoint}"
+                if only and not any(pattern in key for pattern in only):
+                    continue
+                requests = []
+                for n in range(requests_per_route):
+                    user_index = n % len(users)
+                    built = build(users[user_index], n // len(users))
+                    url_args, data = built[0], built[1]
+                    files = built[2] if len(built) > 2 else {}
+                    requests.append(Request(method, url_for(rule.endpoint, **url_args), user_index, data, files))
+                routes.append((phase, key, requests))
+
+    routes.sort(key=lambda route: route[0])
+    return [(key, requests) for _, key, requests in routes], uncovered
@@ -0,0 +1,70 @@
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from app import db, rollups
+from app.models import Category, Goal, RecurringRule, Transaction
+
+from benchmarks.common import seed_goals, seed_user
+
+
+# Seeds the load-test database. Besides the data every page reads, each user
+# gets "spare" rows that the delete scenarios are allowed to consume, so
+# deletes never hit a 404 or a category that still has transactions.
+
+PASSWORD = 'password'  # what seed_user() sets
+
+
+@dataclass
+class SeededUser:
+    id: int
+    email: str
+    transaction_ids: list
+    category_ids: list
+    goal_ids: list
+    spare_transaction_ids: list = field(default_factory=list)
+    spare_category_ids: list = field(default_factory=list)
+    spare_goal_ids: list = field(default_factory=list)
+    spare_rule_ids: list = field(default_factory=list)
+    password: str = PASSWORD
+
+
+def _spares(user_id, category_id, n):
+    transactions = [
+        Transaction(description=f"spare {i}", amount=-1, date=date.today(), user_id=user_id, category_id=category_id)
+        for i in range(n)
+    ]
+    categories = [Category(name=f"u{user_id}-spare-{i}", user_id=user_id) for i in range(n)]
+    goals = [Goal(name=f"spare {i}", target_amount=1, deadline=date.today() + timedelta(days=1), user_id=user_id)
+             for i in range(n)]
+    # rules that have ended, so the scheduler never materializes them
+    rules = [RecurringRule(description=f"spare {i}", amount=-1, frequency='monthly', start_date=date.today(),
+                           end_date=date.today(), user_id=user_id, category_id=category_id)
+             for i in range(n)]
+    db.session.add_all(transactions + categories + goals + rules)
+    for tx in transactions:
+        rollups.record(tx)
+    db.session.commit()
+    return ([t.id for t in transactions], [c.id for c in categories], [g.id for g in goals],
+            [r.id for r in rules])
+
+
+def seed(users=5, categories=10, transactions=1000, goals=5, spares=0, seed=0):
+    """Create `users` accounts with the given number of rows each. Returns [SeededUser]."""
+    seeded = []
+    for n in range(users):
+        username = f"load{n}"
+        user_id = seed_user(username, transactions, n_categories=categories, seed=seed + n)
+        seed_goals(user_id, goals)
+
+        category_ids = [c.id for c in Category.query.filter_by(user_id=user_id).order_by(Category.id)]
+        user = SeededUser(
+            id=user_id,
+            email=f"{username}@example.com",
+            transaction_ids=[t.id for t in Transaction.query.filter_by(user_id=user_id).limit(100)],
+            category_ids=category_ids,
+            goal_ids=[g.id for g in Goal.query.filter_by(user_id=user_id)],
+        )
+        user.spare_transaction_ids, user.spare_category_ids, user.spare_goal_ids, user.spare_rule_ids = \
+            _spares(user_id, category_ids[0], spares)
+        seeded.append(user)
+    return seeded
@@ -8,6 +8,94 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', f"sqlite:///{os.path.join(basedir, 'budget.db')}")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # database engine tuning (see app/engine.py), picked with DB_PROFILE.
+    # Pool settings apply to server databases (Postgres); sqlite_pragmas run on
+    # every new SQLite connection. 'stock' leaves SQLAlchemy/SQLite defaults.
+    DB_PROFILE = os.environ.get('DB_PROFILE', 'default')
+    DB_PROFILES = {
+        'stock': {},
+        'default': {
+            'pool_size': 5,
+            'max_overflow': 10,
+            'pool_pre_ping': True,
+            'pool_recycle': 1800,
+            'sqlite_pragmas': {
+                'busy_timeout': 5000,  # first, so the pragmas below wait for locks too
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'mmap_size': 64 * 1024 * 1024,
+                'cache_size': -16000,  # negative means KiB, so ~16 MB
+            },
+        },
+        'production': {
+            'pool_size': 10,
+            'max_overflow': 20,
+            'pool_pre_ping': True,
+            'pool_recycle': 1800,
+            'pool_timeout': 10,
+            'sqlite_pragmas': {
+                'busy_timeout': 15000,
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'mmap_size': 256 * 1024 * 1024,
+                'cache_size': -64000,
+            },
+        },
+    }
+
+    # rows per page on the transactions list (keyset paginated)
+    TRANSACTIONS_PAGE_SIZE = int(os.environ.get('TRANSACTIONS_PAGE_SIZE', 50))
+
+    # statement imports: rows per INSERT batch, and the largest upload accepted
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 32 * 1024 * 1024))
+
+    # batch edit/delete: the most rows one request may change
+    BATCH_MAX_ROWS = int(os.environ.get('BATCH_MAX_ROWS', 10000))
+
+    # currencies (see app/fx.py). Rates are stored as the value of one unit in FX_BASE_CURRENCY;
+    # lookups are memoized per (currency, date, rates version) in each worker; the TTL only bounds how long
+    # entries of superseded versions linger
+    CURRENCIES = [c.strip().upper() for c in os.environ.get('CURRENCIES', 'KES,USD,EUR,GBP,UGX,TZS').split(',')]
+    FX_BASE_CURRENCY = os.environ.get('FX_BASE_CURRENCY', 'KES')
+    FX_RATE_CACHE_MAXSIZE = int(os.environ.get('FX_RATE_CACHE_MAXSIZE', 20000))
+    FX_RATE_CACHE_TTL = int(os.environ.get('FX_RATE_CACHE_TTL', 300))
+
+    # per-user caches (see app/cache.py): 'memory' is per worker, 'sqlite' is shared by all workers on a host
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_MAXSIZE = int(os.environ.get('CACHE_MAXSIZE', 4096))
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 300))
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH', os.path.join(basedir, 'instance', 'cache.db'))
+
+    # seconds a logged-in user's identity is served from cache without a query (0 disables)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+
+    # number of (user, data version) analytics payloads kept in each worker
+    ANALYTICS_CACHE_MAXSIZE = int(os.environ.get('ANALYTICS_CACHE_MAXSIZE', 512))
+
+    # password hashing (see app/passwords.py): a werkzeug method with its cost, e.g. 'scrypt:32768:8:1'
+    # or 'pbkdf2:sha256:600000'. Hashes made with other parameters are upgraded at the next login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # hash on this many threads per worker (0 hashes inline in the request); at most
+    # PASSWORD_HASH_QUEUE more wait, for up to PASSWORD_HASH_TIMEOUT seconds, before a 503
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))
+
+    # per-request SQL/render timing (see app/instrumentation.py): Server-Timing header,
+    # Prometheus /metrics and a log line for requests slower than SLOW_REQUEST_MS. Off by default.
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '').lower() in ('1', 'true', 'yes')
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+    INSTRUMENTATION_SLOWEST_STATEMENTS = int(os.environ.get('INSTRUMENTATION_SLOWEST_STATEMENTS', 5))
+    # if set, /metrics requires "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Async read path (asgi.py under uvicorn, see app/asgi.py). The asyncio driver URL
+    # defaults to DATABASE_URL with aiosqlite/asyncpg swapped in; routes without an
+    # async version run on the Flask app in ASGI_WSGI_THREADS threads.
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+    ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 8))
+
     # Render gives DATABASE_URL in old Heroku-style form, fix if needed
     if SQLALCHEMY_DATABASE_URI.startswith("postgres://"):
         SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace("postgres://", "postgresql://", 1)
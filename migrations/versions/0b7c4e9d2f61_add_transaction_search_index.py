@@ -0,0 +1,56 @@
+"""add full-text search index on transaction descriptions
+
+Revision ID: 0b7c4e9d2f61
+Revises: f2a8c61d4b57
+Create Date: 2026-10-18 19:02:11.504318
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7c4e9d2f61'
+down_revision = 'f2a8c61d4b57'
+branch_labels = None
+depends_on = None
+
+
+# kept in step with app/search.py, which creates the same objects for db.create_all()
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE transaction_fts USING fts5("
+    "user_key, description, content='', tokenize='unicode61 remove_diacritics 2')",
+    """CREATE TRIGGER transaction_fts_insert AFTER INSERT ON "transaction" BEGIN
+        INSERT INTO transaction_fts(rowid, user_key, description) VALUES (new.id, 'u' || new.user_id, new.description);
+    END""",
+    """CREATE TRIGGER transaction_fts_delete AFTER DELETE ON "transaction" BEGIN
+        INSERT INTO transaction_fts(transaction_fts, rowid, user_key, description)
+            VALUES ('delete', old.id, 'u' || old.user_id, old.description);
+    END""",
+    """CREATE TRIGGER transaction_fts_update AFTER UPDATE OF description, user_id ON "transaction" BEGIN
+        INSERT INTO transaction_fts(transaction_fts, rowid, user_key, description)
+            VALUES ('delete', old.id, 'u' || old.user_id, old.description);
+        INSERT INTO transaction_fts(rowid, user_key, description) VALUES (new.id, 'u' || new.user_id, new.description);
+    END""",
+    "INSERT INTO transaction_fts(rowid, user_key, description) "
+    "SELECT id, 'u' || user_id, description FROM \"transaction\"",
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        op.execute("CREATE INDEX ix_transaction_description_fts ON \"transaction\" "
+                   "USING gin (to_tsvector('simple', description))")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('insert', 'delete', 'update'):
+            op.execute(f"DROP TRIGGER IF EXISTS transaction_fts_{trigger}")
+        op.execute("DROP TABLE IF EXISTS transaction_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_transaction_description_fts")
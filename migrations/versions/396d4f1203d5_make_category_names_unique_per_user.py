@@ -0,0 +1,41 @@
+"""make category names unique per user
+
+Revision ID: 396d4f1203d5
+Revises: f269f0ff1ccb
+Create Date: 2026-10-18 17:46:05.280409
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '396d4f1203d5'
+down_revision = 'f269f0ff1ccb'
+branch_labels = None
+depends_on = None
+
+# the initial migration created category.name's unique constraint without a name:
+# Postgres called it category_name_key, SQLite keeps it unnamed, so batch mode
+# needs a naming convention to find it (category has no triggers; a recreate is fine)
+SQLITE_CONVENTION = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+
+def _global_unique():
+    if op.get_bind().dialect.name == 'postgresql':
+        return 'category_name_key'
+    return 'uq_category_name'
+
+
+def upgrade():
+    with op.batch_alter_table('category', schema=None, naming_convention=SQLITE_CONVENTION) as batch_op:
+        batch_op.drop_constraint(_global_unique(), type_='unique')
+        batch_op.drop_index('ix_category_user_id')
+        batch_op.create_index('ix_category_user_id_name', ['user_id', 'name'], unique=True)
+
+
+def downgrade():
+    # fails if two users have a category of the same name
+    with op.batch_alter_table('category', schema=None, naming_convention=SQLITE_CONVENTION) as batch_op:
+        batch_op.drop_index('ix_category_user_id_name')
+        batch_op.create_index('ix_category_user_id', ['user_id'], unique=False)
+        batch_op.create_unique_constraint(_global_unique(), ['name'])
@@ -0,0 +1,52 @@
+"""add daily rollup table
+
+Revision ID: 5e0c7a41d8b9
+Revises: b3d91f6a0c2e
+Create Date: 2026-10-18 11:24:37.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0c7a41d8b9'
+down_revision = 'b3d91f6a0c2e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_rollup',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('income_total', sa.Float(), nullable=False),
+    sa.Column('expense_total', sa.Float(), nullable=False),
+    sa.Column('income_count', sa.Integer(), nullable=False),
+    sa.Column('expense_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'category_id', 'day')
+    )
+    with op.batch_alter_table('daily_rollup', schema=None) as batch_op:
+        batch_op.create_index('ix_daily_rollup_user_id_day', ['user_id', 'day'], unique=False)
+
+    # backfill from existing transactions (same query as `flask rollups rebuild`)
+    op.execute("""
+        INSERT INTO daily_rollup (user_id, category_id, day, income_total, expense_total, income_count, expense_count)
+        SELECT user_id, category_id, date,
+               SUM(CASE WHEN amount < 0 THEN 0 ELSE amount END),
+               SUM(CASE WHEN amount < 0 THEN -amount ELSE 0 END),
+               SUM(CASE WHEN amount < 0 THEN 0 ELSE 1 END),
+               SUM(CASE WHEN amount < 0 THEN 1 ELSE 0 END)
+        FROM "transaction"
+        GROUP BY user_id, category_id, date
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('daily_rollup', schema=None) as batch_op:
+        batch_op.drop_index('ix_daily_rollup_user_id_day')
+
+    op.drop_table('daily_rollup')
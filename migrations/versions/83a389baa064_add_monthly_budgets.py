@@ -0,0 +1,50 @@
+"""add monthly budgets
+
+Revision ID: 83a389baa064
+Revises: d0a608a1d31f
+Create Date: 2026-10-18 17:34:53.971167
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '83a389baa064'
+down_revision = 'd0a608a1d31f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('monthly_spend',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('spent_cents', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'category_id', 'month')
+    )
+    with op.batch_alter_table('category', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('budget_cents', sa.BigInteger(), nullable=True))
+
+    # backfill from existing transactions (same query as `flask budgets rebuild`)
+    if op.get_bind().dialect.name == 'postgresql':
+        month = "date_trunc('month', date)::date"
+    else:
+        month = "date(date, 'start of month')"
+    op.execute(f"""
+        INSERT INTO monthly_spend (user_id, category_id, month, spent_cents)
+        SELECT user_id, category_id, {month}, SUM(-amount_cents)
+        FROM "transaction"
+        WHERE amount_cents < 0
+        GROUP BY user_id, category_id, {month}
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('category', schema=None) as batch_op:
+        batch_op.drop_column('budget_cents')
+
+    op.drop_table('monthly_spend')
@@ -0,0 +1,28 @@
+"""version exchange rate loads
+
+Revision ID: 859c2ff557f8
+Revises: 396d4f1203d5
+Create Date: 2026-10-18 17:54:11.177907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '859c2ff557f8'
+down_revision = '396d4f1203d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('fx_rate', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_fx_rate_version', ['version'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('fx_rate', schema=None) as batch_op:
+        batch_op.drop_index('ix_fx_rate_version')
+        batch_op.drop_column('version')
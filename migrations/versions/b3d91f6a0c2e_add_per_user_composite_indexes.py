@@ -0,0 +1,39 @@
+"""add per-user composite indexes
+
+Revision ID: b3d91f6a0c2e
+Revises: 7101a0d3d754
+Create Date: 2026-10-18 10:02:11.418305
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d91f6a0c2e'
+down_revision = '7101a0d3d754'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.create_index('ix_transaction_user_id_date_id', ['user_id', 'date', 'id'], unique=False)
+        batch_op.create_index('ix_transaction_user_id_category_id', ['user_id', 'category_id'], unique=False)
+
+    with op.batch_alter_table('category', schema=None) as batch_op:
+        batch_op.create_index('ix_category_user_id', ['user_id'], unique=False)
+
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.create_index('ix_goal_user_id_deadline', ['user_id', 'deadline'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.drop_index('ix_goal_user_id_deadline')
+
+    with op.batch_alter_table('category', schema=None) as batch_op:
+        batch_op.drop_index('ix_category_user_id')
+
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_index('ix_transaction_user_id_category_id')
+        batch_op.drop_index('ix_transaction_user_id_date_id')
@@ -0,0 +1,26 @@
+"""add data version to user
+
+Revision ID: c8f25d7e3a14
+Revises: 5e0c7a41d8b9
+Create Date: 2026-10-18 13:05:52.617430
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f25d7e3a14'
+down_revision = '5e0c7a41d8b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
@@ -0,0 +1,55 @@
+"""add recurring rules
+
+Revision ID: d0a608a1d31f
+Revises: 0b7c4e9d2f61
+Create Date: 2026-10-18 17:30:13.808914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd0a608a1d31f'
+down_revision = '0b7c4e9d2f61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recurring_rule',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('description', sa.String(length=120), nullable=False),
+    sa.Column('amount_cents', sa.BigInteger(), nullable=False),
+    sa.Column('frequency', sa.String(length=10), nullable=False),
+    sa.Column('every', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('cron', sa.String(length=100), nullable=True),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.Column('next_date', sa.Date(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('recurring_rule', schema=None) as batch_op:
+        batch_op.create_index('ix_recurring_rule_next_date', ['next_date'], unique=False)
+        batch_op.create_index('ix_recurring_rule_user_id', ['user_id'], unique=False)
+
+    op.create_table('recurring_occurrence',
+    sa.Column('rule_id', sa.Integer(), nullable=False),
+    sa.Column('occurrence_date', sa.Date(), nullable=False),
+    sa.ForeignKeyConstraint(['rule_id'], ['recurring_rule.id'], ),
+    sa.PrimaryKeyConstraint('rule_id', 'occurrence_date')
+    )
+
+
+def downgrade():
+    op.drop_table('recurring_occurrence')
+    with op.batch_alter_table('recurring_rule', schema=None) as batch_op:
+        batch_op.drop_index('ix_recurring_rule_user_id')
+        batch_op.drop_index('ix_recurring_rule_next_date')
+
+    op.drop_table('recurring_rule')
@@ -0,0 +1,88 @@
+"""store money as integer cents
+
+Revision ID: e41b6f09c7d2
+Revises: c8f25d7e3a14
+Create Date: 2026-10-18 14:41:09.330871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b6f09c7d2'
+down_revision = 'c8f25d7e3a14'
+branch_labels = None
+depends_on = None
+
+
+# (table, old float column, new cents column, nullable)
+MONEY_COLUMNS = [
+    ('transaction', 'amount', 'amount_cents', False),
+    ('goal', 'target_amount', 'target_amount_cents', False),
+    ('goal', 'current_amount', 'current_amount_cents', True),
+]
+
+ROLLUP_BACKFILL = """
+    INSERT INTO daily_rollup (user_id, category_id, day, income_cents, expense_cents, income_count, expense_count)
+    SELECT user_id, category_id, date,
+           SUM(CASE WHEN amount_cents < 0 THEN 0 ELSE amount_cents END),
+           SUM(CASE WHEN amount_cents < 0 THEN -amount_cents ELSE 0 END),
+           SUM(CASE WHEN amount_cents < 0 THEN 0 ELSE 1 END),
+           SUM(CASE WHEN amount_cents < 0 THEN 1 ELSE 0 END)
+    FROM "transaction"
+    GROUP BY user_id, category_id, date
+"""
+
+
+def upgrade():
+    for table, old, new, nullable in MONEY_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(new, sa.BigInteger(), nullable=True))
+
+        op.execute(f'UPDATE "{table}" SET {new} = CAST(ROUND({old} * 100) AS BIGINT)')
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            if not nullable:
+                batch_op.alter_column(new, existing_type=sa.BigInteger(), nullable=False)
+            batch_op.drop_column(old)
+
+    # rollup sums are recomputed from the converted transactions
+    op.execute('DELETE FROM daily_rollup')
+    with op.batch_alter_table('daily_rollup', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('income_cents', sa.BigInteger(), nullable=False))
+        batch_op.add_column(sa.Column('expense_cents', sa.BigInteger(), nullable=False))
+        batch_op.drop_column('income_total')
+        batch_op.drop_column('expense_total')
+    op.execute(ROLLUP_BACKFILL)
+
+
+def downgrade():
+    op.execute('DELETE FROM daily_rollup')
+    with op.batch_alter_table('daily_rollup', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('income_total', sa.Float(), nullable=False))
+        batch_op.add_column(sa.Column('expense_total', sa.Float(), nullable=False))
+        batch_op.drop_column('income_cents')
+        batch_op.drop_column('expense_cents')
+
+    for table, old, new, nullable in reversed(MONEY_COLUMNS):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(old, sa.Float(), nullable=True))
+
+        op.execute(f'UPDATE "{table}" SET {old} = {new} / 100.0')
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            if not nullable:
+                batch_op.alter_column(old, existing_type=sa.Float(), nullable=False)
+            batch_op.drop_column(new)
+
+    op.execute("""
+        INSERT INTO daily_rollup (user_id, category_id, day, income_total, expense_total, income_count, expense_count)
+        SELECT user_id, category_id, date,
+               SUM(CASE WHEN amount < 0 THEN 0 ELSE amount END),
+               SUM(CASE WHEN amount < 0 THEN -amount ELSE 0 END),
+               SUM(CASE WHEN amount < 0 THEN 0 ELSE 1 END),
+               SUM(CASE WHEN amount < 0 THEN 1 ELSE 0 END)
+        FROM "transaction"
+        GROUP BY user_id, category_id, date
+    """)
@@ -0,0 +1,48 @@
+"""add multi-currency support
+
+Revision ID: f269f0ff1ccb
+Revises: 83a389baa064
+Create Date: 2026-10-18 17:42:33.911459
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f269f0ff1ccb'
+down_revision = '83a389baa064'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('fx_rate',
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('rate', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('currency', 'day')
+    )
+    with op.batch_alter_table('recurring_rule', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('currency', sa.String(length=3), server_default='KES', nullable=False))
+
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('currency', sa.String(length=3), server_default='KES', nullable=False))
+        batch_op.add_column(sa.Column('original_amount_cents', sa.BigInteger(), nullable=True))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('currency', sa.String(length=3), server_default='KES', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('currency')
+
+    # not in batch mode: on SQLite that would recreate the table and lose the search triggers
+    op.drop_column('transaction', 'original_amount_cents')
+    op.drop_column('transaction', 'currency')
+
+    with op.batch_alter_table('recurring_rule', schema=None) as batch_op:
+        batch_op.drop_column('currency')
+
+    op.drop_table('fx_rate')
@@ -0,0 +1,26 @@
+"""add track_category to goal
+
+Revision ID: f2a8c61d4b57
+Revises: e41b6f09c7d2
+Create Date: 2026-10-18 16:12:40.118254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8c61d4b57'
+down_revision = 'e41b6f09c7d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('track_category', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('goal', schema=None) as batch_op:
+        batch_op.drop_column('track_category')
@@ -1,16 +1,24 @@
-from app import create_app, db
-from app.models import Category, Transaction
+from app import create_app, db, versioning
+from app.models import (Category, DailyRollup, Goal, MonthlySpend, RecurringOccurrence, RecurringRule,
+                        Transaction, User)
 
 app = create_app()
 
 with app.app_context():
-    # delete all data
+    # delete all data; everything that references a category goes first
+    db.session.query(DailyRollup).delete()
+    db.session.query(MonthlySpend).delete()
+    db.session.query(RecurringOccurrence).delete()
+    db.session.query(RecurringRule).delete()
     db.session.query(Transaction).delete()
+    # goals are kept, detached from the categories they pointed at
+    db.session.query(Goal).update({Goal.category_id: None, Goal.track_category: False})
     db.session.query(Category).delete()
+    # bulk deletes skip the flush hook; stale cached analytics must not be served
+    versioning.bump(*[user_id for user_id, in db.session.query(User.id)])
     db.session.commit()
     print("Database reset: all data deleted.")
 
 # for table in reversed(db.metadata.sorted_tables):
 #     db.session.execute(table.delete())
 # db.session.commit() wipes data from all tables
-
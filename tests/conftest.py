@@ -0,0 +1,27 @@
+import pytest
+
+from app import create_app, db
+from app.models import User
+
+
+@pytest.fixture
+def app(tmp_path):
+    """The app against a throwaway SQLite file (a file, so several connections share it)."""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'TESTING': True,
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def user_id(app):
+    user = User(username='alice', email='alice@example.com')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
@@ -0,0 +1,75 @@
+import threading
+
+from app import db, versioning
+from app.categories import create_category
+from app.models import Category, User
+
+
+def categories(user_id):
+    return db.session.execute(
+        db.select(Category.id, Category.name).where(Category.user_id == user_id)
+    ).all()
+
+
+def test_create_returns_the_existing_category(app, user_id):
+    first, created = create_category(user_id, 'Food')
+    db.session.commit()
+    assert created
+
+    again, created = create_category(user_id, 'Food')
+    db.session.commit()
+    assert (again, created) == (first, False)
+    assert categories(user_id) == [(first, 'Food')]
+
+
+def test_same_name_for_another_user_is_a_new_category(app, user_id):
+    other = User(username='bob', email='bob@example.com', password_hash='x')
+    db.session.add(other)
+    db.session.commit()
+
+    mine, _ = create_category(user_id, 'Food')
+    theirs, created = create_category(other.id, 'Food')
+    db.session.commit()
+    assert created and theirs != mine
+
+
+def test_concurrent_creates_insert_one_row(app, user_id):
+    workers = 4
+    barrier = threading.Barrier(workers)
+    results, errors = [], []
+
+    def create():
+        # each thread has its own session and connection, as a web worker would
+        with app.app_context():
+            try:
+                barrier.wait()
+                results.append(create_category(user_id, 'Rent'))
+                db.session.commit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=create) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    rows = categories(user_id)
+    assert len(rows) == 1
+    assert {category_id for category_id, _ in results} == {rows[0].id}
+    assert sum(created for _, created in results) == 1
+
+
+def test_create_bumps_the_data_version(app, user_id):
+    before = versioning.data_version(user_id)
+    create_category(user_id, 'Food')
+    db.session.commit()
+    assert versioning.data_version(user_id) == before + 1
+
+    # an existing name changes nothing, so cached analytics stay valid
+    create_category(user_id, 'Food')
+    db.session.commit()
+    assert versioning.data_version(user_id) == before + 1
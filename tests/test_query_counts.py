@@ -0,0 +1,43 @@
+from app import db
+from app.querycount import count_queries
+
+from benchmarks.check_query_counts import client_for, route_urls
+from benchmarks.common import seed_goals, seed_user
+
+
+def get(app, client, url):
+    # a fresh app context per request, as in production: g (and the logged-in user) and the
+    # session aren't shared with the test's context; read the body so streamed pages run
+    with app.app_context():
+        response = client.get(url)
+        response.get_data()
+        response.close()
+    return response.status_code
+
+
+def test_query_counts_do_not_grow_with_data(app):
+    """Every read-only page issues no more statements for a large account than for a small one (N+1 guard)."""
+    small = seed_user('small', n_transactions=5, n_categories=2)
+    large = seed_user('large', n_transactions=500, n_categories=25)
+    seed_goals(small, 1)
+    seed_goals(large, 20)
+    small_urls = dict(route_urls(app, small))
+    large_urls = dict(route_urls(app, large))
+    small_client, large_client = client_for(app, small), client_for(app, large)
+
+    problems = []
+    for endpoint in sorted(small_urls):
+        # start each endpoint cold, so results cached by an earlier endpoint can't favour one account
+        app.extensions['analytics_cache'].clear()
+        with count_queries(db.engine) as baseline:
+            small_status = get(app, small_client, small_urls[endpoint])
+        with count_queries(db.engine) as counter:
+            large_status = get(app, large_client, large_urls[endpoint])
+
+        if (small_status, large_status) != (200, 200):
+            problems.append(f"{endpoint}: status {small_status}/{large_status}")
+        elif counter.count > baseline.count:
+            listing = '\n'.join(f"    {s}" for s in counter.statements)
+            problems.append(f"{endpoint}: {baseline.count} queries small, {counter.count} large:\n{listing}")
+
+    assert not problems, 'query counts that grow with data:\n' + '\n'.join(problems)